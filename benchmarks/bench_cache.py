@@ -0,0 +1,55 @@
+"""
+Measures the hit latency of the ``lambda_router.cache.DiskCache`` against recomputing
+the value, for a small lookup table (read from the file) and a large one (memory
+mapped), as cached by a warm invocation or another process.
+
+Run with::
+
+    $ python benchmarks/bench_cache.py [repeats]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+from lambda_router.cache import DiskCache
+
+
+def build_lookup(size):
+    """
+    Stands in for derived data that is expensive to rebuild, e.g. a lookup table
+    parsed and indexed from a reference file.
+    """
+    document = json.dumps([{"id": f"sku-{i}", "price": i * 0.01, "tags": ["a", "b"]} for i in range(size)])
+    return {item["id"]: (item["price"], tuple(item["tags"])) for item in json.loads(document)}
+
+
+def measure(fn, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    with tempfile.TemporaryDirectory() as directory:
+        disk_cache = DiskCache(directory=directory)
+        for size in (100, 20000):
+            disk_cache.set(f"lookup-{size}", build_lookup(size))
+            recompute = measure(lambda: build_lookup(size), repeats)
+            hit = measure(lambda: disk_cache.get(f"lookup-{size}"), repeats)
+            bytes_on_disk = os.path.getsize(disk_cache.path(f"lookup-{size}"))
+            print(
+                f"{size:>6} items ({bytes_on_disk:>8} bytes): recompute {recompute * 1e6:>9.1f} us, "
+                f"cache hit {hit * 1e6:>8.1f} us ({recompute / hit:.1f}x faster)"
+            )
+        miss = measure(lambda: disk_cache.get("missing"), repeats)
+        print(f"cache miss: {miss * 1e6:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
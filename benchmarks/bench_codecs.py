@@ -0,0 +1,70 @@
+"""
+Measures decoding compressed SQS message bodies with each ``lambda_router.codecs``
+codec for a range of payload sizes: the compression ratio, and the throughput of
+decoding a body to the routed object (base64, decompression and JSON), against
+decoding an uncompressed JSON body.
+
+Run with::
+
+    $ python benchmarks/bench_codecs.py [repeat]
+"""
+import json
+import sys
+import time
+
+from lambda_router import codecs
+
+
+SIZES = (1024, 16 * 1024, 200 * 1024)
+
+
+def payload(size):
+    items = []
+    body = {"id": "daf2ccee-8b09-4710-998e-9d82c7e9bf17", "items": items}
+    i = 0
+    while len(json.dumps(body)) < size:
+        items.append({"sku": f"SKU-{i:06d}", "quantity": i % 7, "price": round(i * 1.37, 2), "tags": ["a", "b"]})
+        i += 1
+    return body
+
+
+def bench(fn, *, repeat):
+    iterations = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        if time.perf_counter() - start > 0.05:
+            break
+        iterations *= 2
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings) / iterations
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print(f"{'size':>8} {'codec':>6} {'ratio':>6} {'decode':>10} {'MB/s':>8} {'encode':>10}")
+    for size in SIZES:
+        body = payload(size)
+        text = json.dumps(body)
+        data = text.encode("utf-8")
+        plain = bench(lambda: json.loads(text), repeat=repeat)
+        print(f"{len(data):>8} {'none':>6} {1:>6.2f} {plain * 1e6:>8.1f}us {len(data) / plain / 1e6:>8.1f}")
+        for name in ("gzip", "zlib", "lzma"):
+            codec = codecs.get_codec(name)
+            encoded = codec.encode(data)
+            decode = bench(lambda: json.loads(codec.decode(encoded)), repeat=repeat)
+            encode = bench(lambda: codec.encode(json.dumps(body).encode("utf-8")), repeat=repeat)
+            print(
+                f"{len(data):>8} {name:>6} {len(data) / len(encoded):>6.2f} {decode * 1e6:>8.1f}us"
+                f" {len(data) / decode / 1e6:>8.1f} {encode * 1e6:>8.1f}us"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Compares aggregating a batch of decoded message bodies by looping over the
+per-message dicts against building a ``lambda_router.columnar.ColumnarBatch`` and
+aggregating its NumPy columns, for a route computing a single aggregate and for
+one computing several over the same batch. Requires NumPy.
+
+Run with::
+
+    $ python benchmarks/bench_columnar.py [records]
+"""
+import random
+import sys
+import time
+
+import numpy
+
+from lambda_router import columnar
+
+
+FIELDS = ("quantity", "price")
+
+
+def records(count):
+    rng = random.Random(42)
+    return [
+        {"id": i, "sku": f"SKU-{rng.randrange(100):03d}", "quantity": rng.randrange(1, 10), "price": rng.random() * 100}
+        for i in range(count)
+    ]
+
+
+def single_per_dict(bodies):
+    total = 0.0
+    for body in bodies:
+        if body["quantity"] > 3:
+            total += body["price"] * body["quantity"]
+    return total
+
+
+def single_by_column(bodies):
+    batch = columnar.ColumnarBatch.from_records(bodies, fields=FIELDS)
+    quantity, price = batch["quantity"], batch["price"]
+    mask = quantity > 3
+    return float((price[mask] * quantity[mask]).sum())
+
+
+def several_per_dict(bodies):
+    revenue = bulk_revenue = 0.0
+    bulk = 0
+    highest = 0.0
+    prices = []
+    for body in bodies:
+        quantity, price = body["quantity"], body["price"]
+        revenue += price * quantity
+        if quantity > 3:
+            bulk += 1
+            bulk_revenue += price * quantity
+        highest = max(highest, price)
+        prices.append(price)
+    prices.sort()
+    return revenue, bulk, bulk_revenue, highest, prices[len(prices) // 2]
+
+
+def several_by_column(bodies):
+    batch = columnar.ColumnarBatch.from_records(bodies, fields=FIELDS)
+    quantity, price = batch["quantity"], batch["price"]
+    totals = price * quantity
+    mask = quantity > 3
+    return float(totals.sum()), int(mask.sum()), float(totals[mask].sum()), float(price.max()), numpy.median(price)
+
+
+def bench(fn, *, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1e3
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    bodies = records(count)
+    print(f"{count} records")
+    for name, per_dict, by_column in (
+        ("single aggregate", single_per_dict, single_by_column),
+        ("several aggregates", several_per_dict, several_by_column),
+    ):
+        baseline = bench(lambda: per_dict(bodies))
+        columns = bench(lambda: by_column(bodies))
+        print(
+            f"{name:<18}: per-message dicts {baseline:7.2f} ms, columns {columns:7.2f} ms ({baseline / columns:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
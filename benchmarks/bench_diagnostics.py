@@ -0,0 +1,56 @@
+"""
+Measures the per-invocation overhead of the ``lambda_router.diagnostics.MemoryMonitor``:
+disabled (the default, no monitor is created), recording the RSS only, and with
+``tracemalloc`` snapshots, for a route that allocates a little.
+
+Run with::
+
+    $ python benchmarks/bench_diagnostics.py [invocations]
+"""
+import sys
+import time
+
+from lambda_router import routers
+from lambda_router.app import App, Config
+
+
+EVENT = {"field": "work", "items": list(range(50))}
+
+
+def create_app(**config_values):
+    config = Config()
+    config.update(config_values)
+    app = App(name="bench_diagnostics", config=config, router=routers.EventField(key="field"))
+
+    @app.route(key="work")
+    def work(event):
+        return {str(item): [item] * 4 for item in event.raw["items"]}
+
+    return app
+
+
+def bench(app, *, invocations, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(invocations):
+            app(EVENT, None)
+        timings.append(time.perf_counter() - start)
+    return min(timings) / invocations * 1e6
+
+
+def main():
+    invocations = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    disabled = bench(create_app(), invocations=invocations)
+    rss = bench(create_app(MEMORY_GROWTH_THRESHOLD=1024 ** 3), invocations=invocations)
+    app = create_app(MEMORY_SNAPSHOT_INTERVAL=1000)
+    snapshots = bench(app, invocations=invocations)
+    app.memory_monitor.stop()
+    print(f"{invocations} invocations")
+    print(f"disabled:            {disabled:7.2f} us/invocation")
+    print(f"rss only:            {rss:7.2f} us/invocation (+{rss - disabled:.2f} us)")
+    print(f"tracemalloc (1000):  {snapshots:7.2f} us/invocation ({snapshots / disabled:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
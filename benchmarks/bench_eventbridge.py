@@ -0,0 +1,89 @@
+"""
+Compares routing EventBridge events with the indexed ``EventBridgeRouter`` against
+testing every compiled pattern in turn, with hundreds of registered patterns.
+
+Run with::
+
+    $ python benchmarks/bench_eventbridge.py [patterns] [events]
+"""
+import random
+import sys
+import time
+
+from lambda_router import eventbridge
+
+
+def create_patterns(count):
+    patterns = []
+    for i in range(count):
+        pattern = {"source": [f"com.example.service{i % 50}"], "detail-type": [f"Event Type {i}"]}
+        if i % 3 == 0:
+            pattern["detail"] = {"amount": [{"numeric": [">", i]}]}
+        elif i % 3 == 1:
+            pattern["detail"] = {"status": [{"anything-but": ["cancelled", "failed"]}]}
+        else:
+            pattern["detail"] = {"customer": {"tier": [{"prefix": "gold"}]}}
+        patterns.append(pattern)
+    # A few catch-all patterns without exact values.
+    patterns.append({"source": [{"prefix": "com.example.audit"}]})
+    patterns.append({"detail": {"priority": [{"numeric": [">=", 9]}]}})
+    return patterns
+
+
+def create_events(count, patterns):
+    rng = random.Random(42)
+    events = []
+    for _ in range(count):
+        i = rng.randrange(len(patterns) - 2)
+        events.append(
+            {
+                "source": f"com.example.service{i % 50}",
+                "detail-type": f"Event Type {i}",
+                "detail": {"amount": i + 1, "status": "placed", "customer": {"tier": "gold-plus"}, "priority": 1},
+            }
+        )
+    return events
+
+
+def bench(fn, events, *, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for event in events:
+            fn(event)
+        timings.append(time.perf_counter() - start)
+    return min(timings) / len(events) * 1e6
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    event_count = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    patterns = create_patterns(count)
+    events = create_events(event_count, patterns)
+
+    compiled = [eventbridge.EventPattern.compile(pattern) for pattern in patterns]
+
+    def linear(event):
+        for pattern in compiled:
+            if pattern.matches(event):
+                return pattern
+        return None
+
+    router = eventbridge.EventBridgeRouter()
+    start = time.perf_counter()
+    for i, pattern in enumerate(patterns):
+        router.add_route(fn=lambda event: None, pattern=pattern, name=str(i))
+    # The index is built on the first match.
+    router.match({})
+    compile_ms = (time.perf_counter() - start) * 1e3
+    assert all(str(compiled.index(linear(event))) == router.match(event) for event in events)
+
+    linear_us = bench(linear, events)
+    indexed_us = bench(router.match, events)
+    print(f"{len(patterns)} patterns compiled and indexed in {compile_ms:.1f} ms, {event_count} events")
+    print(f"linear matching:  {linear_us:8.2f} us/event")
+    print(f"indexed matching: {indexed_us:8.2f} us/event ({linear_us / indexed_us:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Compares the per-invocation cost of a chatty route logging through a plain stdlib
+``StreamHandler`` against the buffered, structured JSON logging from
+``lambda_router.log``. Both write to ``os.devnull`` so the syscalls are real.
+
+Run with::
+
+    $ python benchmarks/bench_logging.py [invocations] [lines_per_invocation]
+"""
+import logging
+import os
+import sys
+import time
+
+from lambda_router import log, routers
+from lambda_router.app import App
+
+
+class CountingStream:
+    def __init__(self, stream):
+        self.stream = stream
+        self.writes = 0
+
+    def write(self, s):
+        self.writes += 1
+        return self.stream.write(s)
+
+    def flush(self):
+        self.stream.flush()
+
+
+def create_app(name, lines):
+    app = App(name=name, router=routers.EventField(key="field"))
+
+    @app.route(key="main")
+    def main_route(event):
+        for i in range(lines):
+            app.logger.info("Processed item %d of %d for %s", i, lines, event.raw["field"])
+        return {}
+
+    return app
+
+
+def bench(app, *, invocations):
+    context = {"aws_request_id": "request"}
+    start = time.perf_counter()
+    for _ in range(invocations):
+        app({"field": "main"}, context)
+    return (time.perf_counter() - start) / invocations * 1e6
+
+
+def main():
+    invocations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    lines = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    with open(os.devnull, "w", buffering=1) as devnull:
+        plain_stream = CountingStream(devnull)
+        plain = create_app("bench_plain", lines)
+        handler = logging.StreamHandler(plain_stream)
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+        plain.logger.addHandler(handler)
+        plain.logger.setLevel(logging.INFO)
+        plain.logger.propagate = False
+        plain_us = bench(plain, invocations=invocations)
+
+        buffered_stream = CountingStream(devnull)
+        structured = create_app("bench_structured", lines)
+        log.configure_logging(structured, stream=buffered_stream)
+        structured_us = bench(structured, invocations=invocations)
+
+    print(f"{lines} lines per invocation, {invocations} invocations")
+    print(f"plain logger:      {plain_us:8.1f} us/invocation, {plain_stream.writes / invocations:5.1f} writes")
+    print(f"structured logger: {structured_us:8.1f} us/invocation, {buffered_stream.writes / invocations:5.1f} writes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Measures the round-trip overhead per invocation of the ``lambda_router.runtime``
+loop against the local Runtime API emulator.
+
+Run with::
+
+    $ python benchmarks/bench_runtime.py [invocations]
+"""
+import sys
+import time
+
+from lambda_router import routers, runtime
+from lambda_router.app import App
+
+
+EVENT = {
+    "field": "echo",
+    "Records": [{"messageId": str(i), "body": "x" * 200, "attributes": {"SentTimestamp": "0"}} for i in range(10)],
+}
+
+
+def create_app():
+    app = App(name="bench_runtime", router=routers.EventField(key="field"))
+
+    @app.route(key="echo")
+    def echo(event):
+        return {"count": len(event.raw["Records"])}
+
+    return app
+
+
+def bench(codec_name, *, invocations, keep_alive=True):
+    app = create_app()
+    with runtime.RuntimeAPIEmulator() as emulator:
+        client = runtime.RuntimeClient(address=emulator.address, codec=runtime.get_codec(codec_name))
+        for _ in range(invocations):
+            emulator.add_event(EVENT)
+        start = time.perf_counter()
+        if keep_alive:
+            runtime.run(app, client=client, max_invocations=invocations)
+        else:
+            for _ in range(invocations):
+                runtime.run(app, client=client, max_invocations=1)
+                client.close()
+        elapsed = time.perf_counter() - start
+        client.close()
+    return elapsed / invocations * 1e6
+
+
+def main():
+    invocations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    for codec_name in ("json", "orjson", "ujson"):
+        try:
+            runtime.get_codec(codec_name)
+        except Exception:
+            print(f"{codec_name:>8}: not installed")
+            continue
+        per_invocation = bench(codec_name, invocations=invocations)
+        print(f"{codec_name:>8}: {per_invocation:8.1f} us/invocation (keep-alive)")
+    per_invocation = bench("json", invocations=invocations, keep_alive=False)
+    print(f"{'json':>8}: {per_invocation:8.1f} us/invocation (new connection per invocation)")
+
+
+if __name__ == "__main__":
+    main()
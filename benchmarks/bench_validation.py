@@ -0,0 +1,89 @@
+"""
+Compares validating and coercing a route payload with a compiled
+``lambda_router.validation.Schema`` against naive per-call validation that walks
+the template with repeated ``isinstance`` checks on every call.
+
+Run with::
+
+    $ python benchmarks/bench_validation.py [iterations]
+"""
+import sys
+import time
+
+from lambda_router import config, exceptions, validation
+
+
+TEMPLATE = {
+    "id": {"required": True, "type": (int, str), "converter": int},
+    "name": {"required": True, "type": str},
+    "email": {"required": True, "type": str},
+    "admin": {"default": False, "converter": config.str_to_bool},
+    "tags": {"default": (), "type": list, "converter": tuple},
+    "address": {"schema": {"city": {"required": True, "type": str}, "postcode": {"type": str}}},
+}
+PAYLOAD = {
+    "id": "1234",
+    "name": "Jane",
+    "email": "jane@example.com",
+    "admin": "no",
+    "tags": ["a", "b"],
+    "address": {"city": "Leeds", "postcode": "LS1"},
+}
+
+
+def naive_validate(payload, template, path=""):
+    if not isinstance(payload, dict):
+        raise exceptions.ValidationError([f"{path or 'payload'}: expected an object"])
+    result = {}
+    errors = []
+    for field, params in template.items():
+        if field not in payload:
+            if params.get("required", False):
+                errors.append(f"{path}{field}: required field is missing")
+            result[field] = params.get("default", None)
+            continue
+        value = payload[field]
+        if "type" in params and not isinstance(value, params["type"]):
+            errors.append(f"{path}{field}: wrong type")
+            continue
+        if "schema" in params:
+            try:
+                value = naive_validate(value, params["schema"], f"{path}{field}.")
+            except exceptions.ValidationError as e:
+                errors.extend(e.errors)
+                continue
+        if "converter" in params:
+            try:
+                value = params["converter"](value)
+            except (TypeError, ValueError) as e:
+                errors.append(f"{path}{field}: {e}")
+        result[field] = value
+    if errors:
+        raise exceptions.ValidationError(errors)
+    return result
+
+
+def bench(fn, *, iterations, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn(PAYLOAD)
+        timings.append(time.perf_counter() - start)
+    return min(timings) / iterations * 1e6
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    start = time.perf_counter()
+    schema = validation.Schema.compile(TEMPLATE, name="User")
+    compile_us = (time.perf_counter() - start) * 1e6
+    naive_us = bench(lambda payload: naive_validate(payload, TEMPLATE), iterations=iterations)
+    compiled_us = bench(schema, iterations=iterations)
+    print(f"{iterations} iterations, compiled once in {compile_us:.0f} us")
+    print(f"naive validation:    {naive_us:6.2f} us/payload")
+    print(f"compiled validation: {compiled_us:6.2f} us/payload ({naive_us / compiled_us:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Measures how the throughput of a CPU bound ``SQSMessageField`` route scales when
+it's offloaded to a ``lambda_router.workers.WorkerPool`` of 1 to N processes,
+against the sequential dispatch loop.
+
+Run with::
+
+    $ python benchmarks/bench_workers.py [messages] [max_processes]
+"""
+import hashlib
+import json
+import os
+import sys
+import time
+
+from lambda_router import events, routers, workers
+
+
+def digest(message):
+    # A stand-in for thumbnailing or parsing: about 10ms of pure CPU.
+    data = message.body["data"].encode()
+    for _ in range(message.body["rounds"]):
+        data = hashlib.sha256(data).digest()
+    return data.hex()
+
+
+def create_event(messages):
+    records = [
+        {
+            "messageId": str(i),
+            "body": json.dumps({"data": f"message-{i}", "rounds": 20000}),
+            "messageAttributes": {"key": {"stringValue": "digest"}},
+        }
+        for i in range(messages)
+    ]
+    return events.LambdaEvent(raw={"Records": records}, app=None)
+
+
+def bench(router, *, messages):
+    # Warm up, starting the worker processes.
+    router.dispatch(event=create_event(messages))
+    start = time.perf_counter()
+    router.dispatch(event=create_event(messages))
+    return messages / (time.perf_counter() - start)
+
+
+def main():
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 48
+    max_processes = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1
+    sequential = routers.SQSMessageField(key="key")
+    sequential.add_route(fn=digest, key="digest")
+    baseline = bench(sequential, messages=messages)
+    print(f"{messages} messages, {os.cpu_count()} CPUs")
+    print(f"sequential:  {baseline:7.1f} messages/s")
+    for processes in range(1, max_processes + 1):
+        pool = workers.WorkerPool(processes=processes)
+        router = routers.SQSMessageField(key="key", workers=pool)
+        router.add_route(fn=digest, key="digest", offload=True)
+        try:
+            throughput = bench(router, messages=messages)
+        finally:
+            pool.close()
+        print(f"{processes:2d} processes: {throughput:7.1f} messages/s ({throughput / baseline:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,7 +7,11 @@ from setuptools import find_packages, setup
 
 INSTALL_REQUIRES = ["attrs>=19.1.0", "jsonpath-rw>=1.4.0"]
 
-EXTRAS_REQUIRE = {"docs": ["sphinx"], "tests": ["coverage[toml]", "pytest"]}
+EXTRAS_REQUIRE = {
+    "docs": ["sphinx"],
+    "opentelemetry": ["opentelemetry-api"],
+    "tests": ["coverage[toml]", "pytest"],
+}
 
 
 HERE = os.path.abspath(os.path.dirname(__file__))
@@ -1,15 +1,73 @@
+import contextvars
+import inspect
 import logging
 import threading
+import time
 
-from typing import Any, Callable, Dict, List, Mapping, Optional
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple, Union
 
 import attr
 
-from . import exceptions, routers
+from . import exceptions, routers, snapstart, tracing, validation
+from .breakers import BreakerRegistry, CircuitBreaker
+from .cache import DiskCache
 from .config import Config
+from .diagnostics import MemoryMonitor
 from .events import LambdaEvent
 from .interfaces import Event, Router
+from .profiling import Profiler
 from .proxies import DictProxy
+from .reporting import BackgroundReporter, HandlerSink, Report
+from .resources import ResourceRegistry
+from .routers import LazyRoute
+from .tracing import Tracer
+
+
+# The order of the built-in snapshot hooks, which run after all the other
+# ``before_snapshot`` hooks and before all the other ``after_restore`` hooks.
+SNAPSHOT_BUILTIN_ORDER = 1_000_000
+# The events sent by the serverless-plugin-warmup scheduled warmer, e.g. for
+# ``config["WARMUP_EVENTS"] = SERVERLESS_WARMUP_EVENTS``.
+SERVERLESS_WARMUP_EVENTS = ({"source": "serverless-plugin-warmup"},)
+# The route key of an invocation that wasn't looked up yet.
+_UNRESOLVED = object()
+
+
+def _matches_pattern(raw_event: Any, pattern: Mapping[str, Any]) -> bool:
+    """
+    Whether all the fields of the pattern are present, with the same values, in the
+    given event. Nested mappings in the pattern are matched recursively.
+    """
+    if not isinstance(raw_event, Mapping):
+        return False
+    for key, expected in pattern.items():
+        try:
+            value = raw_event[key]
+        except KeyError:
+            return False
+        if isinstance(expected, Mapping):
+            if not _matches_pattern(value, expected):
+                return False
+        elif value != expected:
+            return False
+    return True
+
+
+def _hook_name(fn: Callable) -> str:
+    return f"{getattr(fn, '__module__', None)}.{getattr(fn, '__qualname__', type(fn).__name__)}"
+
+
+def _preimport_after_first_invocation(app: "App") -> None:
+    """
+    An ``after_invocation`` hook that imports the remaining lazy routes in the
+    background once the first invocation has completed, and then removes itself.
+    """
+    try:
+        app.after_invocation_hooks.remove(_preimport_after_first_invocation)
+    except ValueError:
+        # Already removed by a concurrent invocation.
+        return
+    app.preimport_routes(background=True)
 
 
 @attr.s(kw_only=True)
@@ -23,6 +81,8 @@ class App:
     :param event_class: The class to use for representing lambda events.
     :param router:  The ``Router`` instance to use for this app.
     :param logger: The ``logging.Logger`` compatible logger instance to use for logging.
+    :param tracer: The optional ``lambda_router.tracing.Tracer`` used to time the phases of
+        each invocation.
     """
 
     name: str = attr.ib()
@@ -31,10 +91,31 @@ class App:
     event_params: Optional[Dict[str, Any]] = attr.ib(default=None, repr=False)
     router: Router = attr.ib(factory=routers.SingleRoute)
     logger: logging.Logger = attr.ib(repr=False)
-    local_context: threading.local = attr.ib(repr=False, init=False, factory=threading.local)
-    execution_context: Optional[Any] = attr.ib(repr=False, init=False, default=None)
+    tracer: Optional[Tracer] = attr.ib(default=None, repr=False)
+    _execution_context_var: contextvars.ContextVar = attr.ib(repr=False, init=False)
+    _globals_var: contextvars.ContextVar = attr.ib(repr=False, init=False)
+    _event_var: contextvars.ContextVar = attr.ib(repr=False, init=False)
+    _cold_start_var: contextvars.ContextVar = attr.ib(repr=False, init=False)
+    _route_key_var: contextvars.ContextVar = attr.ib(repr=False, init=False)
     middleware_chain: Optional[List[Callable]] = attr.ib(repr=False, init=False, default=None)
     exception_handlers: List[Callable] = attr.ib(repr=False, init=False, factory=list)
+    exception_reporters: List[BackgroundReporter] = attr.ib(repr=False, init=False, factory=list)
+    after_invocation_hooks: List[Callable] = attr.ib(repr=False, init=False, factory=list)
+    init_hooks: List[Callable] = attr.ib(repr=False, init=False, factory=list)
+    warmup_hooks: List[Callable] = attr.ib(repr=False, init=False, factory=list)
+    warmup_events: Sequence[Mapping[str, Any]] = attr.ib(repr=False, init=False, default=())
+    init_timings: Optional[Dict[str, float]] = attr.ib(repr=False, init=False, default=None)
+    _init_lock: threading.Lock = attr.ib(repr=False, init=False, factory=threading.Lock)
+    resources: ResourceRegistry = attr.ib(repr=False, init=False, factory=ResourceRegistry)
+    breakers: BreakerRegistry = attr.ib(repr=False, init=False, factory=BreakerRegistry)
+    before_snapshot_hooks: snapstart.LifecycleHooks = attr.ib(repr=False, init=False)
+    after_restore_hooks: snapstart.LifecycleHooks = attr.ib(repr=False, init=False)
+    profiler: Optional[Profiler] = attr.ib(repr=False, init=False, default=None)
+    memory_monitor: Optional[MemoryMonitor] = attr.ib(repr=False, init=False, default=None)
+    _cache: Optional[DiskCache] = attr.ib(repr=False, init=False, default=None)
+    cold_start: bool = attr.ib(repr=False, init=False, default=True)
+    created_at: float = attr.ib(repr=False, init=False, factory=time.perf_counter)
+    init_duration: Optional[float] = attr.ib(repr=False, init=False, default=None)
 
     @logger.default
     def _create_logger(self):
@@ -44,52 +125,400 @@ class App:
         logger = logging.getLogger(self.name)
         return logger
 
+    @_execution_context_var.default
+    def _create_execution_context_var(self):
+        return contextvars.ContextVar(f"{self.name}.execution_context", default=None)
+
+    @_globals_var.default
+    def _create_globals_var(self):
+        return contextvars.ContextVar(f"{self.name}.globals", default=None)
+
+    @_event_var.default
+    def _create_event_var(self):
+        return contextvars.ContextVar(f"{self.name}.event", default=None)
+
+    @_cold_start_var.default
+    def _create_cold_start_var(self):
+        return contextvars.ContextVar(f"{self.name}.cold_start", default=False)
+
+    @_route_key_var.default
+    def _create_route_key_var(self):
+        return contextvars.ContextVar(f"{self.name}.route_key", default=_UNRESOLVED)
+
+    @before_snapshot_hooks.default
+    def _create_before_snapshot_hooks(self):
+        hooks = snapstart.LifecycleHooks(name="before_snapshot")
+        hooks.add(snapstart.prepare_snapshot, order=SNAPSHOT_BUILTIN_ORDER)
+        return hooks
+
+    @after_restore_hooks.default
+    def _create_after_restore_hooks(self):
+        hooks = snapstart.LifecycleHooks(name="after_restore")
+        hooks.add(snapstart.reset_after_restore, order=-SNAPSHOT_BUILTIN_ORDER)
+        return hooks
+
     def __attrs_post_init__(self):
         """
-        Post-init hook. Used to load the middlware from the config. This requires the
-        config to already have been initialised before creating the App.
+        Post-init hook. Used to load the middlware, profiler, memory monitor and warm-up
+        events from the config. This requires the config to already have been initialised
+        before creating the App.
         """
         self.load_middleware()
+        self.profiler = Profiler.from_config(self.config, logger=self.logger)
+        self.memory_monitor = MemoryMonitor.from_config(self.config, logger=self.logger)
+        if self.memory_monitor is not None:
+            self.memory_monitor.start()
+            self.after_invocation_hooks.append(self.memory_monitor.after_invocation)
+        self.warmup_events = tuple(self.config.get("WARMUP_EVENTS", None) or ())
+        if self.config.get("PREIMPORT_ROUTES", False):
+            self.after_invocation_hooks.append(_preimport_after_first_invocation)
+        snapstart.register_runtime_hooks(self)
+
+    @property
+    def execution_context(self) -> Optional[Any]:
+        """
+        The lambda context object of the current invocation.
+        """
+        return self._execution_context_var.get()
+
+    @property
+    def current_event(self) -> Optional[Event]:
+        """
+        The ``Event`` of the current invocation.
+        """
+        return self._event_var.get()
+
+    @property
+    def is_cold_start(self) -> bool:
+        """
+        Whether the current invocation is the first invocation of this ``App``.
+        """
+        return self._cold_start_var.get()
+
+    @property
+    def current_route_key(self) -> Optional[str]:
+        """
+        The route key of the ``Event`` of the current invocation. It's looked up once
+        per invocation, on first use, e.g. by the profiler or for every log record.
+        """
+        route_key = self._route_key_var.get()
+        if route_key is _UNRESOLVED:
+            event = self._event_var.get()
+            if event is None:
+                return None
+            route_key = self.router.get_route_key(event=event)
+            self._route_key_var.set(route_key)
+        return route_key
 
     @property
-    def globals(self):
+    def globals(self) -> DictProxy:
         """
-        Provides a proxied dict in the ``local_context``.
+        Provides a proxied dict that is local to the current invocation. Outside of an
+        invocation the dict is local to the current ``contextvars`` context.
         """
-        if not hasattr(self.local_context, "globals"):
-            self.local_context.globals = DictProxy()
-        return self.local_context.globals
+        proxy = self._globals_var.get()
+        if proxy is None:
+            proxy = DictProxy()
+            self._globals_var.set(proxy)
+        return proxy
 
-    def route(self, **options: Mapping[str, Any]) -> Callable:
+    @property
+    def cache(self) -> DiskCache:
         """
-        Provides a decorator for adding a route via the configured router.
+        Provides the ``DiskCache`` in ``/tmp`` shared across warm invocations and the
+        processes of the lambda, configured by the ``CACHE_*`` config values. It's
+        created on first use, so apps not using it don't touch the disk.
+        """
+        if self._cache is None:
+            self._cache = DiskCache.from_config(self.config)
+        return self._cache
+
+    def route(self, *, schema: Any = None, breaker: Any = None, **options: Mapping[str, Any]) -> Callable:
+        """
+        Provides a decorator for adding a route via the configured router. See
+        ``add_route`` for the options.
         """
 
         def decorator(fn: Callable):
-            self.router.add_route(fn=fn, **options)
+            self.add_route(fn, schema=schema, breaker=breaker, **options)
             return fn
 
         return decorator
 
-    def register_exception_handler(self, fn: Callable) -> Callable:
+    def add_route(
+        self,
+        fn: Union[Callable, str],
+        *,
+        schema: Any = None,
+        breaker: Union[CircuitBreaker, str, None] = None,
+        **options: Mapping[str, Any],
+    ) -> None:
+        """
+        Adds a route via the configured router.
+
+        :param fn: The route, or its ``"package.module:function"`` import string. Routes
+            given as import strings are only imported when they're first dispatched to,
+            so modules of routes that aren't used don't add to the cold start.
+        :param schema: An optional ``lambda_router.validation.Schema``, or template, the
+            route's payload is validated with before the route is called. The template
+            is compiled once, when the route is added, and the route is called with
+            the validated payload as an extra ``payload`` argument.
+        :param breaker: An optional ``lambda_router.breakers.CircuitBreaker``, or the name
+            of one registered in ``breakers``, the route is called through. Invalid
+            payloads don't count as failures of the breaker.
+        :raises ValueError: Raised for a columnar route with a ``schema``, and for an
+            offloaded route with a ``schema`` or ``breaker``, as the wrapped route can't
+            be sent to the worker processes.
+        """
+        if options.get("columnar", False) and schema is not None:
+            raise ValueError(
+                "Columnar routes can't have a schema, as they're called with the columns of the batch rather "
+                "than its payloads. Validate the columns within the route instead."
+            )
+        if options.get("offload", False) and (schema is not None or breaker is not None):
+            raise ValueError(
+                "Offloaded routes can't have a schema or breaker, as the wrapped route can't be sent to the "
+                "worker processes. Validate the payload or use the breaker within the route instead."
+            )
+        if isinstance(fn, str):
+            fn = LazyRoute(path=fn)
+        if breaker is not None:
+            if isinstance(breaker, str):
+                breaker = self.breakers[breaker]
+            fn = breaker.wrap(fn)
+        if schema is not None:
+            fn = validation.validate_route(fn, schema)
+        self.router.add_route(fn=fn, **options)
+
+    def _lazy_routes(self) -> Iterator[Tuple[Optional[str], LazyRoute]]:
+        for key, route in self.router.get_routes().items():
+            route = inspect.unwrap(route, stop=lambda fn: isinstance(fn, LazyRoute))
+            if isinstance(route, LazyRoute):
+                yield key, route
+
+    def preimport_routes(self, *, background: bool = False) -> Optional[threading.Thread]:
+        """
+        Imports all the routes added as import strings that haven't been imported yet.
+        With the ``PREIMPORT_ROUTES`` config set, the routes are imported in the
+        background once the first invocation has completed.
+
+        :param background: Import the routes from a daemon thread instead.
+        :returns: The started thread when importing in the background.
+        """
+        if background:
+            thread = threading.Thread(target=self._preimport_routes, name="lambda_router.preimport", daemon=True)
+            thread.start()
+            return thread
+        self._preimport_routes()
+        return None
+
+    def _preimport_routes(self) -> None:
+        for key, route in self._lazy_routes():
+            if not route.loaded:
+                try:
+                    route.resolve()
+                except Exception:
+                    # The error is raised again when the route is dispatched to.
+                    self.logger.exception("Failed to pre-import route (%s).", route.path)
+
+    def route_import_timings(self) -> Dict[Optional[str], Optional[float]]:
+        """
+        Returns the time in seconds importing each route given as an import string
+        took, keyed on the route key, or ``None`` for routes that weren't imported yet.
+        """
+        return {key: route.import_time for key, route in self._lazy_routes()}
+
+    def register_exception_handler(
+        self, fn: Optional[Callable] = None, *, background: bool = False, **options: Any
+    ) -> Callable:
         """
         Provides a decorator that registers a handler for any uncaught exceptions.
+
+        Handlers registered with ``background=True`` are called from a background
+        ``lambda_router.reporting.BackgroundReporter`` instead of before the exception
+        is re-raised; any other keyword options are passed on to the reporter.
+        """
+
+        def decorator(fn: Callable):
+            if background:
+                self.add_exception_reporter(BackgroundReporter(sink=HandlerSink(handler=fn), **options))
+            else:
+                self.exception_handlers.append(fn)
+            return fn
+
+        if fn is None:
+            return decorator
+        return decorator(fn)
+
+    def after_invocation(self, fn: Callable) -> Callable:
+        """
+        Provides a decorator that registers a hook that is called as ``fn(app)`` at
+        the end of every invocation, whether or not the invocation succeeded.
+        """
+        self.after_invocation_hooks.append(fn)
+        return fn
+
+    def resource(self, name: str, **options: Any) -> Callable:
+        """
+        Provides a decorator that declares a resource, e.g. a database connection or
+        an HTTP client, created by calling the decorated factory without arguments.
+        Resources are created lazily, pooled and reused across invocations, see
+        ``lambda_router.resources.ResourcePool`` for the options. Use them with::
+
+            with app.resources.lease("db") as connection:
+                ...
         """
-        self.exception_handlers.append(fn)
 
         def decorator(fn: Callable):
+            self.resources.register(name, fn, **options)
             return fn
 
         return decorator
 
+    def on_init(self, fn: Callable) -> Callable:
+        """
+        Provides a decorator that registers a hook that is called as ``fn(app)`` once,
+        before the first invocation. Used to move work like importing route modules,
+        establishing connections and priming caches out of the first real request.
+        """
+        self.init_hooks.append(fn)
+        return fn
+
+    def on_warmup(self, fn: Callable) -> Callable:
+        """
+        Provides a decorator that registers a hook that is called as ``fn(app)`` for
+        every warm-up event, after the init hooks have run.
+        """
+        self.warmup_hooks.append(fn)
+        return fn
+
+    def before_snapshot(self, fn: Optional[Callable] = None, *, order: int = 0) -> Callable:
+        """
+        Provides a decorator that registers a hook that is called as ``fn(app)`` before
+        the runtime takes a snapshot of the initialised lambda. Used to close
+        connections and drop any state that mustn't be shared by the restored copies.
+        Hooks are called in ascending ``order``.
+        """
+
+        def decorator(fn: Callable):
+            self.before_snapshot_hooks.add(fn, order=order)
+            return fn
+
+        if fn is None:
+            return decorator
+        return decorator(fn)
+
+    def after_restore(self, fn: Optional[Callable] = None, *, order: int = 0) -> Callable:
+        """
+        Provides a decorator that registers a hook that is called as ``fn(app)`` after
+        the runtime has restored the lambda from a snapshot. Used to reconnect and to
+        refresh credentials, random seeds and anything else that must be unique or
+        current. Hooks are called in ascending ``order``, after lambda_router has reset
+        its own state.
+        """
+
+        def decorator(fn: Callable):
+            self.after_restore_hooks.add(fn, order=order)
+            return fn
+
+        if fn is None:
+            return decorator
+        return decorator(fn)
+
+    def run_before_snapshot_hooks(self) -> Dict[str, float]:
+        """
+        Runs the ``before_snapshot`` hooks, returning the duration in seconds of each.
+        Called by the runtime, or by ``lambda_router.snapstart.simulate_snapshot_restore``.
+        """
+        return self.before_snapshot_hooks.run(self)
+
+    def run_after_restore_hooks(self) -> Dict[str, float]:
+        """
+        Runs the ``after_restore`` hooks, returning the duration in seconds of each.
+        Called by the runtime, or by ``lambda_router.snapstart.simulate_snapshot_restore``.
+        """
+        return self.after_restore_hooks.run(self)
+
+    def is_warmup_event(self, raw_event: Any) -> bool:
+        """
+        Whether the given raw event matches any of the configured ``WARMUP_EVENTS``
+        patterns. None are configured by default, so every event is routed.
+        """
+        for pattern in self.warmup_events:
+            if _matches_pattern(raw_event, pattern):
+                return True
+        return False
+
+    def run_init_hooks(self) -> Dict[str, float]:
+        """
+        Runs the ``on_init`` hooks, if they haven't run yet. Called at the start of the
+        first invocation, but can be called when the module is loaded to run the hooks
+        during the lambda's init phase instead.
+
+        :returns: The duration in seconds of each hook, keyed on the hook's name.
+        """
+        with self._init_lock:
+            if self.init_timings is None:
+                timings = {}
+                for fn in self.init_hooks:
+                    start = time.perf_counter()
+                    fn(self)
+                    timings[_hook_name(fn)] = time.perf_counter() - start
+                self.init_timings = timings
+                if timings:
+                    self.logger.info(
+                        "Ran %d init hooks in %.3fs.",
+                        len(timings),
+                        sum(timings.values()),
+                        extra={"init_timings": timings},
+                    )
+        return self.init_timings
+
+    def _warmup(self) -> Dict[str, Any]:
+        """
+        Runs the ``on_warmup`` hooks, returning the timings of the init and warm-up hooks.
+        """
+        timings = {}
+        for fn in self.warmup_hooks:
+            start = time.perf_counter()
+            fn(self)
+            timings[_hook_name(fn)] = time.perf_counter() - start
+        return {"warmup": True, "init_timings": dict(self.init_timings or {}), "warmup_timings": timings}
+
+    def add_exception_reporter(self, reporter: BackgroundReporter) -> None:
+        """
+        Adds a ``BackgroundReporter`` that any uncaught exceptions are submitted to.
+        """
+        self.exception_reporters.append(reporter)
+
+    def _report_exception(self, event: Event, e: Exception) -> None:
+        """
+        Passes the exception to the registered exception handlers and reporters,
+        waiting for the reports to be delivered at most the longest ``flush_timeout``
+        of the reporters in total, and at most its own ``flush_timeout`` for each.
+        """
+        for fn in self.exception_handlers:
+            fn(self, event, e)
+        if self.exception_reporters:
+            report = Report(app=self, event=event, exception=e)
+            for reporter in self.exception_reporters:
+                reporter.submit(report)
+            deadline = time.monotonic() + max(reporter.flush_timeout for reporter in self.exception_reporters)
+            for reporter in self.exception_reporters:
+                reporter.flush(timeout=min(reporter.flush_timeout, max(deadline - time.monotonic(), 0.0)))
+
     def load_middleware(self):
         """
-        Initialises the middlware from the app config.
+        Initialises the middlware from the app config. When a ``tracer`` is configured
+        each middleware is timed in its own span.
         """
         dispatch = self.router.dispatch
         configured_middleware = self.config.get("MIDDLEWARE", [])
         for middleware in configured_middleware:
             mw_instance = middleware(dispatch)
+            if self.tracer is not None:
+                name = getattr(middleware, "__qualname__", type(middleware).__name__)
+                mw_instance = tracing.traced(mw_instance, name=f"middleware:{name}")
             dispatch = mw_instance
         self.middleware_chain = dispatch
 
@@ -120,17 +549,79 @@ class App:
         :param raw_event: The raw event mapping passed in from the lambda runtime.
         :param lambda_context: The execution contect object passed in from the lambda runtime.
         """
-        event = self._create_event(raw_event)
-        self.execution_context = lambda_context
+        cold_start = False
+        if self.cold_start:
+            # Only one of several concurrent first invocations is the cold start.
+            with self._init_lock:
+                cold_start = self.cold_start
+                if cold_start:
+                    self.cold_start = False
+                    self.init_duration = time.perf_counter() - self.created_at
+        if self.init_timings is None:
+            self.run_init_hooks()
+        warmup = bool(self.warmup_events) and self.is_warmup_event(raw_event)
+        if self.tracer is None:
+            return self._invoke(raw_event, lambda_context, cold_start=cold_start, warmup=warmup)
+
+        attributes = {"app": self.name, "cold_start": cold_start}
+        if cold_start:
+            attributes["init_duration"] = self.init_duration
+        with self.tracer.trace("warmup" if warmup else "invocation", **attributes):
+            return self._invoke(raw_event, lambda_context, cold_start=cold_start, warmup=warmup)
+
+    def _invoke(self, raw_event: Mapping[str, Any], lambda_context: Any, *, cold_start: bool, warmup: bool) -> Any:
+        """
+        Creates the event and dispatches it. The execution context, globals and event
+        are stored in context variables for the duration of the invocation, so the
+        same ``App`` can safely be invoked concurrently from multiple threads or tasks.
+        The ``after_invocation`` hooks are run once the invocation has completed.
+
+        Warm-up events are answered before an event is created, so they never reach
+        the middleware or the router, but still run the ``after_invocation`` hooks.
+        """
+        context_token = self._execution_context_var.set(lambda_context)
+        globals_token = self._globals_var.set(DictProxy())
+        cold_start_token = self._cold_start_var.set(cold_start)
+        try:
+            if warmup:
+                return self._warmup()
+            with tracing.span("create_event"):
+                event = self._create_event(raw_event)
+            event_token = self._event_var.set(event)
+            route_key_token = self._route_key_var.set(_UNRESOLVED)
+            try:
+                return self._dispatch_event(event)
+            finally:
+                self._route_key_var.reset(route_key_token)
+                self._event_var.reset(event_token)
+        finally:
+            try:
+                # A copy, as hooks can remove themselves, like the pre-import hook.
+                for fn in list(self.after_invocation_hooks):
+                    fn(self)
+            finally:
+                self._cold_start_var.reset(cold_start_token)
+                self._globals_var.reset(globals_token)
+                self._execution_context_var.reset(context_token)
+
+    def _dispatch_event(self, event: Event) -> Any:
+        """
+        Dispatches the event, passing any uncaught exceptions on to the registered
+        exception handlers.
+        """
         try:
-            response = self.dispatch(event=event)
+            with tracing.span("dispatch"):
+                if self.profiler is None:
+                    response = self.dispatch(event=event)
+                else:
+                    response = self.profiler.run(self.dispatch, event=event, route_key=self.current_route_key)
         except Exception as e:
             # The AWS Lambda environment catches all unhandled exceptions
             # without ever invoking the sys.excepthook handler, so this
             # mechanism is provided as a way to pass on those exceptions
             # without using sys.excepthook.
             if not isinstance(e, exceptions.HandledError):
-                for fn in self.exception_handlers:
-                    fn(self, event, e)
+                with tracing.span("exception_handlers"):
+                    self._report_exception(event, e)
             raise
         return response
@@ -1,13 +1,14 @@
 import abc
 import enum
 
-from typing import Any, Callable, Dict, Mapping, Optional
+from typing import Any, Callable, Dict, FrozenSet, List, Mapping, Optional, Sequence, Tuple, Union
 
 import attr
 
 from jsonpath_rw import parse
 
-from . import exceptions, interfaces
+from . import exceptions, interfaces, tracing
+from .routers import as_route
 
 
 class AuthorizationType(enum.Enum):
@@ -65,15 +66,132 @@ def _create_identity_from_raw(raw: Mapping[str, Any]):
         return IAMIdentity.from_raw(raw)
 
 
+@attr.s(kw_only=True, frozen=True)
+class SelectionSet:
+    """
+    The set of fields requested by a GraphQL query, parsed from the AppSync
+    ``selectionSetList`` (e.g. ``["id", "posts", "posts/id", "posts/title"]``).
+
+    :param paths: All the selected field paths.
+    :param fields: The top-level selected fields, in query order.
+    """
+
+    paths: FrozenSet[str] = attr.ib(repr=False)
+    fields: Tuple[str, ...] = attr.ib()
+    _child_paths: Mapping[str, List[str]] = attr.ib(repr=False, eq=False)
+    _children: Dict[str, "SelectionSet"] = attr.ib(init=False, repr=False, eq=False, factory=dict)
+
+    @classmethod
+    def from_list(cls, selection_set_list: Sequence[str]) -> "SelectionSet":
+        fields = []
+        child_paths: Dict[str, List[str]] = {}
+        for path in selection_set_list:
+            field, sep, child_path = path.partition("/")
+            if sep:
+                child_paths.setdefault(field, []).append(child_path)
+            else:
+                fields.append(path)
+        return cls(paths=frozenset(selection_set_list), fields=tuple(fields), child_paths=child_paths)
+
+    def __contains__(self, path: str) -> bool:
+        return path in self.paths
+
+    def __iter__(self):
+        return iter(self.fields)
+
+    def __len__(self) -> int:
+        return len(self.fields)
+
+    def has_children(self, field: str) -> bool:
+        """
+        Returns whether the given top-level field has a nested selection set.
+        """
+        return field in self._child_paths
+
+    def get(self, path: str) -> Optional["SelectionSet"]:
+        """
+        Returns the nested selection set of the field at the given path, e.g.
+        ``"posts"`` or ``"posts/author"``, or ``None`` if the field has no nested
+        selection set. Nested selection sets are cached.
+        """
+        field, sep, rest = path.partition("/")
+        try:
+            child = self._children[field]
+        except KeyError:
+            if field not in self._child_paths:
+                return None
+            child = self._children[field] = SelectionSet.from_list(self._child_paths[field])
+        if sep:
+            return child.get(rest)
+        return child
+
+    def projection(self, *, include_nested: bool = False, exclude: Sequence[str] = ()) -> List[str]:
+        """
+        Returns the top-level fields to fetch, in query order. Fields with a nested
+        selection set (usually relations resolved separately) and introspection
+        fields such as ``__typename`` are left out unless ``include_nested`` is set.
+
+        :param include_nested: Include fields with a nested selection set.
+        :param exclude: Any other fields to leave out.
+        """
+        return [
+            field
+            for field in self.fields
+            if not field.startswith("__")
+            and field not in exclude
+            and (include_nested or field not in self._child_paths)
+        ]
+
+    def dynamodb_projection(self, **options: Any) -> Optional[Tuple[str, Dict[str, str]]]:
+        """
+        Returns a DynamoDB ``ProjectionExpression`` and its
+        ``ExpressionAttributeNames`` for the ``projection`` of this selection set,
+        or ``None`` if no fields are projected, as DynamoDB rejects an empty
+        ``ProjectionExpression``, so it should be left out of the request.
+        """
+        names = {f"#f{index}": field for index, field in enumerate(self.projection(**options))}
+        if not names:
+            return None
+        return ", ".join(names), names
+
+
 @attr.s(kw_only=True, frozen=True)
 class Info:
+    """
+    The AppSync ``info`` for the resolved field.
+
+    :param field_name: The name of the field being resolved.
+    :param parent_type_name: The name of the parent type of the field.
+    :param variables: The variables passed to the GraphQL operation.
+    :param selection_set_list: The AppSync ``selectionSetList``.
+    :param selection_set_graphql: The AppSync ``selectionSetGraphQL``.
+    """
+
     field_name: str = attr.ib()
     parent_type_name: str = attr.ib(repr=False)
     variables: Mapping[str, Any] = attr.ib(repr=False)
+    selection_set_list: Tuple[str, ...] = attr.ib(repr=False, factory=tuple, converter=tuple)
+    selection_set_graphql: Optional[str] = attr.ib(repr=False, default=None)
+    _selection_set: Optional[SelectionSet] = attr.ib(init=False, repr=False, eq=False, default=None)
 
     @classmethod
     def from_raw(cls, raw):
-        return cls(field_name=raw["fieldName"], parent_type_name=raw["parentTypeName"], variables=raw["variables"])
+        return cls(
+            field_name=raw["fieldName"],
+            parent_type_name=raw["parentTypeName"],
+            variables=raw["variables"],
+            selection_set_list=raw.get("selectionSetList") or (),
+            selection_set_graphql=raw.get("selectionSetGraphQL"),
+        )
+
+    @property
+    def selection_set(self) -> SelectionSet:
+        """
+        The parsed ``selection_set_list``, parsed on first access.
+        """
+        if self._selection_set is None:
+            object.__setattr__(self, "_selection_set", SelectionSet.from_list(self.selection_set_list))
+        return self._selection_set
 
 
 @attr.s(kw_only=True, frozen=True)
@@ -141,16 +259,23 @@ class AppSyncField(interfaces.Router):
 
     routes: Dict[str, Callable] = attr.ib(init=False, factory=dict)
 
-    def add_route(self, *, fn: Callable, field: str) -> None:
+    def add_route(self, *, fn: Union[Callable, str], field: str) -> None:
         """
         Adds the route with the given field.
 
-        :param fn: The callable to route to.
-        :type fn: callable
+        :param fn: The callable to route to, or its ``"package.module:function"``
+            import string to import it on first use.
+        :type fn: callable or str
         :param field: The key to associate the route with.
         :type fn: str
         """
-        self.routes[field] = fn
+        self.routes[field] = as_route(fn)
+
+    def get_route_key(self, *, event: AppSyncEvent) -> Optional[str]:
+        """
+        Returns the GraphQL field name of the given event.
+        """
+        return event.info.field_name
 
     def get_route(self, *, event: AppSyncEvent) -> Callable:
         """
@@ -171,5 +296,8 @@ class AppSyncField(interfaces.Router):
 
         :param event: The event to pass to the callable route.
         """
-        route = self.get_route(event=event)
-        return route(event=event)
+        with tracing.span("field", field_name=event.info.field_name):
+            with tracing.span("get_route"):
+                route = self.get_route(event=event)
+            with tracing.span("route"):
+                return route(event=event)
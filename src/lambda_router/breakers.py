@@ -0,0 +1,235 @@
+import functools
+import threading
+import time
+
+from typing import Any, Callable, Dict, Optional, Tuple, Type
+
+import attr
+
+from . import exceptions
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+@attr.s(kw_only=True)
+class CircuitBreaker:
+    """
+    A thread safe circuit breaker for a downstream dependency, kept across warm
+    invocations.
+
+    While ``closed``, calls are made and their failures counted. After
+    ``failure_threshold`` consecutive failures the breaker opens, and calls fail fast
+    with a ``CircuitOpenError`` instead of waiting for the dependency to time out.
+    After ``reset_timeout`` seconds it's ``half_open``: up to ``half_open_max_calls``
+    concurrent probe calls are let through, and ``success_threshold`` successful
+    probes close it again, while a failed probe opens it again.
+
+    :param name: The name of the dependency.
+    :param failure_threshold: The number of consecutive failures that open the breaker.
+    :param reset_timeout: The time in seconds the breaker stays open before probing.
+    :param half_open_max_calls: The maximum number of concurrent probe calls.
+    :param success_threshold: The number of successful probes that close the breaker.
+    :param slow_call_duration: Calls taking longer than this many seconds count as
+        failures, even if they succeed.
+    :param failure_exceptions: The exceptions that count as failures.
+    :param ignored_exceptions: The exceptions that don't count as failures, e.g. expected
+        errors of the caller rather than the dependency.
+    :param clock: The monotonic clock used for the timeouts and durations.
+    """
+
+    name: str = attr.ib()
+    failure_threshold: int = attr.ib(default=5)
+    reset_timeout: float = attr.ib(default=30.0)
+    half_open_max_calls: int = attr.ib(default=1)
+    success_threshold: int = attr.ib(default=1)
+    slow_call_duration: Optional[float] = attr.ib(default=None)
+    failure_exceptions: Tuple[Type[BaseException], ...] = attr.ib(default=(Exception,), repr=False)
+    ignored_exceptions: Tuple[Type[BaseException], ...] = attr.ib(default=(exceptions.HandledError,), repr=False)
+    clock: Callable[[], float] = attr.ib(default=time.monotonic, repr=False)
+    state: str = attr.ib(init=False, default=CLOSED)
+    failures: int = attr.ib(init=False, default=0)
+    calls: int = attr.ib(init=False, default=0)
+    failed: int = attr.ib(init=False, default=0)
+    slow_calls: int = attr.ib(init=False, default=0)
+    rejected: int = attr.ib(init=False, default=0)
+    opened: int = attr.ib(init=False, default=0)
+    mean_duration: float = attr.ib(init=False, default=0.0)
+    _opened_at: float = attr.ib(init=False, default=0.0, repr=False)
+    _probes: int = attr.ib(init=False, default=0, repr=False)
+    _successes: int = attr.ib(init=False, default=0, repr=False)
+    _lock: threading.Lock = attr.ib(init=False, factory=threading.Lock, repr=False)
+
+    @failure_threshold.validator
+    @half_open_max_calls.validator
+    @success_threshold.validator
+    def _check_positive(self, attribute, value):
+        if value < 1:
+            raise ValueError(f"The {attribute.name} of a circuit breaker must be at least 1.")
+
+    def _open(self, now: float) -> None:
+        self.state = OPEN
+        self._opened_at = now
+        self._probes = 0
+        self._successes = 0
+        self.opened += 1
+
+    def before_call(self) -> bool:
+        """
+        Reserves a call, returning whether it's a half-open probe.
+
+        :raises lambda_router.exceptions.CircuitOpenError: Raised if the breaker is open.
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return False
+            now = self.clock()
+            if self.state == OPEN:
+                retry_after = self._opened_at + self.reset_timeout - now
+                if retry_after > 0:
+                    self.rejected += 1
+                    raise exceptions.CircuitOpenError(self.name, retry_after)
+                self.state = HALF_OPEN
+            if self._probes >= self.half_open_max_calls:
+                self.rejected += 1
+                raise exceptions.CircuitOpenError(self.name, 0.0)
+            self._probes += 1
+            return True
+
+    def after_call(self, *, duration: float, error: Optional[BaseException] = None, probe: bool = False) -> None:
+        """
+        Records the outcome of a call reserved with ``before_call``.
+
+        :param duration: The duration of the call in seconds.
+        :param error: The exception the call raised, if any.
+        :param probe: Whether the call was a half-open probe.
+        """
+        failed = (
+            error is not None
+            and isinstance(error, self.failure_exceptions)
+            and not isinstance(error, self.ignored_exceptions)
+        )
+        slow = self.slow_call_duration is not None and duration > self.slow_call_duration
+        with self._lock:
+            self.calls += 1
+            if self.calls == 1:
+                self.mean_duration = duration
+            else:
+                # An exponentially weighted moving average, for the metrics.
+                self.mean_duration += (duration - self.mean_duration) * 0.1
+            if probe:
+                self._probes -= 1
+            if slow:
+                self.slow_calls += 1
+            if failed:
+                self.failed += 1
+            if not failed and not slow:
+                if self.state == HALF_OPEN and probe:
+                    self._successes += 1
+                    if self._successes >= self.success_threshold:
+                        self.state = CLOSED
+                        self.failures = 0
+                elif self.state == CLOSED:
+                    self.failures = 0
+                return
+            if self.state == HALF_OPEN and probe:
+                self._open(self.clock())
+            elif self.state == CLOSED:
+                self.failures += 1
+                if self.failures >= self.failure_threshold:
+                    self._open(self.clock())
+
+    def call(self, fn: Callable, *args: Any, **kwargs: Any) -> Any:
+        """
+        Calls the function through the breaker.
+
+        :raises lambda_router.exceptions.CircuitOpenError: Raised if the breaker is open.
+        """
+        probe = self.before_call()
+        start = self.clock()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self.after_call(duration=self.clock() - start, error=e, probe=probe)
+            raise
+        self.after_call(duration=self.clock() - start, probe=probe)
+        return result
+
+    def wrap(self, fn: Callable) -> Callable:
+        """
+        Returns the function wrapped to be called through the breaker, e.g. a route.
+        """
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return self.call(fn, *args, **kwargs)
+
+        wrapper.breaker = self
+        return wrapper
+
+    def middleware(self, dispatch: Callable) -> Callable:
+        """
+        A middleware factory dispatching every event through the breaker, for use in
+        the ``MIDDLEWARE`` config::
+
+            config["MIDDLEWARE"] = [CircuitBreaker(name="payments").middleware]
+        """
+        return self.wrap(dispatch)
+
+    def reset(self) -> None:
+        """
+        Closes the breaker and forgets the failures.
+        """
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._probes = 0
+            self._successes = 0
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "failures": self.failures,
+                "calls": self.calls,
+                "failed": self.failed,
+                "slow_calls": self.slow_calls,
+                "rejected": self.rejected,
+                "opened": self.opened,
+                "mean_duration": self.mean_duration,
+            }
+
+
+@attr.s(kw_only=True)
+class BreakerRegistry:
+    """
+    The named circuit breakers of an ``App``, shared by all the routes calling the same
+    dependency.
+    """
+
+    breakers: Dict[str, CircuitBreaker] = attr.ib(init=False, factory=dict)
+
+    def register(self, name: str, **options: Any) -> CircuitBreaker:
+        """
+        Declares a circuit breaker. See ``CircuitBreaker`` for the options.
+
+        :raises ValueError: Raised if a breaker with the same name already exists.
+        """
+        if name in self.breakers:
+            raise ValueError(f"Circuit breaker ({name}) is already registered.")
+        breaker = self.breakers[name] = CircuitBreaker(name=name, **options)
+        return breaker
+
+    def __getitem__(self, name: str) -> CircuitBreaker:
+        try:
+            return self.breakers[name]
+        except KeyError:
+            raise KeyError(f"No circuit breaker registered as ({name}).")
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.breakers
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        return {name: breaker.metrics() for name, breaker in self.breakers.items()}
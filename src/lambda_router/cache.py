@@ -0,0 +1,280 @@
+import contextlib
+import functools
+import hashlib
+import logging
+import mmap
+import os
+import pickle
+import struct
+import tempfile
+import threading
+import time
+
+from typing import Any, Callable, Iterator, List, Mapping, Optional, Tuple
+
+import attr
+
+from .utils import callable_name
+
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+# Every entry starts with its expiry time, or 0 if it never expires.
+_HEADER = struct.Struct("<d")
+_TEMP_PREFIX = ".tmp-"
+_LOCK_NAME = ".lock"
+
+
+@attr.s(kw_only=True)
+class DiskCache:
+    """
+    A cache of pickled values in files in ``/tmp``, which survives warm invocations
+    and is shared by all the processes of the lambda, e.g. ``WorkerPool`` workers.
+    Used for expensive derived data, like compiled templates, downloaded reference
+    files or computed lookups, that would otherwise be rebuilt by every container or
+    kept in memory.
+
+    Each entry is a file, written to a temporary file and renamed into place, so
+    readers never see a partial entry. Large entries are read through a memory map,
+    without copying the file into memory before unpickling it. The total size of the
+    entries is bounded by ``max_size``: the least recently written entries are evicted
+    first, under an ``fcntl`` lock so concurrent processes don't evict at once.
+
+    :param directory: The directory of the cache files.
+    :param max_size: The maximum total size of the entries in bytes.
+    :param mmap_threshold: Entries of at least this many bytes are memory mapped,
+        smaller ones are read, which is faster for them.
+    :param clock: The wall clock used for the expiry of entries, shared by processes.
+    """
+
+    directory: str = attr.ib(default=os.path.join(tempfile.gettempdir(), "lambda_router_cache"))
+    max_size: int = attr.ib(default=256 * 1024 * 1024)
+    mmap_threshold: int = attr.ib(default=64 * 1024)
+    clock: Callable[[], float] = attr.ib(default=time.time, repr=False)
+    hits: int = attr.ib(init=False, default=0)
+    misses: int = attr.ib(init=False, default=0)
+    writes: int = attr.ib(init=False, default=0)
+    evictions: int = attr.ib(init=False, default=0)
+    # The size of the entries as of the last scan, plus the entries written since.
+    _size: Optional[int] = attr.ib(init=False, default=None, repr=False)
+    _lock: threading.Lock = attr.ib(init=False, factory=threading.Lock, repr=False)
+
+    @max_size.validator
+    def _check_max_size(self, attribute, value):
+        if value < 1:
+            raise ValueError("The max_size of a disk cache must be at least 1 byte.")
+
+    def __attrs_post_init__(self):
+        os.makedirs(self.directory, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Any]) -> "DiskCache":
+        """
+        Creates a ``DiskCache`` from the ``CACHE_DIR``, ``CACHE_MAX_SIZE`` and
+        ``CACHE_MMAP_THRESHOLD`` config values.
+        """
+        options = {}
+        for option in ("dir", "max_size", "mmap_threshold"):
+            config_key = f"CACHE_{option.upper()}"
+            if config.get(config_key, None):
+                name = "directory" if option == "dir" else option
+                options[name] = config[config_key] if option == "dir" else int(config[config_key])
+        return cls(**options)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(key.encode("utf-8")).hexdigest())
+
+    def _load(self, path: str) -> Any:
+        """
+        Returns the value of the entry file, or ``_MISSING`` if there is none or it
+        expired. An entry that can't be unpickled, e.g. a corrupt file or a value of a
+        class that changed since it was cached, is removed and counts as missing.
+        """
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            return _MISSING
+        try:
+            size = os.fstat(fd).st_size
+            start = _HEADER.size
+            if size < start:
+                return _MISSING
+            if size < self.mmap_threshold:
+                data = os.read(fd, size)
+                (expires_at,) = _HEADER.unpack_from(data)
+                if expires_at and expires_at <= self.clock():
+                    return _MISSING
+                return pickle.loads(memoryview(data)[start:])
+            with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as mapped:
+                (expires_at,) = _HEADER.unpack_from(mapped)
+                if expires_at and expires_at <= self.clock():
+                    return _MISSING
+                with memoryview(mapped) as view:
+                    return pickle.loads(view[start:])
+        except Exception:
+            logger.warning("Removing the unreadable cache entry (%s).", path, exc_info=True)
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+            return _MISSING
+        finally:
+            os.close(fd)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """
+        Returns the cached value of the key, or the ``default`` if there is none.
+        """
+        value = self._load(self.path(key))
+        with self._lock:
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self.hits += 1
+        return value
+
+    def __contains__(self, key: str) -> bool:
+        return self._load(self.path(key)) is not _MISSING
+
+    def set(self, key: str, value: Any, *, ttl: Optional[float] = None) -> None:
+        """
+        Caches the value of the key, replacing any cached value.
+
+        :param ttl: The time in seconds the value expires after, if ever.
+        """
+        header = _HEADER.pack(self.clock() + ttl if ttl is not None else 0.0)
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        size = len(header) + len(data)
+        if size > self.max_size:
+            return
+        fd, temp_path = tempfile.mkstemp(prefix=_TEMP_PREFIX, dir=self.directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(header)
+                f.write(data)
+            os.replace(temp_path, self.path(key))
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(temp_path)
+            raise
+        with self._lock:
+            self.writes += 1
+            if self._size is not None:
+                self._size += size
+            over = self._size is None or self._size > self.max_size
+        if over:
+            self._evict()
+
+    def delete(self, key: str) -> None:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self.path(key))
+
+    def clear(self) -> None:
+        """
+        Removes all the entries.
+        """
+        with self._locked():
+            for _, _, path in self._entries():
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(path)
+            with self._lock:
+                self._size = 0
+
+    @contextlib.contextmanager
+    def _locked(self) -> Iterator[None]:
+        """
+        Holds the lock of the cache directory, shared by all the processes using it.
+        """
+        try:
+            import fcntl
+        except ImportError:  # pragma: no cover
+            yield
+            return
+        fd = os.open(os.path.join(self.directory, _LOCK_NAME), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name == _LOCK_NAME or entry.name.startswith(_TEMP_PREFIX):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _evict(self) -> None:
+        """
+        Removes the least recently written entries until the entries fit in the
+        ``max_size``, rescanning the directory for the entries of all the processes.
+        """
+        with self._locked():
+            entries = self._entries()
+            size = sum(entry[1] for entry in entries)
+            if size > self.max_size:
+                entries.sort()
+                evicted = 0
+                for _, entry_size, path in entries:
+                    if size <= self.max_size:
+                        break
+                    with contextlib.suppress(FileNotFoundError):
+                        os.remove(path)
+                    size -= entry_size
+                    evicted += 1
+                with self._lock:
+                    self.evictions += evicted
+            with self._lock:
+                self._size = size
+
+    def memoize(
+        self, fn: Optional[Callable] = None, *, ttl: Optional[float] = None, key: Optional[Callable[..., str]] = None
+    ) -> Callable:
+        """
+        A decorator caching the results of a function, keyed on its name and the
+        ``repr`` of its arguments, or on the given ``key`` function called with the
+        same arguments. Can be used bare or with arguments::
+
+            @app.cache.memoize(ttl=3600)
+            def load_rates(currency):
+                ...
+
+        :param ttl: The time in seconds the results expire after, if ever.
+        :param key: Returns the cache key for the arguments of a call.
+        """
+
+        def decorator(fn: Callable) -> Callable:
+            prefix = callable_name(fn)
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if key is not None:
+                    cache_key = f"{prefix}:{key(*args, **kwargs)}"
+                else:
+                    cache_key = f"{prefix}:{args!r}:{sorted(kwargs.items())!r}"
+                value = self.get(cache_key, _MISSING)
+                if value is _MISSING:
+                    value = fn(*args, **kwargs)
+                    self.set(cache_key, value, ttl=ttl)
+                return value
+
+            return wrapper
+
+        if fn is not None:
+            return decorator(fn)
+        return decorator
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "writes": self.writes,
+                "evictions": self.evictions,
+                "size": self._size,
+            }
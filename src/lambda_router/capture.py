@@ -0,0 +1,265 @@
+import json
+import os
+import random
+import struct
+import threading
+import time
+import zlib
+
+from typing import IO, Any, Callable, FrozenSet, Iterable, Iterator, List, Mapping, Optional, Union
+
+import attr
+
+from . import shutdown
+from .interfaces import Event
+
+
+REDACTED = "[REDACTED]"
+
+# Each flushed chunk is written as a 4 byte big-endian length followed by the
+# zlib compressed JSON lines.
+_FRAME_HEADER = struct.Struct(">I")
+
+
+def redact(value: Any, *, fields: FrozenSet[str]) -> Any:
+    """
+    Returns a copy of the given value with any mapping keys present in ``fields``
+    replaced with ``REDACTED``. Nested mappings and lists are copied recursively so
+    the result is safe from later mutation of the original value.
+
+    :param value: The value to copy and redact.
+    :param fields: The names of the keys to redact.
+    """
+    if isinstance(value, Mapping):
+        return {key: (REDACTED if key in fields else redact(item, fields=fields)) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(item, fields=fields) for item in value]
+    return value
+
+
+@attr.s(kw_only=True)
+class RingBuffer:
+    """
+    A size-bounded, compressed on-disk buffer for captured events.
+
+    Records are buffered in memory and compressed into a single frame once
+    ``buffer_size`` bytes are pending (or on ``flush``). Frames are appended to one
+    of two segment files; when the active segment would grow beyond half of
+    ``max_bytes`` the older segment is truncated and becomes the active one, so
+    the newest records are kept and at most ``max_bytes`` are used on disk.
+
+    :param path: The path prefix for the segment files.
+    :param max_bytes: The maximum number of bytes kept on disk.
+    :param buffer_size: The number of uncompressed bytes buffered before writing. The
+        records buffered in memory are lost if the process is killed before they're
+        written, see ``capture_events``.
+    :param compression_level: The zlib compression level to use.
+    """
+
+    path: str = attr.ib(default="/tmp/lambda_router_capture")
+    max_bytes: int = attr.ib(default=10 * 1024 * 1024)
+    buffer_size: int = attr.ib(default=64 * 1024)
+    compression_level: int = attr.ib(default=6)
+    dropped: int = attr.ib(init=False, default=0)
+    _pending: List[bytes] = attr.ib(init=False, factory=list, repr=False)
+    _pending_size: int = attr.ib(init=False, default=0, repr=False)
+    _sequence: Optional[int] = attr.ib(init=False, default=None, repr=False)
+    _lock: threading.Lock = attr.ib(init=False, factory=threading.Lock, repr=False)
+
+    @property
+    def segments(self) -> List[str]:
+        """
+        The segment file paths, ordered from oldest to newest.
+        """
+        return [self._segment_path(sequence) for sequence in self._sequences()]
+
+    def _segment_path(self, sequence: int) -> str:
+        return f"{self.path}.{sequence}"
+
+    def _sequences(self) -> List[int]:
+        directory, prefix = os.path.split(self.path)
+        prefix += "."
+        try:
+            names = os.listdir(directory or ".")
+        except FileNotFoundError:
+            return []
+        start = len(prefix)
+        return sorted(int(name[start:]) for name in names if name.startswith(prefix) and name[start:].isdigit())
+
+    def append(self, record: Mapping[str, Any]) -> None:
+        """
+        Buffers a single record, writing out the buffer if it is full.
+
+        :param record: A JSON serialisable mapping.
+        """
+        line = json.dumps(record, separators=(",", ":"), default=str).encode("utf-8")
+        with self._lock:
+            self._pending.append(line)
+            self._pending_size += len(line) + 1
+            if self._pending_size >= self.buffer_size:
+                self._flush()
+
+    def flush(self) -> None:
+        """
+        Compresses and writes any buffered records to disk.
+        """
+        with self._lock:
+            self._flush()
+
+    def _segment_size(self, sequence: int) -> int:
+        try:
+            return os.path.getsize(self._segment_path(sequence))
+        except FileNotFoundError:
+            return 0
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        data = zlib.compress(b"\n".join(self._pending) + b"\n", self.compression_level)
+        self._pending = []
+        self._pending_size = 0
+        frame = _FRAME_HEADER.pack(len(data)) + data
+        segment_limit = self.max_bytes // 2
+        if len(frame) > segment_limit:
+            # A single frame that doesn't fit in a segment would break the size bound.
+            self.dropped += 1
+            return
+        if self._sequence is None:
+            sequences = self._sequences()
+            self._sequence = sequences[-1] if sequences else 0
+        mode = "ab"
+        if self._segment_size(self._sequence) + len(frame) > segment_limit:
+            self._sequence += 1
+            mode = "wb"
+            # Only the previous segment is kept alongside the new one.
+            for sequence in self._sequences():
+                if sequence < self._sequence - 1:
+                    os.remove(self._segment_path(sequence))
+        with open(self._segment_path(self._sequence), mode) as f:
+            f.write(frame)
+
+
+def read_records(path: str) -> Iterator[Mapping[str, Any]]:
+    """
+    Yields all the records stored in the ring buffer at the given path, oldest first.
+    A partially written frame at the end of a segment is ignored.
+
+    :param path: The path prefix of the ring buffer segment files.
+    """
+    for segment in RingBuffer(path=path).segments:
+        with open(segment, "rb") as f:
+            while True:
+                header = f.read(_FRAME_HEADER.size)
+                if len(header) < _FRAME_HEADER.size:
+                    break
+                (length,) = _FRAME_HEADER.unpack(header)
+                data = f.read(length)
+                if len(data) < length:
+                    break
+                for line in zlib.decompress(data).splitlines():
+                    yield json.loads(line)
+
+
+def export_jsonl(path: str, output: Union[str, IO[str]], *, include_metadata: bool = False) -> int:
+    """
+    Converts the ring buffer at the given path into JSON lines, one raw event per
+    line, as consumed by replay tools.
+
+    :param path: The path prefix of the ring buffer segment files.
+    :param output: A file path or text file object to write to.
+    :param include_metadata: Write the full capture record instead of only the event.
+    :returns: The number of lines written.
+    """
+    if isinstance(output, str):
+        with open(output, "w") as f:
+            return _write_jsonl(read_records(path), f, include_metadata=include_metadata)
+    return _write_jsonl(read_records(path), output, include_metadata=include_metadata)
+
+
+def _write_jsonl(records: Iterable[Mapping[str, Any]], output: IO[str], *, include_metadata: bool) -> int:
+    count = 0
+    for record in records:
+        output.write(json.dumps(record if include_metadata else record["event"]))
+        output.write("\n")
+        count += 1
+    return count
+
+
+@attr.s(kw_only=True)
+class EventCapture:
+    """
+    Middleware that samples events into a ``RingBuffer``.
+
+    A ``sample_rate`` fraction of events is captured, as well as any event whose
+    dispatch takes at least ``slow_threshold`` seconds. Sampled events are copied
+    before dispatch; slow events can only be copied after dispatch, so any changes
+    made to ``Event.raw`` by the routes will be visible in the captured event.
+
+    :param dispatch: The next callable in the middleware chain.
+    :param buffer: The ``RingBuffer`` to write captured events to.
+    :param sample_rate: The fraction of events to capture.
+    :param slow_threshold: The dispatch duration in seconds above which events are always captured.
+    :param redact_fields: The names of any keys to redact from captured events.
+    """
+
+    dispatch: Callable = attr.ib(repr=False)
+    buffer: RingBuffer = attr.ib()
+    sample_rate: float = attr.ib(default=0.01)
+    slow_threshold: Optional[float] = attr.ib(default=None)
+    redact_fields: FrozenSet[str] = attr.ib(default=frozenset(), converter=frozenset)
+    random: Callable[[], float] = attr.ib(default=random.random, repr=False)
+
+    def _record(self, raw: Any, *, reason: str, duration: float) -> None:
+        self.buffer.append({"timestamp": time.time(), "reason": reason, "duration": duration, "event": raw})
+
+    def __call__(self, *, event: Event) -> Any:
+        sampled = self.random() < self.sample_rate
+        if not sampled and self.slow_threshold is None:
+            return self.dispatch(event=event)
+
+        snapshot = redact(event.raw, fields=self.redact_fields) if sampled else None
+        start = time.perf_counter()
+        try:
+            return self.dispatch(event=event)
+        finally:
+            duration = time.perf_counter() - start
+            if sampled:
+                self._record(snapshot, reason="sampled", duration=duration)
+            elif duration >= self.slow_threshold:
+                self._record(redact(event.raw, fields=self.redact_fields), reason="slow", duration=duration)
+
+
+def capture_events(
+    *,
+    path: str = "/tmp/lambda_router_capture",
+    sample_rate: float = 0.01,
+    slow_threshold: Optional[float] = None,
+    redact_fields: Iterable[str] = (),
+    max_bytes: int = 10 * 1024 * 1024,
+    buffer_size: int = 64 * 1024,
+) -> Callable[[Callable], EventCapture]:
+    """
+    Creates an ``EventCapture`` middleware for use in the ``MIDDLEWARE`` config, e.g.::
+
+        config["MIDDLEWARE"] = [capture_events(sample_rate=0.05, slow_threshold=1.0, redact_fields=["token"])]
+
+    Captured events are written to disk once ``buffer_size`` bytes of them are
+    buffered, and when the execution environment shuts down, see
+    ``lambda_router.shutdown.register``. The runtime only signals the shutdown to
+    lambdas with an extension; without one, up to ``buffer_size`` bytes of the most
+    recently captured events are lost when the process is killed, so use a small
+    ``buffer_size`` to bound the loss, or ``0`` to write every event when captured.
+    """
+    buffer = RingBuffer(path=path, max_bytes=max_bytes, buffer_size=buffer_size)
+    shutdown.register(buffer.flush)
+
+    def middleware(dispatch: Callable) -> EventCapture:
+        return EventCapture(
+            dispatch=dispatch,
+            buffer=buffer,
+            sample_rate=sample_rate,
+            slow_threshold=slow_threshold,
+            redact_fields=redact_fields,
+        )
+
+    return middleware
@@ -0,0 +1,330 @@
+import collections
+import concurrent.futures
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import attr
+
+from . import tracing
+from .interfaces import ObjectStore
+
+
+logger = logging.getLogger(__name__)
+
+# The class name tagging the pointers of the Amazon SQS/SNS Extended Client Libraries.
+POINTER_CLASS = "software.amazon.payloadoffloading.PayloadS3Pointer"
+
+
+@attr.s(kw_only=True, frozen=True, slots=True)
+class PayloadPointer:
+    """
+    A pointer to a message payload stored outside the message.
+
+    :param bucket: The bucket the payload is stored in.
+    :param key: The key of the payload object.
+    """
+
+    bucket: str = attr.ib()
+    key: str = attr.ib()
+
+
+def parse_pointer(raw_body: Optional[str]) -> Optional[PayloadPointer]:
+    """
+    Returns the payload pointer of a message body in the Extended Client Library
+    format, ``["software.amazon.payloadoffloading.PayloadS3Pointer", {"s3BucketName":
+    ..., "s3Key": ...}]``, or ``None`` if the body isn't a pointer.
+    """
+    # Only bodies starting with the tag are decoded.
+    if not raw_body or POINTER_CLASS not in raw_body[:128]:
+        return None
+    try:
+        value = json.loads(raw_body)
+    except ValueError:
+        return None
+    if not isinstance(value, list) or len(value) != 2 or value[0] != POINTER_CLASS or not isinstance(value[1], dict):
+        return None
+    try:
+        return PayloadPointer(bucket=value[1]["s3BucketName"], key=value[1]["s3Key"])
+    except KeyError:
+        return None
+
+
+@attr.s(kw_only=True)
+class FileSystemStore(ObjectStore):
+    """
+    An object store on the local file system, storing objects as ``root/bucket/key``.
+    A stand-in for S3 in tests and local runs.
+
+    :param root: The directory of the buckets.
+    """
+
+    root: str = attr.ib()
+
+    def path(self, *, bucket: str, key: str) -> str:
+        """
+        :raises ValueError: Raised if the object would be outside the ``root``.
+        """
+        root = os.path.abspath(self.root)
+        path = os.path.abspath(os.path.join(root, bucket, key))
+        if not path.startswith(root + os.sep):
+            raise ValueError(f"Object ({bucket}/{key}) is outside the store.")
+        return path
+
+    def get(self, *, bucket: str, key: str) -> bytes:
+        with open(self.path(bucket=bucket, key=key), "rb") as f:
+            return f.read()
+
+    def put(self, *, bucket: str, key: str, data: bytes) -> None:
+        path = self.path(bucket=bucket, key=key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+
+
+@attr.s(kw_only=True)
+class S3Store(ObjectStore):
+    """
+    An object store backed by S3. Requires ``boto3``.
+
+    :param client: The boto3 S3 client, created on first use if not given.
+    """
+
+    client: Any = attr.ib(default=None, repr=False)
+
+    def get(self, *, bucket: str, key: str) -> bytes:
+        if self.client is None:
+            import boto3
+
+            self.client = boto3.client("s3")
+        return self.client.get_object(Bucket=bucket, Key=key)["Body"].read()
+
+
+@attr.s(kw_only=True)
+class PayloadCache:
+    """
+    A thread safe, least recently used cache of fetched payloads, bounded by their
+    total size. Payloads are kept in memory, or as files in the ``directory`` (e.g. in
+    ``/tmp``) to keep them out of the lambda's memory. Payload objects are assumed to
+    be immutable, as the ones written by the Extended Client Libraries are.
+
+    :param max_size: The maximum total size of the cached payloads in bytes.
+    :param directory: The directory to store the payloads in, or ``None`` to keep
+        them in memory.
+    """
+
+    max_size: int = attr.ib(default=64 * 1024 * 1024)
+    directory: Optional[str] = attr.ib(default=None)
+    size: int = attr.ib(init=False, default=0)
+    hits: int = attr.ib(init=False, default=0)
+    misses: int = attr.ib(init=False, default=0)
+    _entries: "collections.OrderedDict[Tuple[str, str], Any]" = attr.ib(
+        init=False, factory=collections.OrderedDict, repr=False
+    )
+    _lock: threading.Lock = attr.ib(init=False, factory=threading.Lock, repr=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _path(self, entry: Tuple[str, str]) -> str:
+        name = hashlib.sha256("/".join(entry).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, name)
+
+    def get(self, pointer: PayloadPointer) -> Optional[bytes]:
+        entry = (pointer.bucket, pointer.key)
+        with self._lock:
+            if entry not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(entry)
+            self.hits += 1
+            value = self._entries[entry]
+        if self.directory is None:
+            return value[0]
+        try:
+            with open(self._path(entry), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            with self._lock:
+                self._discard(entry)
+            return None
+
+    def set(self, pointer: PayloadPointer, data: bytes) -> None:
+        if len(data) > self.max_size:
+            return
+        entry = (pointer.bucket, pointer.key)
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok=True)
+            # Written atomically, concurrent readers see the whole file or none.
+            fd, temp_path = tempfile.mkstemp(dir=self.directory)
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, self._path(entry))
+        with self._lock:
+            self._discard(entry, remove=False)
+            self._entries[entry] = (data if self.directory is None else None, len(data))
+            self.size += len(data)
+            while self.size > self.max_size:
+                self._discard(next(iter(self._entries)))
+
+    def _discard(self, entry: Tuple[str, str], *, remove: bool = True) -> None:
+        value = self._entries.pop(entry, None)
+        if value is None:
+            return
+        self.size -= value[1]
+        if remove and self.directory is not None:
+            try:
+                os.remove(self._path(entry))
+            except FileNotFoundError:
+                pass
+
+    def clear(self) -> None:
+        with self._lock:
+            for entry in list(self._entries):
+                self._discard(entry)
+
+
+@attr.s(kw_only=True)
+class ClaimCheck:
+    """
+    Resolves the messages whose bodies are claim-check pointers to payloads stored
+    outside the message, in the format of the Amazon SQS/SNS Extended Client
+    Libraries. The payloads of a batch are fetched concurrently from the ``store``,
+    and replace the raw bodies of the messages. They're decoded right away, rather
+    than on first use like other message bodies, so a payload that can't be decoded
+    only fails its own message.
+
+    :param store: The object store the payloads are fetched from, S3 by default.
+    :param cache: The cache of fetched payloads, if any.
+    :param max_workers: The maximum number of concurrent fetches.
+    """
+
+    store: ObjectStore = attr.ib(factory=S3Store)
+    cache: Optional[PayloadCache] = attr.ib(default=None)
+    max_workers: int = attr.ib(default=8)
+    fetched: int = attr.ib(init=False, default=0)
+    failed: int = attr.ib(init=False, default=0)
+    fetch_time: float = attr.ib(init=False, default=0.0)
+    _executor: Optional[concurrent.futures.ThreadPoolExecutor] = attr.ib(init=False, default=None, repr=False)
+
+    @max_workers.validator
+    def _check_max_workers(self, attribute, value):
+        if value < 1:
+            raise ValueError("A claim check needs at least 1 worker.")
+
+    def _fetch(self, pointer: PayloadPointer) -> bytes:
+        with tracing.span("fetch_payload", bucket=pointer.bucket, key=pointer.key):
+            data = self.store.get(bucket=pointer.bucket, key=pointer.key)
+        if self.cache is not None:
+            self.cache.set(pointer, data)
+        return data
+
+    def _fetch_all(self, pointers: List[PayloadPointer]) -> List[Any]:
+        """
+        Fetches the payloads, returning the data or the exception raised for each.
+        """
+        if len(pointers) == 1 or self.max_workers == 1:
+            results: List[Any] = []
+            for pointer in pointers:
+                try:
+                    results.append(self._fetch(pointer))
+                except Exception as e:
+                    results.append(e)
+            return results
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="lambda_router.claimcheck"
+            )
+        # Each fetch runs in its own copy of the current context, so its span is part of
+        # the invocation's trace.
+        futures = [self._executor.submit(contextvars.copy_context().run, self._fetch, pointer) for pointer in pointers]
+        return [future.exception() or future.result() for future in futures]
+
+    def resolve(self, messages: Sequence[Any]) -> List[Any]:
+        """
+        Fetches the payloads of the given ``SQSMessage``s that are pointers, setting
+        their raw bodies and ``pointer``. A payload that can't be fetched or decoded is
+        logged, and only fails the messages pointing to it.
+
+        :returns: The messages whose payloads couldn't be fetched or decoded, which
+            are left unresolved.
+        """
+        pending: Dict[PayloadPointer, List[Any]] = {}
+        unresolved = []
+        for message in messages:
+            pointer = parse_pointer(message.raw_body)
+            if pointer is None:
+                continue
+            message.pointer = pointer
+            data = None if self.cache is None else self.cache.get(pointer)
+            if data is not None:
+                if not self._set_payload(message, data):
+                    unresolved.append(message)
+                continue
+            pending.setdefault(pointer, []).append(message)
+        if not pending:
+            return unresolved
+        start = time.perf_counter()
+        with tracing.span("claim_check", size=len(pending)):
+            results = self._fetch_all(list(pending))
+        self.fetch_time += time.perf_counter() - start
+        for (pointer, pointed), result in zip(pending.items(), results):
+            if isinstance(result, BaseException):
+                logger.error(
+                    "Failed to fetch the payload (%s/%s) of %d messages: %r",
+                    pointer.bucket,
+                    pointer.key,
+                    len(pointed),
+                    result,
+                    exc_info=result,
+                )
+                self.failed += 1
+                unresolved.extend(pointed)
+                continue
+            self.fetched += 1
+            for message in pointed:
+                if not self._set_payload(message, result):
+                    unresolved.append(message)
+        return unresolved
+
+    def _set_payload(self, message: Any, data: bytes) -> bool:
+        """
+        Sets the payload as the raw body of the message and decodes it, returning
+        whether it could be decoded.
+        """
+        try:
+            message.set_raw_body(data.decode("utf-8"))
+            message.body
+        except Exception as e:
+            # E.g. a payload that isn't text or JSON, or doesn't match the encoding.
+            logger.error(
+                "Failed to decode the payload (%s/%s) of message (%s): %r",
+                message.pointer.bucket,
+                message.pointer.key,
+                message.meta.get("messageId"),
+                e,
+            )
+            self.failed += 1
+            return False
+        return True
+
+    def metrics(self) -> Dict[str, Any]:
+        metrics = {"fetched": self.fetched, "failed": self.failed, "fetch_time": self.fetch_time}
+        if self.cache is not None:
+            metrics.update(cache_hits=self.cache.hits, cache_misses=self.cache.misses, cache_size=self.cache.size)
+        return metrics
+
+    def close(self) -> None:
+        """
+        Stops the fetching threads. They're started again on next use.
+        """
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
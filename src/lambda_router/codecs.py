@@ -0,0 +1,99 @@
+import binascii
+import json
+import lzma
+import zlib
+
+from typing import Any, Callable, Dict
+
+import attr
+
+
+DEFAULT_ENCODING_KEY = "content-encoding"
+# The encoding of bodies that aren't compressed, as in the HTTP Content-Encoding.
+IDENTITY = "identity"
+
+
+@attr.s(kw_only=True, frozen=True)
+class Codec:
+    """
+    A compression codec for message bodies. Compressed bodies are sent base64
+    encoded, as SQS message bodies must be text.
+
+    :param name: The name of the codec, the value of the encoding message attribute.
+    :param compress: Compresses ``bytes``.
+    :param decompress: Decompresses ``bytes``.
+    """
+
+    name: str = attr.ib()
+    compress: Callable[[bytes], bytes] = attr.ib(repr=False)
+    decompress: Callable[[bytes], bytes] = attr.ib(repr=False)
+
+    def decode(self, body: str) -> bytes:
+        """
+        Returns the decompressed bytes of a base64 encoded body.
+        """
+        # ``a2b_base64`` takes the ASCII text as is, without encoding it to bytes first.
+        return self.decompress(binascii.a2b_base64(body))
+
+    def encode(self, data: bytes) -> str:
+        """
+        Returns the compressed, base64 encoded body for the given bytes.
+        """
+        return binascii.b2a_base64(self.compress(data), newline=False).decode("ascii")
+
+
+def _gzip_compress(data: bytes) -> bytes:
+    # ``gzip.compress`` goes through a ``GzipFile``, zlib writes the gzip format directly.
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _gzip_decompress(data: bytes) -> bytes:
+    return zlib.decompress(data, 16 + zlib.MAX_WBITS)
+
+
+CODECS: Dict[str, Codec] = {}
+
+
+def register_codec(codec: Codec) -> None:
+    """
+    Adds a codec to the registry, replacing any codec with the same name.
+    """
+    CODECS[codec.name] = codec
+
+
+def get_codec(name: str) -> Codec:
+    """
+    Returns the registered codec with the given name.
+
+    :raises ValueError: Raised for an unknown codec.
+    """
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise ValueError(f"Unknown content encoding ({name}).")
+
+
+register_codec(Codec(name="gzip", compress=_gzip_compress, decompress=_gzip_decompress))
+register_codec(Codec(name="zlib", compress=zlib.compress, decompress=zlib.decompress))
+register_codec(Codec(name="lzma", compress=lzma.compress, decompress=lzma.decompress))
+
+
+def encode_message(body: Any, *, encoding: str = "gzip", key: str = DEFAULT_ENCODING_KEY) -> Dict[str, Any]:
+    """
+    Encodes a body as JSON and compresses it with the given codec, for producers of
+    messages routed by an ``SQSMessageField``. Returns the ``MessageBody`` and
+    ``MessageAttributes`` arguments of the SQS ``SendMessage`` API::
+
+        sqs.send_message(QueueUrl=url, **encode_message(body))
+
+    :param body: The JSON serialisable body.
+    :param encoding: The name of the codec.
+    :param key: The name of the encoding message attribute.
+    :raises ValueError: Raised for an unknown codec.
+    """
+    codec = get_codec(encoding)
+    return {
+        "MessageBody": codec.encode(json.dumps(body, separators=(",", ":")).encode("utf-8")),
+        "MessageAttributes": {key: {"DataType": "String", "StringValue": encoding}},
+    }
@@ -0,0 +1,225 @@
+import asyncio
+import inspect
+
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Mapping, Optional
+
+import attr
+
+
+SESSION_KEY = "dataloaders"
+
+
+class Pending:
+    """
+    The eventual result of a ``DataLoader.load`` call. Getting the ``result`` fetches
+    all the keys queued on the loader so far in a single batch.
+    """
+
+    __slots__ = ("loader", "key", "done", "_value", "_error", "_waiters")
+
+    def __init__(self, loader: "DataLoader", key: Hashable):
+        self.loader = loader
+        self.key = key
+        self.done = False
+        self._value: Any = None
+        self._error: Optional[BaseException] = None
+        self._waiters: List[asyncio.Future] = []
+
+    def __repr__(self) -> str:
+        return f"Pending(key={self.key!r}, done={self.done})"
+
+    def _resolve(self, value: Any = None, error: Optional[BaseException] = None) -> None:
+        self.done = True
+        self._value = value
+        self._error = error
+        for waiter in self._waiters:
+            if not waiter.done():
+                if error is not None:
+                    waiter.set_exception(error)
+                else:
+                    waiter.set_result(value)
+        self._waiters = []
+
+    def result(self) -> Any:
+        """
+        Returns the loaded value, dispatching the loader's queued keys if needed.
+
+        :raises Exception: Raised if the batch function failed or returned an
+            exception for this key.
+        """
+        if not self.done:
+            self.loader.dispatch()
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+
+@attr.s(kw_only=True)
+class DataLoader:
+    """
+    Coalesces individual ``load(key)`` calls into batched calls of ``batch_fn``,
+    deduplicating the keys and caching the results for the lifetime of the loader.
+    Loaders are usually scoped to a single invocation, see ``get_loader``.
+
+    The ``batch_fn`` is called with a list of unique keys and must return either a
+    sequence of values in the same order or a mapping of keys to values (missing
+    keys load as ``None``). Returning an exception instance as a value fails the load
+    of that key only. The ``batch_fn`` can be a coroutine function when the loader
+    is only used via ``aload``.
+
+    :param batch_fn: The function that fetches a batch of keys.
+    :param max_batch_size: Splits the keys into batches of at most this size.
+    :param cache: Whether to cache the loaded values. Without the cache, keys loaded
+        more than once before their batch is fetched are still only fetched once.
+    """
+
+    batch_fn: Callable[[List[Hashable]], Any] = attr.ib()
+    max_batch_size: Optional[int] = attr.ib(default=None)
+    cache: bool = attr.ib(default=True)
+    batches: int = attr.ib(init=False, default=0)
+    _cache: Dict[Hashable, Pending] = attr.ib(init=False, factory=dict, repr=False)
+    _queue: Dict[Hashable, Pending] = attr.ib(init=False, factory=dict, repr=False)
+    _scheduled: bool = attr.ib(init=False, default=False, repr=False)
+
+    def load(self, key: Hashable) -> Pending:
+        """
+        Queues the given key and returns a ``Pending`` result for it.
+        """
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+        try:
+            return self._queue[key]
+        except KeyError:
+            pass
+        pending = self._queue[key] = Pending(self, key)
+        if self.cache:
+            self._cache[key] = pending
+        return pending
+
+    def load_many(self, keys: Iterable[Hashable]) -> List[Any]:
+        """
+        Loads all the given keys, fetching any uncached keys in a single batch.
+        """
+        pendings = [self.load(key) for key in keys]
+        return [pending.result() for pending in pendings]
+
+    async def aload(self, key: Hashable) -> Any:
+        """
+        Loads the given key from a coroutine. All the keys loaded by concurrently
+        running tasks before the event loop's next iteration are fetched together.
+        """
+        pending = self.load(key)
+        if pending.done:
+            return pending.result()
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        pending._waiters.append(waiter)
+        if not self._scheduled:
+            self._scheduled = True
+            loop.call_soon(self._dispatch_soon, loop)
+        return await waiter
+
+    async def aload_many(self, keys: Iterable[Hashable]) -> List[Any]:
+        return list(await asyncio.gather(*(self.aload(key) for key in keys)))
+
+    def prime(self, key: Hashable, value: Any) -> None:
+        """
+        Adds the given value to the cache, unless the key is already cached.
+        """
+        if key not in self._cache:
+            pending = Pending(self, key)
+            pending._resolve(value)
+            self._cache[key] = pending
+
+    def clear(self, key: Hashable) -> None:
+        self._cache.pop(key, None)
+
+    def clear_all(self) -> None:
+        self._cache.clear()
+
+    def _take_batches(self) -> List[List[Pending]]:
+        queue = list(self._queue.values())
+        self._queue = {}
+        size = self.max_batch_size or len(queue) or 1
+        batches = []
+        for start in range(0, len(queue), size):
+            end = start + size
+            batches.append(queue[start:end])
+        return batches
+
+    def _resolve_batch(self, batch: List[Pending], values: Any) -> None:
+        if isinstance(values, Mapping):
+            values = [values.get(pending.key) for pending in batch]
+        else:
+            values = list(values)
+            if len(values) != len(batch):
+                error = ValueError(f"DataLoader batch function returned {len(values)} values for {len(batch)} keys.")
+                return self._fail_batch(batch, error)
+        for pending, value in zip(batch, values):
+            if isinstance(value, Exception):
+                pending._resolve(error=value)
+                self._cache.pop(pending.key, None)
+            else:
+                pending._resolve(value)
+
+    def _fail_batch(self, batch: List[Pending], error: BaseException) -> None:
+        for pending in batch:
+            pending._resolve(error=error)
+            self._cache.pop(pending.key, None)
+
+    def dispatch(self) -> None:
+        """
+        Fetches all the queued keys with the (synchronous) ``batch_fn``.
+        """
+        if inspect.iscoroutinefunction(self.batch_fn):
+            raise TypeError("A DataLoader with an async batch function can only be used via aload.")
+        for batch in self._take_batches():
+            self.batches += 1
+            try:
+                values = self.batch_fn([pending.key for pending in batch])
+            except Exception as e:
+                self._fail_batch(batch, e)
+            else:
+                self._resolve_batch(batch, values)
+
+    def _dispatch_soon(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._scheduled = False
+        if not inspect.iscoroutinefunction(self.batch_fn):
+            self.dispatch()
+            return
+        for batch in self._take_batches():
+            self.batches += 1
+            loop.create_task(self._dispatch_async(batch))
+
+    async def _dispatch_async(self, batch: List[Pending]) -> None:
+        try:
+            values = await self.batch_fn([pending.key for pending in batch])
+        except Exception as e:
+            self._fail_batch(batch, e)
+        else:
+            self._resolve_batch(batch, values)
+
+
+def get_loader(event: Any, batch_fn: Callable, *, name: Optional[str] = None, **options: Any) -> DataLoader:
+    """
+    Returns the ``DataLoader`` for the given batch function stored in the
+    ``session`` of the given event, creating it on first use. As the session lives
+    for a single invocation, so do the loader and its cache. All the ``SQSMessage``
+    objects of a batch share the session of their event.
+
+    :param event: The ``Event`` (or any object with a ``session`` dict).
+    :param batch_fn: The batch function of the loader.
+    :param name: The name to store the loader under, defaults to the qualified
+        name of the batch function.
+    :param options: Any other options passed on to the ``DataLoader``.
+    """
+    if name is None:
+        name = f"{batch_fn.__module__}.{batch_fn.__qualname__}"
+    loaders = event.session.setdefault(SESSION_KEY, {})
+    try:
+        return loaders[name]
+    except KeyError:
+        loader = loaders[name] = DataLoader(batch_fn=batch_fn, **options)
+        return loader
@@ -0,0 +1,209 @@
+import collections
+import logging
+import os
+import threading
+import tracemalloc
+
+from typing import Any, Callable, Deque, Dict, List, Mapping, Optional, Tuple
+
+import attr
+
+
+# Allocations by the import machinery and tracemalloc itself aren't leaks of the app.
+_IGNORED_FILES = ("<frozen importlib._bootstrap>", "<frozen importlib._bootstrap_external>", tracemalloc.__file__)
+
+
+class _StatmReader:
+    """
+    Reads the resident set size from ``/proc/self/statm``. The file is kept open and
+    re-read in place, which is several times faster than opening it every time, and
+    reopened in forked processes, as it's the file of the process that opened it.
+    """
+
+    def __init__(self):
+        self._pid: Optional[int] = None
+        self._fd: Optional[int] = None
+
+    def __call__(self) -> Optional[int]:
+        try:
+            pid = os.getpid()
+            if self._pid != pid:
+                self._fd = os.open("/proc/self/statm", os.O_RDONLY)
+                self._pid = pid
+            return int(os.pread(self._fd, 128, 0).split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (AttributeError, OSError, ValueError, IndexError):
+            return None
+
+
+_read_statm = _StatmReader()
+
+
+def current_rss() -> Optional[int]:
+    """
+    Returns the resident set size of the process in bytes, or ``None`` where it
+    can't be read (outside Linux).
+    """
+    return _read_statm()
+
+
+@attr.s(kw_only=True)
+class MemoryMonitor:
+    """
+    Detects memory growing across warm invocations, e.g. from caches in
+    ``App.globals`` or module state that are never cleared.
+
+    The resident set size is recorded after every invocation. A warning is logged
+    when it grew more than ``growth_threshold`` bytes since the first invocation or
+    the last warning. With a ``snapshot_interval``, ``tracemalloc`` snapshots are
+    taken every so many invocations, and the ``top`` source lines whose allocations
+    grew the most since the previous snapshot are logged.
+
+    Recording the RSS costs a couple of microseconds per invocation. Tracing allocations
+    with ``tracemalloc`` slows down every allocation of the process, making allocation
+    heavy code several times slower, so snapshots should only be enabled while
+    investigating. When neither is configured, no monitor is created, and invocations
+    have no overhead at all (see ``benchmarks/bench_diagnostics.py``).
+
+    :param snapshot_interval: The number of invocations between ``tracemalloc``
+        snapshots, or ``0`` to not trace allocations.
+    :param growth_threshold: The RSS growth in bytes to warn about, if any.
+    :param top: The number of source lines to report the allocation growth of.
+    :param traceback_depth: The number of frames ``tracemalloc`` records per allocation.
+    :param history: The number of invocations to keep the RSS of.
+    :param rss: Returns the current RSS in bytes.
+    :param logger: The logger the growth is reported to.
+    """
+
+    snapshot_interval: int = attr.ib(default=0, converter=int)
+    growth_threshold: Optional[int] = attr.ib(default=None)
+    top: int = attr.ib(default=10, converter=int)
+    traceback_depth: int = attr.ib(default=1, converter=int)
+    history: int = attr.ib(default=100)
+    rss: Callable[[], Optional[int]] = attr.ib(default=current_rss, repr=False)
+    logger: logging.Logger = attr.ib(factory=lambda: logging.getLogger(__name__), repr=False)
+    invocations: int = attr.ib(init=False, default=0)
+    warnings: int = attr.ib(init=False, default=0)
+    baseline_rss: Optional[int] = attr.ib(init=False, default=None)
+    peak_rss: Optional[int] = attr.ib(init=False, default=None)
+    rss_history: Deque[Optional[int]] = attr.ib(init=False, repr=False)
+    growth: List[Tuple[str, int, int]] = attr.ib(init=False, factory=list, repr=False)
+    _snapshot: Optional[tracemalloc.Snapshot] = attr.ib(init=False, default=None, repr=False)
+    _lock: threading.Lock = attr.ib(init=False, factory=threading.Lock, repr=False)
+
+    @rss_history.default
+    def _default_rss_history(self):
+        return collections.deque(maxlen=self.history)
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Any], *, logger: logging.Logger) -> Optional["MemoryMonitor"]:
+        """
+        Creates a ``MemoryMonitor`` from the ``MEMORY_*`` config values, returning ``None``
+        when neither ``MEMORY_SNAPSHOT_INTERVAL`` nor ``MEMORY_GROWTH_THRESHOLD`` are set.
+        """
+        snapshot_interval = int(config.get("MEMORY_SNAPSHOT_INTERVAL", 0) or 0)
+        growth_threshold = config.get("MEMORY_GROWTH_THRESHOLD", None)
+        if not snapshot_interval and not growth_threshold:
+            return None
+        options = {
+            "snapshot_interval": snapshot_interval,
+            "growth_threshold": int(growth_threshold) if growth_threshold else None,
+            "logger": logger,
+        }
+        for option in ("top", "traceback_depth"):
+            config_key = f"MEMORY_{option.upper()}"
+            if config_key in config:
+                options[option] = config[config_key]
+        return cls(**options)
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self) -> None:
+        """
+        Starts tracing allocations, if snapshots are enabled.
+        """
+        if self.snapshot_interval and not tracemalloc.is_tracing():
+            tracemalloc.start(self.traceback_depth)
+
+    def stop(self) -> None:
+        """
+        Stops tracing allocations.
+        """
+        self._snapshot = None
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def after_invocation(self, app: Any = None) -> None:
+        """
+        Records the memory use after an invocation. Added as an ``after_invocation``
+        hook of the ``App``.
+        """
+        with self._lock:
+            self.invocations += 1
+            rss = self.rss()
+            self.rss_history.append(rss)
+            if rss is not None:
+                self._check_rss(rss)
+            if self.snapshot_interval and self.invocations % self.snapshot_interval == 0:
+                self._take_snapshot()
+
+    def _check_rss(self, rss: int) -> None:
+        if self.peak_rss is None or rss > self.peak_rss:
+            self.peak_rss = rss
+        if self.baseline_rss is None:
+            self.baseline_rss = rss
+            return
+        growth = rss - self.baseline_rss
+        if self.growth_threshold is not None and growth > self.growth_threshold:
+            self.warnings += 1
+            self.logger.warning(
+                "Memory grew by %d bytes to %d bytes after %d invocations.",
+                growth,
+                rss,
+                self.invocations,
+                extra={"memory": self.metrics(rss=rss)},
+            )
+            # Warn again only after the memory grew by another threshold.
+            self.baseline_rss = rss
+
+    def _take_snapshot(self) -> None:
+        if not tracemalloc.is_tracing():
+            self.start()
+            return
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, filename) for filename in _IGNORED_FILES]
+        )
+        previous, self._snapshot = self._snapshot, snapshot
+        if previous is None:
+            return
+        growth = []
+        for stat in snapshot.compare_to(previous, "lineno"):
+            if stat.size_diff <= 0:
+                continue
+            frame = stat.traceback[0]
+            growth.append((f"{frame.filename}:{frame.lineno}", stat.size_diff, stat.count_diff))
+        growth.sort(key=lambda line: line[1], reverse=True)
+        end = self.top
+        self.growth = growth[:end]
+        if self.growth:
+            lines = "\n".join(f"{location}: +{size} bytes in +{count} blocks" for location, size, count in self.growth)
+            self.logger.info(
+                "Top allocation growth over the last %d invocations:\n%s",
+                self.snapshot_interval,
+                lines,
+                extra={"memory_growth": self.growth},
+            )
+
+    def metrics(self, *, rss: Optional[int] = None) -> Dict[str, Any]:
+        rss = self.rss_history[-1] if rss is None and self.rss_history else rss
+        metrics = {
+            "invocations": self.invocations,
+            "rss": rss,
+            "baseline_rss": self.baseline_rss,
+            "peak_rss": self.peak_rss,
+            "warnings": self.warnings,
+        }
+        if tracemalloc.is_tracing():
+            metrics["traced_memory"] = tracemalloc.get_traced_memory()[0]
+        return metrics
@@ -0,0 +1,345 @@
+import numbers
+import operator
+
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple, Union
+
+import attr
+
+from . import tracing
+from .interfaces import Event, Router
+from .routers import as_route
+from .utils import callable_name
+
+
+_MISSING = object()
+_NUMERIC_OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    "=": operator.eq,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+Path = Tuple[str, ...]
+Matcher = Callable[[Any], bool]
+
+
+def _is_literal(value: Any) -> bool:
+    return value is None or isinstance(value, (str, bool, numbers.Number))
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, numbers.Number) and not isinstance(value, bool)
+
+
+def _index_key(value: Any) -> Any:
+    """
+    Returns the key of a literal in the pattern index. Booleans are kept apart from
+    the numbers they would otherwise be equal to.
+    """
+    return (isinstance(value, bool), value)
+
+
+def _literal_matcher(literal: Any) -> Matcher:
+    key = _index_key(literal)
+
+    def matches(value):
+        try:
+            return _index_key(value) == key
+        except TypeError:
+            return False
+
+    return matches
+
+
+def _string_matcher(test: Callable[[str], bool]) -> Matcher:
+    return lambda value: isinstance(value, str) and test(value)
+
+
+def _anything_but_matcher(spec: Any) -> Matcher:
+    if isinstance(spec, Mapping):
+        inner = _compile_matcher(spec)
+        return lambda value: not inner(value)
+    literals = spec if isinstance(spec, list) else [spec]
+    if not all(_is_literal(literal) for literal in literals):
+        raise ValueError(f"Invalid anything-but values ({spec!r}).")
+    keys = frozenset(_index_key(literal) for literal in literals)
+    return lambda value: _is_literal(value) and _index_key(value) not in keys
+
+
+def _numeric_matcher(spec: Any) -> Matcher:
+    if not isinstance(spec, list) or not spec or len(spec) % 2:
+        raise ValueError(f"Invalid numeric condition ({spec!r}).")
+    conditions = []
+    for i in range(0, len(spec), 2):
+        name, bound = spec[i], spec[i + 1]
+        if name not in _NUMERIC_OPERATORS or not _is_number(bound):
+            raise ValueError(f"Invalid numeric condition ({spec!r}).")
+        conditions.append((_NUMERIC_OPERATORS[name], bound))
+
+    def matches(value):
+        return _is_number(value) and all(op(value, bound) for op, bound in conditions)
+
+    return matches
+
+
+def _compile_matcher(spec: Any) -> Matcher:
+    """
+    Compiles a single value of a pattern field into a function that tests a single
+    (non-list) event value.
+    """
+    if _is_literal(spec):
+        return _literal_matcher(spec)
+    if isinstance(spec, Mapping) and len(spec) == 1:
+        ((name, argument),) = spec.items()
+        if name == "prefix" and isinstance(argument, str):
+            return _string_matcher(lambda value: value.startswith(argument))
+        if name == "suffix" and isinstance(argument, str):
+            return _string_matcher(lambda value: value.endswith(argument))
+        if name == "equals-ignore-case" and isinstance(argument, str):
+            folded = argument.casefold()
+            return _string_matcher(lambda value: value.casefold() == folded)
+        if name == "anything-but":
+            return _anything_but_matcher(argument)
+        if name == "numeric":
+            return _numeric_matcher(argument)
+        if name == "exists" and isinstance(argument, bool):
+            # Only called for present values, missing fields are handled by the field.
+            return lambda value: argument
+    raise ValueError(f"Unsupported pattern matcher ({spec!r}).")
+
+
+@attr.s(kw_only=True, frozen=True, slots=True)
+class FieldPattern:
+    """
+    The compiled matchers of a single field of an event pattern.
+
+    :param path: The keys of the field in the event.
+    :param matchers: The compiled matchers, any of which must match.
+    :param match_missing: Whether a missing field matches (``{"exists": false}``).
+    :param literals: The literal values of the field, if all the matchers are exact
+        literals, used to index the pattern.
+    """
+
+    path: Path = attr.ib()
+    matchers: Tuple[Matcher, ...] = attr.ib(repr=False)
+    match_missing: bool = attr.ib(default=False)
+    literals: Optional[Tuple[Any, ...]] = attr.ib(default=None)
+
+    def matches(self, event: Mapping[str, Any]) -> bool:
+        value = get_path(event, self.path)
+        if value is _MISSING:
+            return self.match_missing
+        values = value if isinstance(value, list) else (value,)
+        for item in values:
+            for matcher in self.matchers:
+                if matcher(item):
+                    return True
+        return False
+
+
+def get_path(event: Any, path: Path) -> Any:
+    """
+    Returns the value at the given path in the event, or a sentinel if it's missing.
+    """
+    value = event
+    for key in path:
+        if not isinstance(value, Mapping):
+            return _MISSING
+        value = value.get(key, _MISSING)
+        if value is _MISSING:
+            return _MISSING
+    return value
+
+
+def _compile_fields(pattern: Mapping[str, Any], path: Path = ()) -> List[FieldPattern]:
+    if not isinstance(pattern, Mapping) or not pattern:
+        raise ValueError(f"Event patterns must be non-empty objects ({pattern!r}).")
+    fields = []
+    for key, spec in pattern.items():
+        field_path = path + (key,)
+        if isinstance(spec, Mapping):
+            fields.extend(_compile_fields(spec, field_path))
+            continue
+        if not isinstance(spec, list) or not spec:
+            raise ValueError(f"The pattern of field ({'.'.join(field_path)}) must be a non-empty list.")
+        match_missing = any(isinstance(s, Mapping) and s == {"exists": False} for s in spec)
+        literals = tuple(spec) if all(_is_literal(s) for s in spec) else None
+        fields.append(
+            FieldPattern(
+                path=field_path,
+                matchers=tuple(_compile_matcher(s) for s in spec),
+                match_missing=match_missing,
+                literals=literals,
+            )
+        )
+    return fields
+
+
+@attr.s(kw_only=True, frozen=True)
+class EventPattern:
+    """
+    An EventBridge event pattern, compiled once into a matcher. Supports exact values,
+    ``prefix``, ``suffix``, ``equals-ignore-case``, ``anything-but``, ``numeric`` and
+    ``exists`` matching, nested fields and array values, with the EventBridge semantics.
+
+    :param pattern: The event pattern.
+    :param fields: The compiled field patterns, all of which must match.
+    """
+
+    pattern: Mapping[str, Any] = attr.ib()
+    fields: Tuple[FieldPattern, ...] = attr.ib(repr=False)
+
+    @classmethod
+    def compile(cls, pattern: Mapping[str, Any]) -> "EventPattern":
+        """
+        :raises ValueError: Raised if the pattern is invalid or unsupported.
+        """
+        return cls(pattern=pattern, fields=tuple(_compile_fields(pattern)))
+
+    def matches(self, event: Mapping[str, Any]) -> bool:
+        for field in self.fields:
+            if not field.matches(event):
+                return False
+        return True
+
+
+@attr.s(kw_only=True, frozen=True, slots=True)
+class _Entry:
+    order: int = attr.ib()
+    name: str = attr.ib()
+    pattern: EventPattern = attr.ib()
+    # The fields left to check once the pattern was found through the index.
+    remaining: Tuple[FieldPattern, ...] = attr.ib(default=())
+
+
+@attr.s(kw_only=True)
+class EventBridgeRouter(Router):
+    """
+    Routes EventBridge events to the first added route whose event pattern matches.
+
+    Patterns are compiled when they're added. Each pattern is indexed on its most
+    selective field with only exact values, i.e. the field whose values the fewest
+    other patterns share, e.g. ``detail-type`` rather than ``source``. Routing an
+    event only tests the patterns found by looking up its values in the index, plus
+    any patterns without exact values, so it stays fast with many patterns.
+
+    :param routes: The routes, keyed on their name. Only set via ``add_route``
+    """
+
+    routes: Dict[str, Callable] = attr.ib(init=False, factory=dict)
+    _patterns: List[_Entry] = attr.ib(init=False, factory=list, repr=False)
+    # The index is (re)built on the first match after routes were added.
+    _index: Optional[Dict[Path, Dict[Any, List[_Entry]]]] = attr.ib(init=False, default=None, repr=False)
+    _unindexed: List[_Entry] = attr.ib(init=False, factory=list, repr=False)
+
+    def add_route(
+        self, *, fn: Union[Callable, str], pattern: Union[Mapping[str, Any], EventPattern], name: Optional[str] = None
+    ) -> None:
+        """
+        Adds the route with the given event pattern.
+
+        :param fn: The callable to route to, or its ``"package.module:function"``
+            import string to import it on first use.
+        :type fn: callable or str
+        :param pattern: The EventBridge event pattern the route matches.
+        :param name: The name of the route, defaults to the name of the callable.
+        :raises ValueError: Raised if the pattern is invalid or the name is taken.
+        """
+        if not isinstance(pattern, EventPattern):
+            pattern = EventPattern.compile(pattern)
+        if name is None:
+            name = fn if isinstance(fn, str) else callable_name(fn)
+        if name in self.routes:
+            raise ValueError(f"A route named ({name}) already exists.")
+        self.routes[name] = as_route(fn)
+        self._patterns.append(_Entry(order=len(self._patterns), name=name, pattern=pattern))
+        self._index = None
+
+    def _build_index(self) -> Dict[Path, Dict[Any, List[_Entry]]]:
+        # Count the patterns sharing each exact value of each field.
+        shared: Dict[Tuple[Path, Any], int] = {}
+        for entry in self._patterns:
+            for field in entry.pattern.fields:
+                for key in set(_index_key(literal) for literal in field.literals or ()):
+                    shared[(field.path, key)] = shared.get((field.path, key), 0) + 1
+
+        def selectivity(field):
+            return sum(shared[(field.path, _index_key(literal))] for literal in field.literals)
+
+        index: Dict[Path, Dict[Any, List[_Entry]]] = {}
+        unindexed = []
+        for entry in self._patterns:
+            candidates = [field for field in entry.pattern.fields if field.literals is not None]
+            if not candidates:
+                unindexed.append(entry)
+                continue
+            indexed = min(candidates, key=selectivity)
+            remaining = tuple(field for field in entry.pattern.fields if field is not indexed)
+            indexed_entry = attr.evolve(entry, remaining=remaining)
+            values = index.setdefault(indexed.path, {})
+            for key in set(_index_key(literal) for literal in indexed.literals):
+                values.setdefault(key, []).append(indexed_entry)
+        self._unindexed = unindexed
+        self._index = index
+        return index
+
+    def match(self, event: Mapping[str, Any]) -> Optional[str]:
+        """
+        Returns the name of the first added route whose pattern matches the raw event.
+        """
+        index = self._index
+        if index is None:
+            index = self._build_index()
+        best: Optional[_Entry] = None
+        for path, values in index.items():
+            value = get_path(event, path)
+            if value is _MISSING:
+                continue
+            for item in value if isinstance(value, list) else (value,):
+                try:
+                    entries = values.get(_index_key(item), ())
+                except TypeError:
+                    continue
+                for entry in entries:
+                    if best is not None and entry.order >= best.order:
+                        # The entries are in the order they were added.
+                        break
+                    if all(field.matches(event) for field in entry.remaining):
+                        best = entry
+                        break
+        for entry in self._unindexed:
+            if best is not None and entry.order >= best.order:
+                break
+            if entry.pattern.matches(event):
+                best = entry
+                break
+        return None if best is None else best.name
+
+    def get_route_key(self, *, event: Event) -> Optional[str]:
+        """
+        Returns the name of the matching route.
+        """
+        return self.match(event.raw)
+
+    def get_route(self, *, event: Event) -> Callable:
+        """
+        Returns the first added route whose pattern matches the event.
+
+        :raises ValueError: Raised if no pattern matches the event.
+        :rtype: callable
+        """
+        name = self.match(event.raw)
+        if name is None:
+            raise ValueError("No route pattern matches the event.")
+        return self.routes[name]
+
+    def dispatch(self, *, event: Event) -> Any:
+        """
+        Gets the matching route and invokes the callable.
+
+        :param event: The event to pass to the callable route.
+        """
+        with tracing.span("get_route"):
+            route = self.get_route(event=event)
+        with tracing.span("route"):
+            return route(event=event)
@@ -9,3 +9,44 @@ class HandledError(Exception):
     An exepected error that needs to be raised in the lambda runtime but
     should not be sent to the configured exception handlers.
     """
+
+
+class ValidationError(ValueError):
+    """
+    A payload didn't match the schema of its route.
+
+    :param errors: The messages of all the problems found in the payload.
+    """
+
+    def __init__(self, errors):
+        super().__init__("; ".join(errors))
+        self.errors = list(errors)
+
+
+class PoolExhaustedError(RuntimeError):
+    """
+    No resource of a ``lambda_router.resources.ResourcePool`` was released in time.
+    """
+
+
+class WorkerError(RuntimeError):
+    """
+    A task run by a ``lambda_router.workers.WorkerPool`` failed in a way that can't be
+    reported with its own exception, e.g. the worker process crashed.
+    """
+
+
+class CircuitOpenError(HandledError):
+    """
+    A call was rejected without being made because the circuit breaker of its
+    dependency is open. A ``HandledError``, so failing fast isn't reported to the
+    exception handlers on every invocation.
+
+    :param name: The name of the circuit breaker.
+    :param retry_after: The time in seconds until the breaker lets a probe call through.
+    """
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"The circuit breaker ({name}) is open, retry after {retry_after:.1f}s.")
+        self.name = name
+        self.retry_after = retry_after
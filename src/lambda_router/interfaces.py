@@ -1,6 +1,6 @@
 import abc
 
-from typing import Any, Callable, Optional
+from typing import Any, Callable, Mapping, Optional
 
 
 class Event(abc.ABC):
@@ -29,3 +29,26 @@ class Router(abc.ABC):
     @abc.abstractmethod
     def dispatch(self, *, event: Any) -> Any:
         raise NotImplementedError("This method must be implemented by a subclass.")
+
+    def get_route_key(self, *, event: Any) -> Optional[str]:
+        """
+        Returns the key the given event will be routed on, or ``None`` if the
+        router doesn't route an event on a single key.
+        """
+        return None
+
+    def get_routes(self) -> Mapping[Optional[str], Callable]:
+        """
+        Returns all the added routes, keyed on their route key.
+        """
+        return getattr(self, "routes", {})
+
+
+class ObjectStore(abc.ABC):
+    """
+    Abstract interface for object stores, e.g. S3, payloads are fetched from.
+    """
+
+    @abc.abstractmethod
+    def get(self, *, bucket: str, key: str) -> bytes:
+        raise NotImplementedError("This method must be implemented by a subclass.")
@@ -0,0 +1,154 @@
+import json
+import logging
+import sys
+
+from typing import IO, Any, Dict, List, Mapping, Optional
+
+
+# The attributes of every ``logging.LogRecord``, anything else was passed via ``extra``.
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+_CONTEXT_ATTRIBUTES = ("app", "request_id", "route_key", "cold_start")
+
+
+def _get_request_id(lambda_context: Any) -> Optional[str]:
+    if lambda_context is None:
+        return None
+    if isinstance(lambda_context, Mapping):
+        return lambda_context.get("aws_request_id", None)
+    return getattr(lambda_context, "aws_request_id", None)
+
+
+class InvocationContextFilter(logging.Filter):
+    """
+    Enriches log records with the app name, the request id from the lambda context,
+    the route key and the cold start flag of the current invocation. The context is
+    captured when the record is created, so the records can be formatted later. The
+    route key is looked up once per invocation, see ``App.current_route_key``.
+
+    :param app: The ``App`` to get the invocation context from.
+    """
+
+    def __init__(self, app: Any):
+        super().__init__()
+        self.app = app
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        app = self.app
+        record.app = app.name
+        record.request_id = _get_request_id(app.execution_context)
+        record.route_key = app.current_route_key
+        record.cold_start = app.is_cold_start
+        return True
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    Formats log records as single line JSON documents, including the invocation
+    context added by ``InvocationContextFilter`` and any ``extra`` fields.
+    """
+
+    def to_dict(self, record: logging.LogRecord) -> Dict[str, Any]:
+        document = {
+            "timestamp": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for name in _CONTEXT_ATTRIBUTES:
+            value = getattr(record, name, None)
+            if value is not None:
+                document[name] = value
+        for name, value in vars(record).items():
+            if name not in _RECORD_ATTRIBUTES and name not in document:
+                document[name] = value
+        if record.exc_info:
+            document["exception"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            document["stack"] = self.formatStack(record.stack_info)
+        return document
+
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(self.to_dict(record), default=str)
+
+
+class BufferedStreamHandler(logging.Handler):
+    """
+    Buffers log records in memory and writes them to the stream in a single write
+    on ``flush``. Records are only formatted when they're written. Records at or
+    above ``flush_level`` are written immediately along with anything buffered
+    before them, as is the buffer once it holds ``capacity`` records.
+
+    Note that, as formatting is deferred, any mutable log arguments that change
+    before the buffer is flushed will be logged with their new values.
+
+    :param stream: The stream to write to, defaults to ``sys.stdout``.
+    :param flush_level: The level at which records are written immediately.
+    :param capacity: The maximum number of buffered records.
+    """
+
+    def __init__(self, stream: Optional[IO[str]] = None, *, flush_level: int = logging.ERROR, capacity: int = 1000):
+        super().__init__()
+        self.stream = stream if stream is not None else sys.stdout
+        self.flush_level = flush_level
+        self.capacity = capacity
+        self.buffer: List[logging.LogRecord] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.buffer.append(record)
+        if record.levelno >= self.flush_level or len(self.buffer) >= self.capacity:
+            self.flush()
+
+    def flush(self) -> None:
+        self.acquire()
+        try:
+            if not self.buffer:
+                return
+            records, self.buffer = self.buffer, []
+            lines = []
+            for record in records:
+                try:
+                    lines.append(self.format(record))
+                except Exception:
+                    self.handleError(record)
+            lines.append("")
+            self.stream.write("\n".join(lines))
+            if hasattr(self.stream, "flush"):
+                self.stream.flush()
+        finally:
+            self.release()
+
+    def close(self) -> None:
+        try:
+            self.flush()
+        finally:
+            super().close()
+
+
+def configure_logging(
+    app: Any,
+    *,
+    stream: Optional[IO[str]] = None,
+    level: int = logging.INFO,
+    flush_level: int = logging.ERROR,
+    capacity: int = 1000,
+) -> BufferedStreamHandler:
+    """
+    Configures the ``App.logger`` to emit buffered, structured JSON records enriched
+    with the invocation context. The buffer is written out at the end of every
+    invocation. The logger no longer propagates to the root logger, to avoid the
+    records being written twice.
+
+    :param app: The ``App`` to configure.
+    :param stream: The stream to write to, defaults to ``sys.stdout``.
+    :param level: The level of the ``App.logger``.
+    :param flush_level: The level at which records are written immediately.
+    :param capacity: The maximum number of buffered records.
+    """
+    handler = BufferedStreamHandler(stream, flush_level=flush_level, capacity=capacity)
+    handler.setFormatter(JSONFormatter())
+    handler.addFilter(InvocationContextFilter(app))
+    app.logger.addHandler(handler)
+    app.logger.setLevel(level)
+    app.logger.propagate = False
+    app.after_invocation(lambda app: handler.flush())
+    return handler
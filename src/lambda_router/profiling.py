@@ -0,0 +1,210 @@
+import cProfile
+import collections
+import io
+import logging
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+
+from typing import Any, Callable, Counter, FrozenSet, Iterable, Mapping, Optional
+
+import attr
+
+
+DETERMINISTIC = "deterministic"
+SAMPLING = "sampling"
+LOG_OUTPUT = "log"
+
+
+def _to_key_set(value: Any) -> FrozenSet[str]:
+    """
+    Converts a comma separated string (as loaded from the environment) or an
+    iterable of route keys into a frozenset.
+    """
+    if not value:
+        return frozenset()
+    if isinstance(value, str):
+        return frozenset(key.strip() for key in value.split(",") if key.strip())
+    return frozenset(value)
+
+
+def _collapse_stack(frame: Any) -> str:
+    """
+    Returns the given frame stack in the collapsed (``root;...;leaf``) format
+    used by flame graph tools.
+    """
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+        frame = frame.f_back
+    return ";".join(reversed(stack))
+
+
+@attr.s(kw_only=True)
+class StackSampler:
+    """
+    A sampling profiler that records the stack of a single thread every ``interval``
+    seconds from a background thread, counting the collapsed stacks.
+
+    :param thread_id: The ident of the thread to sample.
+    :param interval: The time in seconds between samples.
+    :param stacks: The counter the collapsed stacks are added to.
+    """
+
+    thread_id: int = attr.ib()
+    interval: float = attr.ib(default=0.005)
+    stacks: Counter[str] = attr.ib(factory=collections.Counter, repr=False)
+    _stopped: threading.Event = attr.ib(init=False, factory=threading.Event, repr=False)
+    _thread: Optional[threading.Thread] = attr.ib(init=False, default=None, repr=False)
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[_collapse_stack(frame)] += 1
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="lambda_router.profiling", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+@attr.s(kw_only=True)
+class Profiler:
+    """
+    Profiles a selection of ``App`` invocations, aggregating the results across warm
+    invocations and periodically dumping them to ``/tmp`` or the log.
+
+    An invocation is profiled if its route key is one of ``route_keys`` or it is
+    randomly selected based on the ``sample_rate``.
+
+    :param mode: Either ``deterministic`` (``cProfile``, dumped as pstats) or
+        ``sampling`` (stack sampling, dumped as collapsed stacks).
+    :param sample_rate: The fraction of invocations to profile.
+    :param route_keys: The route keys to always profile.
+    :param output: The path prefix for the dumped stats or ``log`` to write them to the logger.
+    :param dump_interval: The minimum time in seconds between dumps.
+    :param sampling_interval: The time in seconds between stack samples in ``sampling`` mode.
+    :param logger: The logger used when the ``output`` is ``log``.
+    """
+
+    mode: str = attr.ib(default=DETERMINISTIC, validator=attr.validators.in_([DETERMINISTIC, SAMPLING]))
+    sample_rate: float = attr.ib(default=0.0, converter=float)
+    route_keys: FrozenSet[str] = attr.ib(default=frozenset(), converter=_to_key_set)
+    output: str = attr.ib(default="/tmp/lambda_router_profile")
+    dump_interval: float = attr.ib(default=60.0, converter=float)
+    sampling_interval: float = attr.ib(default=0.005, converter=float)
+    logger: logging.Logger = attr.ib(factory=lambda: logging.getLogger(__name__), repr=False)
+    random: Callable[[], float] = attr.ib(default=random.random, repr=False)
+    profiled: int = attr.ib(init=False, default=0)
+    stats: Optional[pstats.Stats] = attr.ib(init=False, default=None, repr=False)
+    stacks: Counter[str] = attr.ib(init=False, factory=collections.Counter, repr=False)
+    _last_dump: float = attr.ib(init=False, factory=time.monotonic, repr=False)
+    _lock: threading.Lock = attr.ib(init=False, factory=threading.Lock, repr=False)
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Any], *, logger: logging.Logger) -> Optional["Profiler"]:
+        """
+        Creates a ``Profiler`` from the ``PROFILE_*`` config values, returning ``None``
+        when neither ``PROFILE_SAMPLE_RATE`` nor ``PROFILE_ROUTE_KEYS`` are set.
+        """
+        sample_rate = float(config.get("PROFILE_SAMPLE_RATE", 0.0) or 0.0)
+        route_keys = _to_key_set(config.get("PROFILE_ROUTE_KEYS", None))
+        if not sample_rate and not route_keys:
+            return None
+        options = {"sample_rate": sample_rate, "route_keys": route_keys, "logger": logger}
+        for option in ("mode", "output", "dump_interval", "sampling_interval"):
+            config_key = f"PROFILE_{option.upper()}"
+            if config_key in config:
+                options[option] = config[config_key]
+        return cls(**options)
+
+    def should_profile(self, *, route_key: Optional[str]) -> bool:
+        """
+        Returns whether an invocation for the given route key should be profiled.
+        """
+        if route_key is not None and route_key in self.route_keys:
+            return True
+        return self.sample_rate > 0 and self.random() < self.sample_rate
+
+    def run(self, dispatch: Callable, *, event: Any, route_key: Optional[str]) -> Any:
+        """
+        Calls ``dispatch`` with the given event, profiling the call if selected.
+        """
+        if not self.should_profile(route_key=route_key):
+            return dispatch(event=event)
+        try:
+            if self.mode == DETERMINISTIC:
+                return self._run_deterministic(dispatch, event=event)
+            return self._run_sampling(dispatch, event=event)
+        finally:
+            with self._lock:
+                self.profiled += 1
+                if time.monotonic() - self._last_dump >= self.dump_interval:
+                    self._dump()
+
+    def _run_deterministic(self, dispatch: Callable, *, event: Any) -> Any:
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            return dispatch(event=event)
+        finally:
+            profile.disable()
+            with self._lock:
+                if self.stats is None:
+                    self.stats = pstats.Stats(profile)
+                else:
+                    self.stats.add(profile)
+
+    def _run_sampling(self, dispatch: Callable, *, event: Any) -> Any:
+        sampler = StackSampler(thread_id=threading.get_ident(), interval=self.sampling_interval)
+        sampler.start()
+        try:
+            return dispatch(event=event)
+        finally:
+            sampler.stop()
+            with self._lock:
+                self.stacks.update(sampler.stacks)
+
+    def collapsed_stacks(self) -> Iterable[str]:
+        """
+        Returns the aggregated stack samples as collapsed stack lines.
+        """
+        return [f"{stack} {count}" for stack, count in self.stacks.most_common()]
+
+    def dump(self) -> None:
+        """
+        Writes the aggregated stats to the configured ``output``.
+        """
+        with self._lock:
+            self._dump()
+
+    def _dump(self) -> None:
+        self._last_dump = time.monotonic()
+        if self.mode == DETERMINISTIC:
+            if self.stats is None:
+                return
+            if self.output == LOG_OUTPUT:
+                stream = io.StringIO()
+                self.stats.stream = stream
+                self.stats.sort_stats("cumulative").print_stats(30)
+                self.logger.info("Profile of %d invocations:\n%s", self.profiled, stream.getvalue())
+            else:
+                self.stats.dump_stats(f"{self.output}.pstats")
+        else:
+            if not self.stacks:
+                return
+            collapsed = "\n".join(self.collapsed_stacks())
+            if self.output == LOG_OUTPUT:
+                self.logger.info("Profile of %d invocations:\n%s", self.profiled, collapsed)
+            else:
+                with open(f"{self.output}.collapsed", "w") as f:
+                    f.write(collapsed + "\n")
@@ -0,0 +1,176 @@
+import collections
+import contextvars
+import logging
+import threading
+import time
+
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+import attr
+
+
+logger = logging.getLogger(__name__)
+
+
+@attr.s(kw_only=True, frozen=True, slots=True)
+class Report:
+    """
+    An uncaught exception queued for reporting.
+
+    :param app: The ``App`` the exception was raised in.
+    :param event: The ``Event`` that was being dispatched.
+    :param exception: The uncaught exception.
+    :param timestamp: The time the exception was reported.
+    :param context: The ``contextvars`` context of the invocation, so sinks can see
+        e.g. ``App.execution_context`` from the reporter thread.
+    """
+
+    app: Any = attr.ib(repr=False)
+    event: Any = attr.ib(repr=False)
+    exception: BaseException = attr.ib()
+    timestamp: float = attr.ib(factory=time.time)
+    context: contextvars.Context = attr.ib(factory=contextvars.copy_context, repr=False)
+
+    def run(self, fn: Callable, *args: Any, **kwargs: Any) -> Any:
+        """
+        Calls the function in a copy of the invocation's context. A copy is used as a
+        context can't be entered by the reporter threads of several reporters at once.
+        """
+        return self.context.copy().run(fn, *args, **kwargs)
+
+
+@attr.s(kw_only=True)
+class HandlerSink:
+    """
+    A sink that calls an exception handler, as registered with
+    ``App.register_exception_handler``, for each report in a batch. The handler
+    is called in the context of the invocation the exception was raised in.
+
+    :param handler: The exception handler, called as ``handler(app, event, exception)``.
+    """
+
+    handler: Callable = attr.ib()
+
+    def __call__(self, reports: List[Report]) -> None:
+        for report in reports:
+            report.run(self.handler, report.app, report.event, report.exception)
+
+
+@attr.s(kw_only=True)
+class MemorySink:
+    """
+    A local stand-in sink that keeps all the delivered batches in memory.
+
+    :param delay: The time in seconds each batch takes to deliver, to simulate a
+        slow reporting service.
+    """
+
+    delay: float = attr.ib(default=0.0)
+    batches: List[List[Report]] = attr.ib(init=False, factory=list, repr=False)
+
+    @property
+    def reports(self) -> List[Report]:
+        return [report for batch in self.batches for report in batch]
+
+    def __call__(self, reports: List[Report]) -> None:
+        if self.delay:
+            time.sleep(self.delay)
+        self.batches.append(list(reports))
+
+
+@attr.s(kw_only=True)
+class BackgroundReporter:
+    """
+    Ships exception reports to a sink from a background worker thread so that slow
+    reporting doesn't add to the duration of failed invocations.
+
+    Reports are queued without blocking and delivered to the sink in batches of up
+    to ``batch_size``. Reports submitted while the queue is full are dropped and
+    counted. The worker thread is started on the first submitted report.
+
+    :param sink: Called with each batch as ``sink(reports)``.
+    :param batch_size: The maximum number of reports per batch.
+    :param max_queue_size: The maximum number of queued reports.
+    :param flush_timeout: The maximum time in seconds the ``App`` waits for queued
+        reports to be delivered before an invocation returns.
+    """
+
+    sink: Callable[[List[Report]], None] = attr.ib()
+    batch_size: int = attr.ib(default=10)
+    max_queue_size: int = attr.ib(default=100)
+    flush_timeout: float = attr.ib(default=1.0)
+    submitted: int = attr.ib(init=False, default=0)
+    sent: int = attr.ib(init=False, default=0)
+    dropped: int = attr.ib(init=False, default=0)
+    failed: int = attr.ib(init=False, default=0)
+    _queue: Deque[Report] = attr.ib(init=False, factory=collections.deque, repr=False)
+    _in_flight: int = attr.ib(init=False, default=0, repr=False)
+    _condition: threading.Condition = attr.ib(init=False, factory=threading.Condition, repr=False)
+    _thread: Optional[threading.Thread] = attr.ib(init=False, default=None, repr=False)
+
+    @property
+    def pending(self) -> int:
+        """
+        The number of reports that are queued or being delivered.
+        """
+        return len(self._queue) + self._in_flight
+
+    def metrics(self) -> Dict[str, int]:
+        with self._condition:
+            return {
+                "submitted": self.submitted,
+                "sent": self.sent,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "pending": self.pending,
+            }
+
+    def submit(self, report: Report) -> bool:
+        """
+        Queues the report without blocking.
+
+        :returns: ``False`` if the report was dropped because the queue is full.
+        """
+        with self._condition:
+            self.submitted += 1
+            if len(self._queue) >= self.max_queue_size:
+                self.dropped += 1
+                return False
+            self._queue.append(report)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="lambda_router.reporting", daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+        return True
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Waits for all the queued reports to be delivered.
+
+        :param timeout: The maximum time in seconds to wait, defaults to the ``flush_timeout``.
+        :returns: ``True`` if all the reports were delivered in time.
+        """
+        timeout = self.flush_timeout if timeout is None else timeout
+        with self._condition:
+            return self._condition.wait_for(lambda: not self.pending, timeout=timeout)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._queue)
+                batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+                self._in_flight = len(batch)
+            try:
+                self.sink(batch)
+            except Exception:
+                logger.exception("Failed to deliver %d exception reports.", len(batch))
+                delivered = False
+            else:
+                delivered = True
+            with self._condition:
+                if delivered:
+                    self.sent += len(batch)
+                else:
+                    self.failed += len(batch)
+                self._in_flight = 0
+                self._condition.notify_all()
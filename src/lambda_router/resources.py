@@ -0,0 +1,260 @@
+import collections
+import contextlib
+import logging
+import threading
+import time
+
+from typing import Any, Callable, Deque, Dict, Iterator, Optional, Tuple
+
+import attr
+
+from . import exceptions, shutdown, tracing
+
+
+logger = logging.getLogger(__name__)
+
+
+def close_resource(resource: Any) -> None:
+    """
+    The default way resources are closed: calls their ``close`` method, if any.
+    """
+    close = getattr(resource, "close", None)
+    if close is not None:
+        close()
+
+
+@attr.s(kw_only=True)
+class ResourcePool:
+    """
+    A thread safe pool of resources, e.g. database connections or HTTP clients, that
+    are created lazily with the ``factory`` and reused across invocations.
+
+    Up to ``size`` resources are created. Acquiring a resource while all of them are
+    in use waits for one to be released, at most ``acquire_timeout`` seconds. Idle
+    resources are recycled after ``max_idle_time`` seconds, or when ``validate``
+    returns ``False`` for them, and resources released after an error are discarded.
+
+    :param name: The name of the resource.
+    :param factory: Called without arguments to create a resource.
+    :param size: The maximum number of resources.
+    :param max_idle_time: The time in seconds after which idle resources are recycled.
+    :param validate: Called with an idle resource before it's reused, returns whether
+        the resource is still usable.
+    :param close_fn: Called with a resource to close it, defaults to calling its ``close``
+        method.
+    :param acquire_timeout: The maximum time in seconds to wait for a resource, or
+        ``None`` to wait indefinitely.
+    :param clock: The monotonic clock used for the idle time.
+    """
+
+    name: str = attr.ib()
+    factory: Callable[[], Any] = attr.ib(repr=False)
+    size: int = attr.ib(default=1)
+    max_idle_time: Optional[float] = attr.ib(default=None)
+    validate: Optional[Callable[[Any], bool]] = attr.ib(default=None, repr=False)
+    close_fn: Callable[[Any], None] = attr.ib(default=close_resource, repr=False)
+    acquire_timeout: Optional[float] = attr.ib(default=None)
+    clock: Callable[[], float] = attr.ib(default=time.monotonic, repr=False)
+    created: int = attr.ib(init=False, default=0)
+    closed: int = attr.ib(init=False, default=0)
+    acquired: int = attr.ib(init=False, default=0)
+    exhausted: int = attr.ib(init=False, default=0)
+    timeouts: int = attr.ib(init=False, default=0)
+    wait_time: float = attr.ib(init=False, default=0.0)
+    max_wait_time: float = attr.ib(init=False, default=0.0)
+    _idle: Deque[Tuple[Any, float]] = attr.ib(init=False, factory=collections.deque, repr=False)
+    _in_use: int = attr.ib(init=False, default=0, repr=False)
+    _condition: threading.Condition = attr.ib(init=False, factory=threading.Condition, repr=False)
+
+    @size.validator
+    def _check_size(self, attribute, value):
+        if value < 1:
+            raise ValueError("The size of a resource pool must be at least 1.")
+
+    @property
+    def idle(self) -> int:
+        return len(self._idle)
+
+    @property
+    def in_use(self) -> int:
+        return self._in_use
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                "size": self.size,
+                "idle": self.idle,
+                "in_use": self.in_use,
+                "created": self.created,
+                "closed": self.closed,
+                "acquired": self.acquired,
+                "exhausted": self.exhausted,
+                "timeouts": self.timeouts,
+                "wait_time": self.wait_time,
+                "max_wait_time": self.max_wait_time,
+            }
+
+    def _close(self, resource: Any) -> None:
+        try:
+            self.close_fn(resource)
+        except Exception:
+            logger.exception("Failed to close a %s resource.", self.name)
+        with self._condition:
+            self.closed += 1
+
+    def _is_usable(self, resource: Any, released_at: float) -> bool:
+        if self.max_idle_time is not None and self.clock() - released_at > self.max_idle_time:
+            return False
+        if self.validate is not None:
+            try:
+                return bool(self.validate(resource))
+            except Exception:
+                return False
+        return True
+
+    def acquire(self, timeout: Optional[float] = None) -> Any:
+        """
+        Returns an idle resource, or creates one if the pool isn't full yet. Must be
+        given back with ``release``, see ``lease`` for a context manager.
+
+        :param timeout: The maximum time in seconds to wait for a resource, defaults
+            to the ``acquire_timeout``.
+        :raises lambda_router.exceptions.PoolExhaustedError: Raised if no resource
+            was released in time.
+        """
+        timeout = self.acquire_timeout if timeout is None else timeout
+        with tracing.span("acquire", resource=self.name):
+            idle = self._take(timeout)
+            if idle is not None:
+                resource, released_at = idle
+                if self._is_usable(resource, released_at):
+                    return resource
+                # Recycle the stale resource, creating a new one in its slot.
+                self._close(resource)
+            try:
+                resource = self.factory()
+            except BaseException:
+                with self._condition:
+                    self._in_use -= 1
+                    self._condition.notify()
+                raise
+            with self._condition:
+                self.created += 1
+            return resource
+
+    def _take(self, timeout: Optional[float]) -> Optional[Tuple[Any, float]]:
+        """
+        Reserves a slot in the pool, returning an idle resource if there is one, or
+        ``None`` if a new resource should be created in the reserved slot.
+        """
+        with self._condition:
+            if not self._idle and self._in_use >= self.size:
+                self.exhausted += 1
+                start = time.perf_counter()
+                available = self._condition.wait_for(lambda: self._idle or self._in_use < self.size, timeout=timeout)
+                waited = time.perf_counter() - start
+                self.wait_time += waited
+                self.max_wait_time = max(self.max_wait_time, waited)
+                if not available:
+                    self.timeouts += 1
+                    raise exceptions.PoolExhaustedError(
+                        f"No {self.name} resource was released within {timeout}s ({self.size} in use)."
+                    )
+            self._in_use += 1
+            self.acquired += 1
+            if self._idle:
+                # Reuse the most recently released resource, so surplus ones go idle.
+                return self._idle.pop()
+            return None
+
+    def release(self, resource: Any, *, discard: bool = False) -> None:
+        """
+        Gives a resource back to the pool.
+
+        :param resource: The acquired resource.
+        :param discard: Close the resource instead, e.g. after an error.
+        """
+        with self._condition:
+            self._in_use -= 1
+            if not discard:
+                self._idle.append((resource, self.clock()))
+            self._condition.notify()
+        if discard:
+            self._close(resource)
+
+    @contextlib.contextmanager
+    def lease(self, timeout: Optional[float] = None) -> Iterator[Any]:
+        """
+        A context manager that acquires a resource and releases it at the end of the
+        block. The resource is discarded if the block raises an exception.
+        """
+        resource = self.acquire(timeout=timeout)
+        try:
+            yield resource
+        except BaseException:
+            self.release(resource, discard=True)
+            raise
+        self.release(resource)
+
+    def clear(self) -> None:
+        """
+        Closes all the idle resources. Resources in use are unaffected.
+        """
+        with self._condition:
+            idle = [resource for resource, _ in self._idle]
+            self._idle.clear()
+            self._condition.notify_all()
+        for resource in idle:
+            self._close(resource)
+
+
+@attr.s(kw_only=True)
+class ResourceRegistry:
+    """
+    The named resource pools of an ``App``. All the pools are cleared when the
+    execution environment shuts down, see ``lambda_router.shutdown.register``. The
+    runtime only signals the shutdown to lambdas with an extension, so call ``close``
+    explicitly where open connections must not outlive the lambda otherwise.
+    """
+
+    pools: Dict[str, ResourcePool] = attr.ib(init=False, factory=dict)
+    _registered_shutdown: bool = attr.ib(init=False, default=False, repr=False)
+
+    def register(self, name: str, factory: Callable[[], Any], **options: Any) -> ResourcePool:
+        """
+        Declares a resource. See ``ResourcePool`` for the options.
+
+        :raises ValueError: Raised if a resource with the same name already exists.
+        """
+        if name in self.pools:
+            raise ValueError(f"Resource ({name}) is already registered.")
+        pool = self.pools[name] = ResourcePool(name=name, factory=factory, **options)
+        if not self._registered_shutdown:
+            shutdown.register(self.close)
+            self._registered_shutdown = True
+        return pool
+
+    def __getitem__(self, name: str) -> ResourcePool:
+        try:
+            return self.pools[name]
+        except KeyError:
+            raise KeyError(f"No resource registered as ({name}).")
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.pools
+
+    def lease(self, name: str, timeout: Optional[float] = None) -> Any:
+        """
+        A context manager that leases a resource of the named pool.
+        """
+        return self[name].lease(timeout=timeout)
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        return {name: pool.metrics() for name, pool in self.pools.items()}
+
+    def close(self) -> None:
+        """
+        Closes the idle resources of all the pools.
+        """
+        for pool in self.pools.values():
+            pool.clear()
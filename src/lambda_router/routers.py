@@ -1,10 +1,72 @@
 import json
+import logging
+import threading
+import time
 
-from typing import Any, Callable, Dict, Optional
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Set, Tuple, Union
 
 import attr
 
+from . import codecs, tracing
+from .claimcheck import ClaimCheck, PayloadPointer
+from .columnar import ColumnarBatch, require_numpy
 from .interfaces import Event, Router
+from .utils import import_string
+from .workers import WorkerPool
+
+
+logger = logging.getLogger(__name__)
+
+
+@attr.s(kw_only=True, slots=True)
+class LazyRoute:
+    """
+    A route given as a ``"package.module:function"`` import string, which is only
+    imported when it's first called. The imported route is cached.
+
+    :param path: The import string of the route.
+    :param import_time: The time in seconds importing the route took, or ``None``
+        if it hasn't been imported yet.
+    """
+
+    path: str = attr.ib()
+    import_time: Optional[float] = attr.ib(init=False, default=None)
+    _fn: Optional[Callable] = attr.ib(init=False, default=None, repr=False)
+    _lock: threading.Lock = attr.ib(init=False, factory=threading.Lock, repr=False)
+
+    @property
+    def loaded(self) -> bool:
+        return self._fn is not None
+
+    def resolve(self) -> Callable:
+        """
+        Returns the route, importing it first if needed.
+
+        :raises ImportError: Raised if the route can't be imported.
+        """
+        fn = self._fn
+        if fn is None:
+            with self._lock:
+                fn = self._fn
+                if fn is None:
+                    with tracing.span("import_route", path=self.path):
+                        start = time.perf_counter()
+                        fn = import_string(self.path)
+                        self.import_time = time.perf_counter() - start
+                    self._fn = fn
+        return fn
+
+    def __call__(self, **kwargs: Any) -> Any:
+        return self.resolve()(**kwargs)
+
+
+def as_route(fn: Union[Callable, str]) -> Callable:
+    """
+    Returns the given route, or a ``LazyRoute`` if it's an import string.
+    """
+    if isinstance(fn, str):
+        return LazyRoute(path=fn)
+    return fn
 
 
 @attr.s(kw_only=True)
@@ -17,18 +79,25 @@ class SingleRoute(Router):
 
     route: Optional[Callable] = attr.ib(init=False, default=None)
 
-    def add_route(self, *, fn: Callable) -> None:
+    def add_route(self, *, fn: Union[Callable, str]) -> None:
         """
         Adds the single route.
 
-        :param fn: The callable to route to.
-        :type fn: callable
+        :param fn: The callable to route to, or its ``"package.module:function"``
+            import string to import it on first use.
+        :type fn: callable or str
         :raises ValueError: Raised when a single route has already been defined.
         """
         if self.route is not None:
             raise ValueError("Single route is already defined. SingleRoute can only have a single defined route.")
 
-        self.route = fn
+        self.route = as_route(fn)
+
+    def get_routes(self) -> Mapping[Optional[str], Callable]:
+        """
+        Returns the single route, keyed on ``None``.
+        """
+        return {} if self.route is None else {None: self.route}
 
     def get_route(self, *, event: Optional[Event]) -> Callable:
         """
@@ -48,8 +117,10 @@ class SingleRoute(Router):
 
         :param event: The event to pass to the callable route.
         """
-        route = self.get_route(event=event)
-        return route(event=event)
+        with tracing.span("get_route"):
+            route = self.get_route(event=event)
+        with tracing.span("route"):
+            return route(event=event)
 
 
 @attr.s(kw_only=True)
@@ -65,16 +136,23 @@ class EventField(Router):
     key: str = attr.ib(kw_only=True)
     routes: Dict[str, Callable] = attr.ib(init=False, factory=dict)
 
-    def add_route(self, *, fn: Callable, key: str) -> None:
+    def add_route(self, *, fn: Union[Callable, str], key: str) -> None:
         """
         Adds the route with the given key.
 
-        :param fn: The callable to route to.
-        :type fn: callable
+        :param fn: The callable to route to, or its ``"package.module:function"``
+            import string to import it on first use.
+        :type fn: callable or str
         :param key: The key to associate the route with.
         :type fn: str
         """
-        self.routes[key] = fn
+        self.routes[key] = as_route(fn)
+
+    def get_route_key(self, *, event: Event) -> Optional[str]:
+        """
+        Returns the value of the ``key`` in the given event.
+        """
+        return event.raw.get(self.key, None)
 
     def get_route(self, *, event: Event) -> Callable:
         """
@@ -99,36 +177,156 @@ class EventField(Router):
 
         :param event: The event to pass to the callable route.
         """
-        route = self.get_route(event=event)
-        return route(event=event)
+        with tracing.span("get_route"):
+            route = self.get_route(event=event)
+        with tracing.span("route"):
+            return route(event=event)
+
+
+def _remaining_time(event: Event) -> Optional[float]:
+    """
+    Returns the remaining time in seconds of the invocation of the event, or ``None``
+    when it isn't known, e.g. outside of an invocation.
+    """
+    app = getattr(event, "app", None)
+    context = None if app is None else app.execution_context
+    get_remaining_time = getattr(context, "get_remaining_time_in_millis", None)
+    if get_remaining_time is None:
+        return None
+    return get_remaining_time() / 1000
+
+
+class _Undecoded:
+    """
+    The placeholder of a message body that wasn't decoded yet. Pickles by name, so
+    it's still the placeholder in the worker processes offloaded messages are sent to.
+    """
+
+    def __repr__(self) -> str:
+        return "<undecoded>"
+
+    def __reduce__(self) -> str:
+        return "_UNDECODED"
+
+
+_UNDECODED = _Undecoded()
+# Only bodies containing this are decoded up front to look for an SNS envelope.
+_SNS_MARKER = '"TopicArn"'
+
+
+def _is_sns_envelope(body: Any) -> bool:
+    return (
+        isinstance(body, dict)
+        and body.get("Type", None) == "Notification"
+        and "TopicArn" in body
+        and isinstance(body.get("Message", None), str)
+    )
 
 
 @attr.s(kw_only=True)
 class SQSMessage:
+    """
+    A single message of an SQS event.
+
+    The body is decoded from JSON on first use, after decompressing it if the message
+    has a content encoding attribute, see ``lambda_router.codecs``. Messages sent to the queue by an SNS
+    subscription are unwrapped: the ``body`` is the decoded SNS message, the rest of
+    the SNS envelope is kept as ``sns``, and the routing key is also looked up in the
+    SNS message attributes. Subscriptions with raw message delivery need no unwrapping.
+
+    :param meta: The SQS attributes and metadata of the message, e.g. ``messageId``.
+    :param body: The decoded body, decoded from the ``raw_body`` if not given.
+    :param raw_body: The body as received, or the message of the SNS envelope.
+    :param content_encoding: The name of the ``lambda_router.codecs`` codec the
+        ``raw_body`` is compressed with, if any.
+    :param key: The value of the routing key attribute, if present.
+    :param event: The ``Event`` the message was received in.
+    :param sns: The SNS envelope, without its ``Message``, if the message was sent by SNS.
+    :param pointer: The ``lambda_router.claimcheck.PayloadPointer`` the body was
+        fetched from, if the message was a claim-check.
+    """
+
     meta: Dict[str, Any] = attr.ib(factory=dict)
-    body: Dict[str, Any] = attr.ib(factory=dict)
+    _body: Any = attr.ib(default=_UNDECODED, repr=False)
+    raw_body: Optional[str] = attr.ib(default=None, repr=False)
+    content_encoding: Optional[str] = attr.ib(default=None)
     key: str = attr.ib()
     event: Event = attr.ib()
+    sns: Optional[Dict[str, Any]] = attr.ib(default=None, repr=False)
+    pointer: Optional[PayloadPointer] = attr.ib(default=None)
+
+    @property
+    def body(self) -> Any:
+        body = self._body
+        if body is _UNDECODED:
+            if self.raw_body is None:
+                body = {}
+            elif self.content_encoding is None:
+                body = json.loads(self.raw_body)
+            else:
+                body = json.loads(codecs.get_codec(self.content_encoding).decode(self.raw_body))
+            self._body = body
+        return body
+
+    @body.setter
+    def body(self, value: Any) -> None:
+        self._body = value
+
+    def set_raw_body(self, raw_body: str) -> None:
+        """
+        Replaces the raw body, which is decoded again on next use.
+        """
+        self.raw_body = raw_body
+        self._body = _UNDECODED
 
     @classmethod
-    def from_raw_sqs_message(cls, *, raw_message: Dict[str, Any], key_name: str, event: Event):
+    def from_raw_sqs_message(
+        cls,
+        *,
+        raw_message: Dict[str, Any],
+        key_name: str,
+        event: Event,
+        unwrap_sns: bool = True,
+        encoding_key: Optional[str] = codecs.DEFAULT_ENCODING_KEY,
+    ) -> "SQSMessage":
         meta = {}
         attributes = raw_message.pop("attributes", None)
         if attributes:
             meta.update(attributes)
-        body = body = raw_message.pop("body", "")
-        message_attribites = raw_message.pop("messageAttributes", None)
+        raw_body = raw_message.pop("body", "")
+        message_attribites = raw_message.pop("messageAttributes", None) or {}
         key = None
-        if message_attribites:
-            key_attribute = message_attribites.get(key_name, None)
-            if key_attribute is not None:
-                key = key_attribute["stringValue"]
+        key_attribute = message_attribites.get(key_name, None)
+        if key_attribute is not None:
+            key = key_attribute["stringValue"]
+        content_encoding = None
+        encoding_attribute = message_attribites.get(encoding_key, None) if encoding_key else None
+        if encoding_attribute is not None:
+            content_encoding = encoding_attribute["stringValue"]
         for k, value in raw_message.items():
             meta[k] = value
 
-        # Attempt to decode json body.
-        body = json.loads(body)
-        return cls(meta=meta, body=body, key=key, event=event)
+        body = _UNDECODED
+        sns = None
+        if unwrap_sns and _SNS_MARKER in raw_body:
+            # The envelope is decoded now to route on its attributes, the message
+            # itself is only decoded on first use.
+            envelope = json.loads(raw_body)
+            if _is_sns_envelope(envelope):
+                raw_body = envelope.pop("Message")
+                sns = envelope
+                sns_attributes = envelope.get("MessageAttributes", {})
+                if key is None and key_name in sns_attributes:
+                    key = sns_attributes[key_name]["Value"]
+                if content_encoding is None and encoding_key and encoding_key in sns_attributes:
+                    content_encoding = sns_attributes[encoding_key]["Value"]
+            else:
+                body = envelope
+        if content_encoding == codecs.IDENTITY:
+            content_encoding = None
+        return cls(
+            meta=meta, body=body, raw_body=raw_body, content_encoding=content_encoding, key=key, event=event, sns=sns,
+        )
 
 
 @attr.s(kw_only=True)
@@ -137,26 +335,119 @@ class SQSMessageField(Router):
     Processes all message records in a given ``Event``, routing each based on
     on the configured key.
 
-    :param key: The name of the message-level key to look for when routing.
+    Routes added with ``batch=True`` are called once per routing key with all the
+    matching messages in the batch, in arrival order, as ``route(messages=[...])``.
+    A batch route can return the messages (or message ids) that failed, which are
+    reported back to SQS as batch item failures.
+
+    Routes added with ``columnar=True`` are batch routes called with the decoded
+    bodies of the messages as columns instead, as ``route(batch=ColumnarBatch(...))``,
+    see ``lambda_router.columnar``. The ``batch.messages`` are the messages of the
+    batch, any of which the route can return as failed. Columnar routes require NumPy.
+
+    Routes added with ``offload=True`` are run in the ``workers`` process pool, for
+    CPU bound work. The messages are sent to the workers without their ``event``, and
+    any offloaded messages that fail are reported back to SQS as batch item failures.
+    The workers are given the remaining time of the invocation, less ``offload_margin``,
+    and the messages they haven't processed by then fail.
+
+    :param key: The name of the message-level key to look for when routing, in the
+        SQS message attributes or the SNS message attributes.
+    :param unwrap_sns: Unwrap the messages sent to the queue by SNS, see ``SQSMessage``.
+    :param encoding_key: The name of the message attribute naming the codec compressed
+        bodies are encoded with, or ``None`` to never decompress bodies. Messages
+        with the ``identity`` encoding aren't decompressed, and messages with an
+        encoding that isn't registered fail without being routed.
+    :param claim_check: The ``lambda_router.claimcheck.ClaimCheck`` fetching the
+        payloads of the messages that are claim-check pointers, if any.
+    :param workers: The ``lambda_router.workers.WorkerPool`` offloaded routes run in,
+        created with the defaults on first use if not given.
+    :param offload_margin: The time in seconds kept from the remaining time of the
+        invocation to report the offloaded messages that timed out.
     :param routes: The routes mapping. Only set via ``add_route``
+    :param batch_routes: The maximum batch size of each batch route, keyed on the
+        routing key. Only set via ``add_route``
+    :param offload_routes: The routing keys of the offloaded routes. Only set via ``add_route``
+    :param columnar_routes: The fields of each columnar route, or ``None`` for all the
+        fields, keyed on the routing key. Only set via ``add_route``
     """
 
     key: str = attr.ib(kw_only=True)
-    routes: Dict[str, Callable] = attr.ib(init=False, factory=dict)
+    unwrap_sns: bool = attr.ib(default=True)
+    encoding_key: Optional[str] = attr.ib(default=codecs.DEFAULT_ENCODING_KEY)
+    claim_check: Optional[ClaimCheck] = attr.ib(default=None, repr=False)
+    workers: Optional[WorkerPool] = attr.ib(default=None, repr=False)
+    offload_margin: float = attr.ib(default=1.0)
+    routes: Dict[Optional[str], Callable] = attr.ib(init=False, factory=dict)
+    batch_routes: Dict[Optional[str], Optional[int]] = attr.ib(init=False, factory=dict)
+    offload_routes: Set[str] = attr.ib(init=False, factory=set)
+    columnar_routes: Dict[Optional[str], Optional[Tuple[str, ...]]] = attr.ib(init=False, factory=dict)
 
     def _get_message(self, raw_message: Dict[str, Any], event: Event) -> SQSMessage:
-        return SQSMessage.from_raw_sqs_message(raw_message=raw_message, key_name=self.key, event=event)
-
-    def add_route(self, *, fn: Callable, key: str) -> None:
+        return SQSMessage.from_raw_sqs_message(
+            raw_message=raw_message,
+            key_name=self.key,
+            event=event,
+            unwrap_sns=self.unwrap_sns,
+            encoding_key=self.encoding_key,
+        )
+
+    def add_route(
+        self,
+        *,
+        fn: Union[Callable, str],
+        key: Optional[str],
+        batch: bool = False,
+        max_batch_size: Optional[int] = None,
+        offload: bool = False,
+        columnar: bool = False,
+        fields: Optional[Sequence[str]] = None,
+    ) -> None:
         """
         Adds the route with the given key.
 
-        :param fn: The callable to route to.
-        :type fn: callable
-        :param key: The key to associate the route with.
+        :param fn: The callable to route to, or its ``"package.module:function"``
+            import string to import it on first use.
+        :type fn: callable or str
+        :param key: The key to associate the route with, or ``None`` for the route
+            of the messages without the key, e.g. S3 notifications.
         :type fn: str
+        :param batch: Deliver all the messages with the given key as a single list.
+        :type batch: bool
+        :param max_batch_size: Splits the messages delivered to a batch route into
+            lists of at most this size.
+        :type max_batch_size: int
+        :param offload: Run the route in the ``workers`` process pool.
+        :type offload: bool
+        :param columnar: Deliver the bodies of all the messages with the given key as
+            a ``lambda_router.columnar.ColumnarBatch``. Implies ``batch``.
+        :type columnar: bool
+        :param fields: The fields of the bodies to deliver as columns of a columnar
+            route, defaults to all of them.
+        :raises ImportError: Raised for a columnar route if NumPy isn't installed.
         """
-        self.routes[key] = fn
+        if max_batch_size is not None and max_batch_size < 1:
+            raise ValueError("The max_batch_size must be at least 1.")
+        batch = batch or columnar
+        if batch and offload:
+            raise ValueError("Batch routes can't be offloaded.")
+        if fields is not None and not columnar:
+            raise ValueError("Only columnar routes take fields.")
+        if columnar:
+            require_numpy()
+        self.routes[key] = as_route(fn)
+        if columnar:
+            self.columnar_routes[key] = None if fields is None else tuple(fields)
+        else:
+            self.columnar_routes.pop(key, None)
+        if batch:
+            self.batch_routes[key] = max_batch_size
+        else:
+            self.batch_routes.pop(key, None)
+        if offload:
+            self.offload_routes.add(key)
+        else:
+            self.offload_routes.discard(key)
 
     def get_route(self, *, message: SQSMessage) -> Callable:
         """
@@ -164,32 +455,149 @@ class SQSMessageField(Router):
         given message.
 
         :raises ValueError: Raised if no route is defined or routing key is
-            not present in the message.
+            not present in the message and there's no route for ``None``.
         :rtype: callable
         """
         field_value: str = message.key
-        if field_value is None:
+        if field_value is None and None not in self.routes:
             raise ValueError(f"Routing key ({self.key}) not present in the message.")
         try:
             return self.routes[field_value]
         except KeyError:
             raise ValueError(f"No route configured for given field ({field_value}).")
 
+    def _dispatch_batch(self, *, key: str, messages: List[SQSMessage]) -> List[str]:
+        """
+        Delivers the grouped messages to the batch route for the given key, returning
+        the ids of any messages the route reported as failed.
+        """
+        route = self.routes[key]
+        max_batch_size = self.batch_routes[key] or len(messages)
+        failed_ids = []
+        for start in range(0, len(messages), max_batch_size):
+            end = start + max_batch_size
+            chunk = messages[start:end]
+            with tracing.span("batch", key=key, size=len(chunk)):
+                if key in self.columnar_routes:
+                    chunk = self._columnar_records(chunk, failed_ids=failed_ids)
+                    if not chunk:
+                        continue
+                    batch = ColumnarBatch.from_records(
+                        (message.body for message in chunk), fields=self.columnar_routes[key], messages=chunk
+                    )
+                    failed = route(batch=batch)
+                else:
+                    failed = route(messages=chunk)
+            for item in failed or ():
+                failed_ids.append(item.meta["messageId"] if isinstance(item, SQSMessage) else item)
+        return failed_ids
+
+    def _columnar_records(self, messages: List[SQSMessage], *, failed_ids: List[str]) -> List[SQSMessage]:
+        """
+        Returns the messages whose bodies are objects, which can be delivered as columns,
+        adding the ids of the other messages, and of those whose bodies can't be
+        decoded, to the ``failed_ids``.
+        """
+        records = []
+        for message in messages:
+            try:
+                body = message.body
+            except ValueError as e:
+                reason = f"its body can't be decoded: {e}"
+            else:
+                if isinstance(body, Mapping):
+                    records.append(message)
+                    continue
+                reason = f"its body is a {type(body).__name__} rather than an object"
+            message_id = message.meta["messageId"]
+            logger.error("Message (%s) can't be delivered to a columnar route, %s.", message_id, reason)
+            failed_ids.append(message_id)
+        return records
+
+    def _dispatch_offloaded(self, *, key: str, messages: List[SQSMessage], event: Event) -> List[str]:
+        """
+        Runs the route for the given key in the worker processes, once per message,
+        returning the ids of the messages that failed.
+        """
+        if self.workers is None:
+            self.workers = WorkerPool()
+        route = self.routes[key]
+        # Lazy routes are imported by the workers themselves.
+        fn = route.path if isinstance(route, LazyRoute) else route
+        remaining_time = _remaining_time(event)
+        timeout = None if remaining_time is None else max(remaining_time - self.offload_margin, 0.0)
+        with tracing.span("offload", key=key, size=len(messages)):
+            results = self.workers.map(
+                fn, [{"message": attr.evolve(message, event=None)} for message in messages], timeout=timeout
+            )
+        failed_ids = []
+        for message, result in zip(messages, results):
+            if not result.ok:
+                logger.error(
+                    "Offloaded message (%s) failed: %r\n%s",
+                    message.meta.get("messageId"),
+                    result.error,
+                    result.traceback or "",
+                )
+                failed_ids.append(message.meta["messageId"])
+        return failed_ids
+
     def dispatch(self, *, event: Event) -> Any:
         """
         Iterates over all the message records in the given Event and executes the
-        applicable callable as determined by the configured routes.
+        applicable callable as determined by the configured routes. Messages for batch
+        and offloaded routes are grouped and delivered after all the other messages
+        were processed.
 
         :param event: The event to parse for messages.
+        :returns: ``None``, or the batch item failures response when any messages
+            failed without failing the whole batch.
         """
         messages = event.raw.get("Records", None)
         if messages is None:
             raise ValueError("No messages present in Event.")
 
-        for raw_message in messages:
-            message = self._get_message(raw_message, event=event)
-            route = self.get_route(message=message)
-            # Process each message now.
-            route(message=message)
+        parsed: Optional[List[SQSMessage]] = None
+        failed_ids = []
+        unresolved: Set[int] = set()
+        if self.claim_check is not None:
+            # All the payloads of the batch are fetched together, before routing. The
+            # messages whose payloads can't be fetched fail without being routed.
+            parsed = [self._get_message(raw_message, event=event) for raw_message in messages]
+            for message in self.claim_check.resolve(parsed):
+                unresolved.add(id(message))
+                failed_ids.append(message.meta["messageId"])
+
+        groups: Dict[str, List[SQSMessage]] = {}
+        for i, raw_message in enumerate(messages):
+            if parsed is not None and id(parsed[i]) in unresolved:
+                continue
+            with tracing.span("message") as span:
+                message = self._get_message(raw_message, event=event) if parsed is None else parsed[i]
+                if span is not None:
+                    span.attributes["key"] = message.key
+                if message.content_encoding is not None and message.content_encoding not in codecs.CODECS:
+                    message_id = message.meta["messageId"]
+                    logger.error(
+                        "Message (%s) has an unknown content encoding (%s).", message_id, message.content_encoding
+                    )
+                    failed_ids.append(message_id)
+                    continue
+                with tracing.span("get_route"):
+                    route = self.get_route(message=message)
+                if message.key in self.batch_routes or message.key in self.offload_routes:
+                    groups.setdefault(message.key, []).append(message)
+                    continue
+                # Process each message now.
+                with tracing.span("route"):
+                    route(message=message)
+
+        for key, group in groups.items():
+            if key in self.offload_routes:
+                failed_ids.extend(self._dispatch_offloaded(key=key, messages=group, event=event))
+            else:
+                failed_ids.extend(self._dispatch_batch(key=key, messages=group))
+        if failed_ids:
+            return {"batchItemFailures": [{"itemIdentifier": message_id} for message_id in failed_ids]}
         # SQS Lambdas don't return a value.
         return None
@@ -0,0 +1,391 @@
+import http.client
+import http.server
+import json
+import os
+import queue
+import socket
+import sys
+import threading
+import time
+import traceback
+
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple, Union
+
+import attr
+
+from . import exceptions
+from .utils import import_string
+
+
+RUNTIME_API_VERSION = "2018-06-01"
+
+
+@attr.s(kw_only=True, frozen=True)
+class JSONCodec:
+    """
+    A pair of JSON decoding/encoding functions used by the runtime loop.
+
+    :param name: The name of the codec.
+    :param loads: Decodes a ``bytes`` payload.
+    :param dumps: Encodes an object to ``bytes``.
+    """
+
+    name: str = attr.ib()
+    loads: Callable[[bytes], Any] = attr.ib(repr=False)
+    dumps: Callable[[Any], bytes] = attr.ib(repr=False)
+
+
+def _stdlib_codec() -> JSONCodec:
+    return JSONCodec(name="json", loads=json.loads, dumps=lambda obj: json.dumps(obj).encode("utf-8"))
+
+
+def _orjson_codec() -> JSONCodec:
+    import orjson
+
+    return JSONCodec(name="orjson", loads=orjson.loads, dumps=orjson.dumps)
+
+
+def _ujson_codec() -> JSONCodec:
+    import ujson
+
+    return JSONCodec(name="ujson", loads=ujson.loads, dumps=lambda obj: ujson.dumps(obj).encode("utf-8"))
+
+
+_CODECS = {"json": _stdlib_codec, "orjson": _orjson_codec, "ujson": _ujson_codec}
+
+
+def get_codec(name: str = "auto") -> JSONCodec:
+    """
+    Returns the JSON codec with the given name. ``auto`` selects the fastest
+    installed codec, falling back to the stdlib ``json`` module.
+
+    :param name: One of ``auto``, ``json``, ``orjson`` or ``ujson``.
+    :raises ConfigError: Raised for an unknown or uninstalled codec.
+    """
+    if name == "auto":
+        for candidate in ("orjson", "ujson"):
+            try:
+                return _CODECS[candidate]()
+            except ImportError:
+                continue
+        return _stdlib_codec()
+    try:
+        factory = _CODECS[name]
+    except KeyError:
+        raise exceptions.ConfigError(f"Unknown JSON codec ({name}).")
+    try:
+        return factory()
+    except ImportError:
+        raise exceptions.ConfigError(f"JSON codec ({name}) is not installed.")
+
+
+@attr.s(kw_only=True, frozen=True)
+class LambdaContext:
+    """
+    The execution context passed to the ``App`` for each invocation, compatible with
+    the context object of the stock Python runtime.
+    """
+
+    aws_request_id: str = attr.ib()
+    deadline_ms: int = attr.ib(repr=False)
+    invoked_function_arn: str = attr.ib(repr=False)
+    trace_id: Optional[str] = attr.ib(repr=False, default=None)
+    client_context: Optional[Mapping[str, Any]] = attr.ib(repr=False, default=None)
+    identity: Optional[Mapping[str, Any]] = attr.ib(repr=False, default=None)
+    function_name: Optional[str] = attr.ib(factory=lambda: os.environ.get("AWS_LAMBDA_FUNCTION_NAME"))
+    function_version: Optional[str] = attr.ib(repr=False, factory=lambda: os.environ.get("AWS_LAMBDA_FUNCTION_VERSION"))
+    memory_limit_in_mb: Optional[str] = attr.ib(
+        repr=False, factory=lambda: os.environ.get("AWS_LAMBDA_FUNCTION_MEMORY_SIZE")
+    )
+    log_group_name: Optional[str] = attr.ib(repr=False, factory=lambda: os.environ.get("AWS_LAMBDA_LOG_GROUP_NAME"))
+    log_stream_name: Optional[str] = attr.ib(repr=False, factory=lambda: os.environ.get("AWS_LAMBDA_LOG_STREAM_NAME"))
+
+    @classmethod
+    def from_headers(cls, headers: Mapping[str, str], *, codec: JSONCodec) -> "LambdaContext":
+        client_context = headers.get("Lambda-Runtime-Client-Context")
+        identity = headers.get("Lambda-Runtime-Cognito-Identity")
+        return cls(
+            aws_request_id=headers["Lambda-Runtime-Aws-Request-Id"],
+            deadline_ms=int(headers.get("Lambda-Runtime-Deadline-Ms", 0)),
+            invoked_function_arn=headers.get("Lambda-Runtime-Invoked-Function-Arn", ""),
+            trace_id=headers.get("Lambda-Runtime-Trace-Id"),
+            client_context=codec.loads(client_context) if client_context else None,
+            identity=codec.loads(identity) if identity else None,
+        )
+
+    def get_remaining_time_in_millis(self) -> int:
+        return max(self.deadline_ms - int(time.time() * 1000), 0)
+
+
+def _error_payload(error: BaseException) -> Dict[str, Any]:
+    return {
+        "errorMessage": str(error),
+        "errorType": type(error).__name__,
+        "stackTrace": traceback.format_tb(error.__traceback__),
+    }
+
+
+@attr.s(kw_only=True)
+class RuntimeClient:
+    """
+    A client for the Lambda Runtime API that keeps a single persistent HTTP/1.1
+    connection open across invocations.
+
+    :param address: The ``host:port`` of the Runtime API, defaults to the
+        ``AWS_LAMBDA_RUNTIME_API`` environment variable.
+    :param codec: The JSON codec used for events and responses.
+    """
+
+    address: str = attr.ib(factory=lambda: os.environ["AWS_LAMBDA_RUNTIME_API"])
+    codec: JSONCodec = attr.ib(factory=get_codec)
+    _connection: Optional[http.client.HTTPConnection] = attr.ib(init=False, default=None, repr=False)
+
+    def _request(
+        self,
+        method: str,
+        path: str,
+        body: Optional[bytes] = None,
+        headers: Optional[Mapping[str, str]] = None,
+        *,
+        retry: bool = False,
+    ) -> Tuple[int, http.client.HTTPMessage, bytes]:
+        headers = dict(headers or {})
+        if body is not None:
+            headers["Content-Type"] = "application/json"
+        # Idempotent requests are retried once on a new connection if the persistent
+        # connection was closed. Responses and errors aren't, as the Runtime API may
+        # have received them already.
+        for attempt in range(2 if retry else 1):
+            if self._connection is None:
+                self._connection = self._connect()
+            try:
+                self._connection.request(method, f"/{RUNTIME_API_VERSION}{path}", body=body, headers=headers)
+                response = self._connection.getresponse()
+                data = response.read()
+            except (http.client.HTTPException, ConnectionError):
+                self.close()
+                if attempt or not retry:
+                    raise
+                continue
+            if response.will_close:
+                self.close()
+            return response.status, response.headers, data
+
+    def _connect(self) -> http.client.HTTPConnection:
+        connection = http.client.HTTPConnection(self.address)
+        connection.connect()
+        # Requests are small and latency bound, so don't wait to coalesce packets.
+        connection.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return connection
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def next_invocation(self) -> Tuple[Any, LambdaContext]:
+        """
+        Blocks until the next invocation is available and returns the decoded event
+        and its context.
+        """
+        status, headers, data = self._request("GET", "/runtime/invocation/next", retry=True)
+        if status != 200:
+            raise RuntimeError(f"Unexpected status ({status}) fetching the next invocation.")
+        return self.codec.loads(data), LambdaContext.from_headers(headers, codec=self.codec)
+
+    def post_response(self, request_id: str, response: Any) -> None:
+        status, _, data = self._request(
+            "POST", f"/runtime/invocation/{request_id}/response", body=self.codec.dumps(response)
+        )
+        if status != 202:
+            raise RuntimeError(f"Unexpected status ({status}) posting response: {data!r}")
+
+    def post_error(self, request_id: str, error: BaseException) -> None:
+        self._post_error(f"/runtime/invocation/{request_id}/error", error, error_type="Unhandled")
+
+    def post_init_error(self, error: BaseException) -> None:
+        self._post_error("/runtime/init/error", error, error_type=f"Runtime.{type(error).__name__}")
+
+    def _post_error(self, path: str, error: BaseException, *, error_type: str) -> None:
+        body = self.codec.dumps(_error_payload(error))
+        self._request("POST", path, body=body, headers={"Lambda-Runtime-Function-Error-Type": error_type})
+
+
+def _handler_path(handler: str) -> str:
+    """
+    Returns the import string of a handler given in either the ``"package.module:app"``
+    or the ``"package.module.app"`` format.
+    """
+    if ":" in handler or "." not in handler:
+        return handler
+    module_name, _, attribute = handler.rpartition(".")
+    return f"{module_name}:{attribute}"
+
+
+def run(
+    handler: Union[str, Callable[[Any, Any], Any]],
+    *,
+    client: Optional[RuntimeClient] = None,
+    max_invocations: Optional[int] = None,
+) -> None:
+    """
+    Runs the invocation loop, calling the handler (usually an ``App``) directly
+    with each decoded event.
+
+    If the handler is given as a ``"package.module:app"`` import string, or in the
+    ``"package.module.app"`` format of the ``_HANDLER`` Lambda sets, it is imported
+    here, and any import error is reported to the Runtime API as an init error
+    before being re-raised.
+
+    :param handler: The handler or an import string referencing it.
+    :param client: The ``RuntimeClient`` to use.
+    :param max_invocations: Stops the loop after the given number of invocations.
+    """
+    client = client if client is not None else RuntimeClient()
+    if isinstance(handler, str):
+        try:
+            handler = import_string(_handler_path(handler))
+        except Exception as e:
+            client.post_init_error(e)
+            raise
+
+    invocations = 0
+    while max_invocations is None or invocations < max_invocations:
+        event, context = client.next_invocation()
+        if context.trace_id:
+            os.environ["_X_AMZN_TRACE_ID"] = context.trace_id
+        else:
+            # Don't leave the trace id of the previous invocation behind.
+            os.environ.pop("_X_AMZN_TRACE_ID", None)
+        try:
+            response = handler(event, context)
+        except Exception as e:
+            client.post_error(context.aws_request_id, e)
+        else:
+            try:
+                client.post_response(context.aws_request_id, response)
+            except Exception as e:
+                # E.g. a response that isn't JSON serialisable or is too large.
+                client.post_error(context.aws_request_id, e)
+        invocations += 1
+
+
+@attr.s(kw_only=True)
+class RuntimeAPIEmulator:
+    """
+    A local stand-in for the Lambda Runtime API, for tests and benchmarks. Queued
+    events are handed out by ``/runtime/invocation/next`` and the responses and
+    errors posted back are recorded.
+
+    :param host: The host to bind to.
+    :param port: The port to bind to, ``0`` selects a free port.
+    """
+
+    host: str = attr.ib(default="127.0.0.1")
+    port: int = attr.ib(default=0)
+    responses: Dict[str, Any] = attr.ib(init=False, factory=dict, repr=False)
+    errors: Dict[str, Any] = attr.ib(init=False, factory=dict, repr=False)
+    init_errors: List[Any] = attr.ib(init=False, factory=list, repr=False)
+    connections: int = attr.ib(init=False, default=0)
+    _events: queue.Queue = attr.ib(init=False, factory=queue.Queue, repr=False)
+    _server: Optional[http.server.ThreadingHTTPServer] = attr.ib(init=False, default=None, repr=False)
+    _counter: int = attr.ib(init=False, default=0, repr=False)
+
+    @property
+    def address(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"{host}:{port}"
+
+    def add_event(self, event: Any, *, request_id: Optional[str] = None) -> str:
+        """
+        Queues an event and returns its request id.
+        """
+        self._counter += 1
+        request_id = request_id or f"request-{self._counter}"
+        self._events.put((request_id, json.dumps(event).encode("utf-8")))
+        return request_id
+
+    def start(self) -> "RuntimeAPIEmulator":
+        emulator = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                emulator.connections += 1
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, body=b"", headers=None):
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path != f"/{RUNTIME_API_VERSION}/runtime/invocation/next":
+                    return self._send(404)
+                request_id, body = emulator._events.get()
+                headers = {
+                    "Lambda-Runtime-Aws-Request-Id": request_id,
+                    "Lambda-Runtime-Deadline-Ms": str(int(time.time() * 1000) + 30000),
+                    "Lambda-Runtime-Invoked-Function-Arn": "arn:aws:lambda:eu-west-1:000000000000:function:local",
+                    "Lambda-Runtime-Trace-Id": f"Root=1-{request_id}",
+                }
+                self._send(200, body, headers)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"null")
+                parts = self.path.split("/")
+                if self.path == f"/{RUNTIME_API_VERSION}/runtime/init/error":
+                    emulator.init_errors.append(body)
+                elif len(parts) == 6 and parts[5] == "response":
+                    emulator.responses[parts[4]] = body
+                elif len(parts) == 6 and parts[5] == "error":
+                    emulator.errors[parts[4]] = body
+                else:
+                    return self._send(404)
+                self._send(202, b'{"status":"OK"}')
+
+        self._server = http.server.ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(
+            target=self._server.serve_forever, kwargs={"poll_interval": 0.05}, name="lambda_router.runtime", daemon=True
+        ).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "RuntimeAPIEmulator":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.stop()
+
+
+def main() -> None:
+    """
+    Entry point for a custom runtime ``bootstrap``, e.g.::
+
+        #!/bin/sh
+        exec python -m lambda_router.runtime "$_HANDLER"
+
+    The JSON codec can be selected with the ``LAMBDA_ROUTER_JSON_CODEC`` environment variable.
+    """
+    handler = sys.argv[1] if len(sys.argv) > 1 else os.environ["_HANDLER"]
+    codec = get_codec(os.environ.get("LAMBDA_ROUTER_JSON_CODEC", "auto"))
+    run(handler, client=RuntimeClient(codec=codec))
+
+
+if __name__ == "__main__":
+    main()
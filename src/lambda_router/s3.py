@@ -0,0 +1,228 @@
+import urllib.parse
+
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+import attr
+
+from . import tracing
+from .interfaces import Event, Router
+from .routers import SQSMessage, as_route
+from .utils import callable_name
+
+
+@attr.s(kw_only=True, slots=True)
+class S3Record:
+    """
+    A single record of an S3 event notification.
+
+    :param bucket: The name of the bucket.
+    :param key: The URL-decoded object key.
+    :param event_name: The event type, e.g. ``ObjectCreated:Put``.
+    :param size: The object size in bytes, if given.
+    :param raw: The raw notification record.
+    :param event: The ``Event`` the record was delivered in.
+    :param message: The ``SQSMessage`` the record was delivered in, if any.
+    """
+
+    bucket: str = attr.ib()
+    key: str = attr.ib()
+    event_name: str = attr.ib()
+    size: Optional[int] = attr.ib(default=None)
+    raw: Mapping[str, Any] = attr.ib(repr=False)
+    event: Any = attr.ib(default=None, repr=False)
+    message: Optional[SQSMessage] = attr.ib(default=None, repr=False)
+
+    @classmethod
+    def from_raw(cls, raw: Mapping[str, Any], *, event: Any = None, message: Optional[SQSMessage] = None) -> "S3Record":
+        s3 = raw["s3"]
+        s3_object = s3["object"]
+        return cls(
+            bucket=s3["bucket"]["name"],
+            # Object keys are URL-encoded in notifications, spaces as '+'.
+            key=urllib.parse.unquote_plus(s3_object["key"]),
+            event_name=raw["eventName"],
+            size=s3_object.get("size", None),
+            raw=raw,
+            event=event,
+            message=message,
+        )
+
+
+def _normalise_event_name(name: str) -> str:
+    # Notification configurations use the ``s3:`` prefix, records don't.
+    return name[3:] if name.startswith("s3:") else name
+
+
+@attr.s(kw_only=True, frozen=True, slots=True)
+class _Entry:
+    order: int = attr.ib()
+    name: str = attr.ib()
+    prefix: str = attr.ib()
+    suffix: str = attr.ib()
+    buckets: Optional[frozenset] = attr.ib()
+    event_names: Optional[Tuple[str, ...]] = attr.ib()
+    event_prefixes: Optional[Tuple[str, ...]] = attr.ib()
+
+    def matches(self, record: S3Record) -> bool:
+        if self.buckets is not None and record.bucket not in self.buckets:
+            return False
+        if self.suffix and not record.key.endswith(self.suffix):
+            return False
+        if self.event_names is not None:
+            name = record.event_name
+            if name not in self.event_names and not name.startswith(self.event_prefixes):
+                return False
+        return True
+
+
+class _TrieNode:
+    __slots__ = ("children", "entries")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.entries: List[_Entry] = []
+
+
+@attr.s(kw_only=True)
+class S3Router(Router):
+    """
+    Routes each record of an S3 event notification on its bucket, event type and
+    object key prefix and suffix. The route with the longest matching prefix wins,
+    and routes with the same prefix are tried in the order they were added. The
+    prefixes are indexed in a trie, so only the routes for the prefixes of a key are
+    tested.
+
+    Routes are called with each record as ``route(record=S3Record(...))``. The router
+    can also be added as a route of an ``SQSMessageField`` with ``dispatch_message``,
+    for notifications delivered via SQS.
+
+    :param routes: The routes, keyed on their name. Only set via ``add_route``
+    """
+
+    routes: Dict[str, Callable] = attr.ib(init=False, factory=dict)
+    _root: _TrieNode = attr.ib(init=False, factory=_TrieNode, repr=False)
+    _count: int = attr.ib(init=False, default=0, repr=False)
+
+    def add_route(
+        self,
+        *,
+        fn: Union[Callable, str],
+        bucket: Union[str, Sequence[str], None] = None,
+        events: Union[str, Sequence[str], None] = None,
+        prefix: str = "",
+        suffix: str = "",
+        name: Optional[str] = None,
+    ) -> None:
+        """
+        Adds the route for the given filters.
+
+        :param fn: The callable to route to, or its ``"package.module:function"``
+            import string to import it on first use.
+        :type fn: callable or str
+        :param bucket: The bucket name(s) to match, defaults to all buckets.
+        :param events: The event type(s) to match, e.g. ``s3:ObjectCreated:*`` or
+            ``ObjectRemoved:Delete``, defaults to all event types.
+        :param prefix: The object key prefix to match.
+        :param suffix: The object key suffix to match.
+        :param name: The name of the route, defaults to the name of the callable.
+        :raises ValueError: Raised if the name is taken.
+        """
+        if name is None:
+            name = fn if isinstance(fn, str) else callable_name(fn)
+        if name in self.routes:
+            raise ValueError(f"A route named ({name}) already exists.")
+        buckets = None
+        if bucket is not None:
+            buckets = frozenset([bucket] if isinstance(bucket, str) else bucket)
+        event_names = event_prefixes = None
+        if events is not None:
+            names = [_normalise_event_name(e) for e in ([events] if isinstance(events, str) else events)]
+            event_names = tuple(n for n in names if not n.endswith("*"))
+            event_prefixes = tuple(n[:-1] for n in names if n.endswith("*"))
+        entry = _Entry(
+            order=self._count,
+            name=name,
+            prefix=prefix,
+            suffix=suffix,
+            buckets=buckets,
+            event_names=event_names,
+            event_prefixes=event_prefixes,
+        )
+        node = self._root
+        for char in prefix:
+            node = node.children.setdefault(char, _TrieNode())
+        node.entries.append(entry)
+        self.routes[name] = as_route(fn)
+        self._count += 1
+
+    def match(self, record: S3Record) -> Optional[str]:
+        """
+        Returns the name of the route for the given record, if any.
+        """
+        # Collect the nodes of all the route prefixes of the key, then try them
+        # from the longest prefix down.
+        node = self._root
+        nodes = [node]
+        for char in record.key:
+            node = node.children.get(char)
+            if node is None:
+                break
+            nodes.append(node)
+        for node in reversed(nodes):
+            for entry in node.entries:
+                if entry.matches(record):
+                    return entry.name
+        return None
+
+    def get_route(self, *, record: S3Record) -> Callable:
+        """
+        Returns the route for the given record.
+
+        :raises ValueError: Raised if no route matches the record.
+        :rtype: callable
+        """
+        name = self.match(record)
+        if name is None:
+            raise ValueError(f"No route configured for ({record.event_name}) of ({record.bucket}/{record.key}).")
+        return self.routes[name]
+
+    def _dispatch_records(self, records: Sequence[Mapping[str, Any]], *, event: Any, message: Any = None) -> None:
+        for raw_record in records:
+            with tracing.span("record") as span:
+                record = S3Record.from_raw(raw_record, event=event, message=message)
+                with tracing.span("get_route"):
+                    route = self.get_route(record=record)
+                if span is not None:
+                    span.attributes["key"] = record.key
+                with tracing.span("route"):
+                    route(record=record)
+
+    def dispatch(self, *, event: Event) -> Any:
+        """
+        Routes each record of the S3 notification in the given event.
+
+        :param event: The event to parse for records.
+        """
+        if event.raw.get("Event", None) == "s3:TestEvent":
+            # Sent once when the notification is configured, without any records.
+            return None
+        records = event.raw.get("Records", None)
+        if records is None:
+            raise ValueError("No records present in Event.")
+        self._dispatch_records(records, event=event)
+        return None
+
+    def dispatch_message(self, *, message: SQSMessage) -> None:
+        """
+        Routes each record of an S3 notification delivered as the body of an SQS
+        message. Used as an ``SQSMessageField`` route, which already decoded the body::
+
+            sqs_router.add_route(fn=s3_router.dispatch_message, key=None)
+        """
+        body = message.body
+        if body.get("Event", None) == "s3:TestEvent":
+            return
+        records = body.get("Records", None)
+        if records is None:
+            raise ValueError("No S3 records present in the message.")
+        self._dispatch_records(records, event=message.event, message=message)
@@ -0,0 +1,88 @@
+import atexit
+import logging
+import os
+import signal
+import threading
+
+from typing import Any, Callable, List
+
+from .utils import callable_name
+
+
+logger = logging.getLogger(__name__)
+
+_callbacks: List[Callable[[], Any]] = []
+_previous_handler: Any = None
+_installed = False
+
+
+def register(fn: Callable[[], Any]) -> Callable[[], Any]:
+    """
+    Registers a callback that is called without arguments when the execution
+    environment shuts down, e.g. to write out buffered data or close connections.
+
+    The process of a lambda is frozen between invocations and eventually killed, so
+    ``atexit`` handlers don't run there. The runtime sends ``SIGTERM`` before it
+    shuts down the execution environment, but only when an extension is registered,
+    e.g. by a Lambda layer. Without one, the process is killed without notice, so
+    anything that must not be lost has to be written out during the invocation.
+
+    Callbacks are called in the reverse order they were registered, on ``SIGTERM``
+    or else when the interpreter exits, whichever comes first.
+    """
+    _callbacks.append(fn)
+    install()
+    return fn
+
+
+def unregister(fn: Callable[[], Any]) -> None:
+    """
+    Removes a registered callback, if it's registered.
+    """
+    try:
+        _callbacks.remove(fn)
+    except ValueError:
+        pass
+
+
+def install() -> bool:
+    """
+    Installs the ``SIGTERM`` handler that runs the callbacks, keeping any previously
+    installed handler, which is called after the callbacks. Signal handlers can
+    only be installed from the main thread, so this is retried on every ``register``
+    until it succeeds.
+
+    :returns: Whether the handler is installed.
+    """
+    global _installed, _previous_handler
+    if _installed:
+        return True
+    if threading.current_thread() is not threading.main_thread():
+        return False
+    _previous_handler = signal.signal(signal.SIGTERM, _handle_sigterm)
+    atexit.register(run_callbacks)
+    _installed = True
+    return True
+
+
+def run_callbacks() -> None:
+    """
+    Calls and removes all the registered callbacks, newest first. A failing callback
+    is logged and doesn't stop the remaining ones.
+    """
+    while _callbacks:
+        fn = _callbacks.pop()
+        try:
+            fn()
+        except Exception:
+            logger.exception("The shutdown callback (%s) failed.", callable_name(fn))
+
+
+def _handle_sigterm(signum: int, frame: Any) -> None:
+    run_callbacks()
+    if callable(_previous_handler):
+        _previous_handler(signum, frame)
+    elif _previous_handler != signal.SIG_IGN:
+        # Terminate with the default action, as if no handler had been installed.
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        os.kill(os.getpid(), signal.SIGTERM)
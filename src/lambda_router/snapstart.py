@@ -0,0 +1,129 @@
+import random
+import time
+
+from typing import Any, Callable, Dict, List, Optional
+
+import attr
+
+from .utils import callable_name
+
+
+@attr.s(kw_only=True)
+class LifecycleHooks:
+    """
+    An ordered collection of lifecycle hooks. Hooks are called as ``fn(app)`` in
+    ascending ``order``, hooks with the same order in the order they were added.
+
+    :param name: The name of the lifecycle phase, used in log messages.
+    """
+
+    name: str = attr.ib()
+    _hooks: List[Any] = attr.ib(init=False, factory=list, repr=False)
+
+    def __len__(self) -> int:
+        return len(self._hooks)
+
+    def add(self, fn: Callable, *, order: int = 0) -> None:
+        self._hooks.append((order, len(self._hooks), fn))
+        self._hooks.sort(key=lambda hook: hook[:2])
+
+    def run(self, app: Any) -> Dict[str, float]:
+        """
+        Runs all the hooks, returning the duration in seconds of each hook keyed on
+        its name, added up for hooks with the same name, e.g. lambdas or the ``close``
+        methods of several clients. Any failing hook is raised after the remaining
+        hooks have run.
+        """
+        timings = {}
+        error: Optional[BaseException] = None
+        for _, _, fn in self._hooks:
+            start = time.perf_counter()
+            try:
+                fn(app)
+            except Exception as e:
+                app.logger.exception("The %s hook (%s) failed.", self.name, callable_name(fn))
+                if error is None:
+                    error = e
+            name = callable_name(fn)
+            timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+        if error is not None:
+            raise error
+        return timings
+
+
+def prepare_snapshot(app: Any) -> None:
+    """
+    The built-in ``before_snapshot`` hook, run after all the other hooks. Delivers any
+    queued exception reports and writes out any buffered log records, so they aren't
+    lost or repeated by every restored copy of the snapshot, and closes the idle
+    pooled resources, whose connections wouldn't survive the restore, and stops any
+    worker processes, which aren't part of the snapshot.
+    """
+    app.resources.close()
+    workers = getattr(app.router, "workers", None)
+    if workers is not None:
+        workers.close()
+    for reporter in app.exception_reporters:
+        reporter.flush()
+    for handler in app.logger.handlers:
+        handler.flush()
+
+
+def reset_after_restore(app: Any) -> None:
+    """
+    The built-in ``after_restore`` hook, run before all the other hooks. Re-seeds the
+    global ``random`` generator, which all the restored copies of a snapshot would
+    otherwise share the state of, restarts the cold start timing, so the first
+    invocation after a restore is reported as a cold start, and closes any pooled
+    resources created from the snapshot.
+    """
+    app.resources.close()
+    random.seed()
+    app.cold_start = True
+    app.created_at = time.perf_counter()
+
+
+def register_runtime_hooks(app: Any) -> bool:
+    """
+    Registers the ``App`` lifecycle hooks with the Lambda runtime, when the
+    ``snapshot_restore_py`` module of the runtime is available.
+
+    :returns: Whether the hooks were registered.
+    """
+    try:
+        import snapshot_restore_py
+    except ImportError:
+        return False
+    snapshot_restore_py.register_before_snapshot(app.run_before_snapshot_hooks)
+    snapshot_restore_py.register_after_restore(app.run_after_restore_hooks)
+    return True
+
+
+@attr.s(kw_only=True, frozen=True)
+class SimulationResult:
+    """
+    The timings of a simulated snapshot and restore.
+
+    :param before_snapshot: The duration in seconds of each ``before_snapshot`` hook.
+    :param after_restore: The duration in seconds of each ``after_restore`` hook.
+    """
+
+    before_snapshot: Dict[str, float] = attr.ib()
+    after_restore: Dict[str, float] = attr.ib()
+
+
+def simulate_snapshot_restore(app: Any, *, between: Optional[Callable[[], None]] = None) -> SimulationResult:
+    """
+    Simulates the runtime taking a snapshot of the given ``App`` and restoring it, by
+    running the lifecycle hooks in the same order the runtime would. Used to test
+    the hooks locally.
+
+    :param app: The ``App`` to snapshot and restore.
+    :param between: Called between the snapshot and the restore, e.g. to simulate
+        connections being dropped while the snapshot is stored.
+    """
+    before_snapshot = app.run_before_snapshot_hooks()
+    if between is not None:
+        between()
+    after_restore = app.run_after_restore_hooks()
+    return SimulationResult(before_snapshot=before_snapshot, after_restore=after_restore)
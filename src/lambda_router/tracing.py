@@ -0,0 +1,299 @@
+import abc
+import contextvars
+import functools
+import itertools
+import json
+import logging
+import os
+import time
+
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+import attr
+
+
+@attr.s(kw_only=True, slots=True)
+class Span:
+    """
+    A single timed phase of an invocation.
+
+    :param name: The name of the phase.
+    :param trace_id: The id of the invocation trace the span belongs to.
+    :param span_id: The id of the span, unique within the trace.
+    :param parent_id: The id of the parent span, or ``None`` for the root span.
+    :param start: The ``time.perf_counter`` value at the start of the span.
+    :param end: The ``time.perf_counter`` value at the end of the span.
+    :param attributes: Any additional attributes recorded for the span.
+    """
+
+    name: str = attr.ib()
+    trace_id: str = attr.ib(repr=False)
+    span_id: int = attr.ib(repr=False)
+    parent_id: Optional[int] = attr.ib(repr=False, default=None)
+    start: float = attr.ib(repr=False)
+    end: Optional[float] = attr.ib(repr=False, default=None)
+    epoch_offset: float = attr.ib(repr=False, default=0.0)
+    attributes: Dict[str, Any] = attr.ib(factory=dict)
+
+    @property
+    def duration(self) -> Optional[float]:
+        """
+        The duration of the span in seconds, or ``None`` if it hasn't ended.
+        """
+        if self.end is None:
+            return None
+        return self.end - self.start
+
+    @property
+    def start_time_ns(self) -> int:
+        """
+        The wall clock start time of the span in nanoseconds since the epoch.
+        """
+        return int((self.start + self.epoch_offset) * 1e9)
+
+    @property
+    def end_time_ns(self) -> Optional[int]:
+        """
+        The wall clock end time of the span in nanoseconds since the epoch.
+        """
+        if self.end is None:
+            return None
+        return int((self.end + self.epoch_offset) * 1e9)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time": self.start + self.epoch_offset,
+            "duration": self.duration,
+            "attributes": self.attributes,
+        }
+
+
+@attr.s(kw_only=True, slots=True)
+class Trace:
+    """
+    Collects the spans of a single invocation. Spans can be added from other threads
+    running in a copy of the invocation's context, e.g. concurrent fetches.
+    """
+
+    trace_id: str = attr.ib(factory=lambda: os.urandom(16).hex())
+    spans: List[Span] = attr.ib(factory=list, repr=False)
+    epoch_offset: float = attr.ib(factory=lambda: time.time() - time.perf_counter(), repr=False)
+    # ``next`` on a count is atomic, unlike taking the length of ``spans`` and appending.
+    span_ids: Iterator[int] = attr.ib(factory=itertools.count, repr=False)
+
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("lambda_router_trace", default=None)
+_current_span: contextvars.ContextVar = contextvars.ContextVar("lambda_router_span", default=None)
+
+
+class _SpanContext:
+    """
+    Context manager that times a single span within the current trace.
+    """
+
+    __slots__ = ("_trace", "_name", "_attributes", "_span", "_token")
+
+    def __init__(self, trace: Trace, name: str, attributes: Dict[str, Any]):
+        self._trace = trace
+        self._name = name
+        self._attributes = attributes
+
+    def __enter__(self) -> Span:
+        trace = self._trace
+        parent = _current_span.get()
+        self._span = Span(
+            name=self._name,
+            trace_id=trace.trace_id,
+            span_id=next(trace.span_ids),
+            parent_id=None if parent is None else parent.span_id,
+            start=time.perf_counter(),
+            epoch_offset=trace.epoch_offset,
+            attributes=self._attributes,
+        )
+        trace.spans.append(self._span)
+        self._token = _current_span.set(self._span)
+        return self._span
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self._span.end = time.perf_counter()
+        if exc_type is not None:
+            self._span.attributes["error"] = exc_type.__name__
+        _current_span.reset(self._token)
+
+
+class _NullSpanContext:
+    """
+    A no-op context manager used when no trace is active.
+    """
+
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        return None
+
+
+_NULL_SPAN_CONTEXT = _NullSpanContext()
+
+
+def span(name: str, **attributes: Any) -> Any:
+    """
+    Returns a context manager that times a span with the given name in the
+    current trace. When no trace is active this is a no-op.
+
+    :param name: The name of the span.
+    :param attributes: Any additional attributes to record for the span.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return _NULL_SPAN_CONTEXT
+    return _SpanContext(trace, name, attributes)
+
+
+def traced(fn: Callable, *, name: str) -> Callable:
+    """
+    Wraps the given keyword-only callable so that each call is timed in a span.
+
+    :param fn: The callable to wrap, e.g. a middleware instance.
+    :param name: The name of the span.
+    """
+
+    @functools.wraps(fn)
+    def wrapper(**kwargs: Any) -> Any:
+        with span(name):
+            return fn(**kwargs)
+
+    return wrapper
+
+
+def current_span() -> Optional[Span]:
+    """
+    Returns the currently active span, if any.
+    """
+    return _current_span.get()
+
+
+class Exporter(abc.ABC):
+    """
+    Abstract interface for span exporters.
+    """
+
+    @abc.abstractmethod
+    def export(self, spans: Sequence[Span]) -> None:
+        raise NotImplementedError("This method must be implemented by a subclass.")
+
+
+@attr.s(kw_only=True)
+class InMemoryExporter(Exporter):
+    """
+    Keeps all exported spans in memory. Mainly useful for tests.
+    """
+
+    spans: List[Span] = attr.ib(factory=list, repr=False)
+
+    def export(self, spans: Sequence[Span]) -> None:
+        self.spans.extend(spans)
+
+    def clear(self) -> None:
+        self.spans.clear()
+
+
+@attr.s(kw_only=True)
+class LogExporter(Exporter):
+    """
+    Logs all the spans of each trace as a single JSON document.
+
+    :param logger: The logger to write to.
+    :param level: The log level to use.
+    """
+
+    logger: logging.Logger = attr.ib(factory=lambda: logging.getLogger(__name__), repr=False)
+    level: int = attr.ib(default=logging.INFO)
+
+    def export(self, spans: Sequence[Span]) -> None:
+        if not spans or not self.logger.isEnabledFor(self.level):
+            return
+        document = {"trace_id": spans[0].trace_id, "spans": [span.to_dict() for span in spans]}
+        self.logger.log(self.level, json.dumps(document, default=str))
+
+
+@attr.s(kw_only=True)
+class OpenTelemetryExporter(Exporter):
+    """
+    Re-creates the spans of each trace as OpenTelemetry spans. Requires the optional
+    ``opentelemetry-api`` package.
+
+    :param tracer: The OpenTelemetry tracer to use, defaults to the tracer for this module
+        from the global tracer provider.
+    """
+
+    tracer: Any = attr.ib(default=None, repr=False)
+
+    def __attrs_post_init__(self):
+        try:
+            from opentelemetry import trace
+        except ImportError:  # pragma: no cover
+            raise ImportError("The opentelemetry-api package is required to use the OpenTelemetryExporter.")
+        self._trace_api = trace
+        if self.tracer is None:
+            self.tracer = trace.get_tracer(__name__)
+
+    def export(self, spans: Sequence[Span]) -> None:
+        otel_spans: Dict[int, Any] = {}
+        for span in spans:
+            context = None
+            if span.parent_id is not None and span.parent_id in otel_spans:
+                context = self._trace_api.set_span_in_context(otel_spans[span.parent_id])
+            otel_span = self.tracer.start_span(
+                span.name, context=context, start_time=span.start_time_ns, attributes=span.attributes
+            )
+            otel_spans[span.span_id] = otel_span
+        for span in reversed(spans):
+            otel_spans[span.span_id].end(end_time=span.end_time_ns)
+
+
+class _TraceContext:
+    """
+    Context manager that activates a new trace with a root span and exports the
+    collected spans on exit.
+    """
+
+    __slots__ = ("_tracer", "_trace", "_root", "_token")
+
+    def __init__(self, tracer: "Tracer", name: str, attributes: Dict[str, Any]):
+        self._tracer = tracer
+        self._trace = Trace()
+        self._root = _SpanContext(self._trace, name, attributes)
+
+    def __enter__(self) -> Span:
+        self._token = _current_trace.set(self._trace)
+        return self._root.__enter__()
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self._root.__exit__(exc_type, exc_value, traceback)
+        _current_trace.reset(self._token)
+        self._tracer.exporter.export(self._trace.spans)
+
+
+@attr.s(kw_only=True)
+class Tracer:
+    """
+    Traces the phases of ``App`` invocations.
+
+    :param exporter: The ``Exporter`` the spans of each invocation are passed to.
+    """
+
+    exporter: Exporter = attr.ib(factory=InMemoryExporter)
+
+    def trace(self, name: str, **attributes: Any) -> _TraceContext:
+        """
+        Returns a context manager that starts a new trace with a root span of the
+        given name.
+        """
+        return _TraceContext(self, name, attributes)
@@ -0,0 +1,33 @@
+import importlib
+
+from typing import Any, Callable
+
+
+def import_string(path: str) -> Any:
+    """
+    Imports and returns the object referenced by an import string in the
+    ``"package.module:attribute"`` format. Dotted attribute paths are supported
+    after the colon, e.g. ``"package.module:Class.method"``.
+
+    :param path: The import string.
+    :raises ValueError: Raised if the import string is malformed.
+    :raises ImportError: Raised if the module or attribute cannot be imported.
+    """
+    module_name, sep, attribute_path = path.partition(":")
+    if not sep or not module_name or not attribute_path:
+        raise ValueError(f"Invalid import string ({path}), expected 'package.module:attribute'.")
+    obj = importlib.import_module(module_name)
+    for attribute in attribute_path.split("."):
+        try:
+            obj = getattr(obj, attribute)
+        except AttributeError:
+            raise ImportError(f"Module ({module_name}) has no attribute ({attribute_path}).")
+    return obj
+
+
+def callable_name(fn: Callable) -> str:
+    """
+    Returns the qualified name of the given callable, e.g. ``"package.module:function"``.
+    """
+    qualname = getattr(fn, "__qualname__", None) or type(fn).__qualname__
+    return f"{getattr(fn, '__module__', None)}:{qualname}"
@@ -0,0 +1,266 @@
+import functools
+import keyword
+import logging
+
+from typing import Any, Callable, Dict, List, Mapping, Optional
+
+import attr
+
+from . import exceptions
+
+
+logger = logging.getLogger(__name__)
+
+# Templates use the same ``required``, ``default`` and ``converter`` parameters as
+# the ``lambda_router.config`` templates, plus ``type`` and a nested ``schema``.
+_TEMPLATE_PARAMETERS = frozenset(["required", "default", "converter", "type", "schema"])
+_MISSING = object()
+
+
+def _check_template(template: Mapping[str, Any]) -> None:
+    """
+    Checks that the given template can be compiled.
+
+    :raises lambda_router.exceptions.ConfigError: Raised for unusable field names
+        or unknown field parameters.
+    """
+    if not isinstance(template, Mapping) or not template:
+        raise exceptions.ConfigError("A schema template must be a non-empty mapping of fields.")
+    for field, params in template.items():
+        if not isinstance(field, str) or not field.isidentifier() or keyword.iskeyword(field):
+            raise exceptions.ConfigError(f"Schema field ({field!r}) is not a valid identifier.")
+        if field.startswith("_"):
+            raise exceptions.ConfigError(f"Schema field ({field}) can't start with an underscore.")
+        unknown = set(params) - _TEMPLATE_PARAMETERS
+        if unknown:
+            raise exceptions.ConfigError(f"Unknown parameters ({', '.join(sorted(unknown))}) for field ({field}).")
+
+
+def _generate_checks(i: int, field: str, params: Mapping[str, Any]) -> List[str]:
+    """
+    Returns the lines that check and coerce the present value of a single field. The
+    type check, nested schema and converter each only run if the previous step passed.
+    """
+    value = f"v{i}"
+    steps = []
+    if "type" in params:
+        steps.append(
+            [
+                f"if not isinstance({value}, t{i}):",
+                f"    errors.append(path + {field + ': expected ' + _type_name(params['type']) + ', got '!r}"
+                f" + type({value}).__name__)",
+            ]
+        )
+    if "schema" in params:
+        steps.append(
+            [
+                "try:",
+                f"    {value} = s{i}({value}, path + {field + '.'!r})",
+                "except ValidationError as e:",
+                "    errors.extend(e.errors)",
+            ]
+        )
+    if "converter" in params:
+        steps.append(
+            [
+                "try:",
+                f"    {value} = c{i}({value})",
+                "except (TypeError, ValueError) as e:",
+                f"    errors.append(path + {field + ': '!r} + str(e))",
+            ]
+        )
+    lines: List[str] = []
+    indent = ""
+    for n, step in enumerate(steps):
+        if n:
+            lines.append(f"{indent}else:")
+            indent += "    "
+        lines.extend(f"{indent}{line}" for line in step)
+    return lines
+
+
+def _generate_source(template: Mapping[str, Any]) -> List[str]:
+    """
+    Returns the lines of the specialised ``validate`` function for the given template.
+    Each field is unrolled into straight-line code, so the checks that aren't part of
+    the template cost nothing at call time.
+    """
+    lines = [
+        "def validate(payload, path=''):",
+        # Skip the (slow) abstract base class check for plain dicts.
+        "    if type(payload) is not dict and not isinstance(payload, Mapping):",
+        "        message = (path[:-1] or 'payload') + ': expected an object, got ' + type(payload).__name__",
+        "        raise ValidationError([message])",
+        "    errors = []",
+    ]
+    for i, (field, params) in enumerate(template.items()):
+        value = f"v{i}"
+        lines.append(f"    {value} = payload.get({field!r}, MISSING)")
+        lines.append(f"    if {value} is MISSING:")
+        if params.get("required", False):
+            lines.append(f"        errors.append(path + {field + ': required field is missing'!r})")
+        elif "default" in params:
+            lines.append(f"        {value} = d{i}")
+        else:
+            lines.append(f"        {value} = None")
+        checks = _generate_checks(i, field, params)
+        if checks:
+            # Defaults and missing optional fields are passed through as they are.
+            lines.append("    else:")
+            lines.extend(f"        {check}" for check in checks)
+    lines.append("    if errors:")
+    lines.append("        raise ValidationError(errors)")
+    # The payload class has no validators or converters, so its slots are set
+    # directly instead of going through the (slower) keyword-only ``__init__``.
+    lines.append("    obj = new(cls)")
+    lines.extend(f"    obj.{field} = v{i}" for i, field in enumerate(template))
+    lines.append("    return obj")
+    return lines
+
+
+@attr.s(kw_only=True, frozen=True)
+class Schema:
+    """
+    A payload validator compiled from a template. Templates map each field name to
+    its parameters:
+
+    * ``required``: whether the field must be present, defaults to ``False``.
+    * ``default``: the value of a missing, optional field, otherwise ``None``.
+    * ``type``: the type, or tuple of types, the raw value must be an instance of.
+    * ``converter``: called with the raw value to coerce it, any ``TypeError`` or
+      ``ValueError`` is reported as a validation error.
+    * ``schema``: a nested template (or ``Schema``) the raw value is validated with.
+
+    The template is compiled once into a specialised validation function, and valid
+    payloads are returned as instances of a slotted ``attrs`` class with the fields of
+    the template. Unknown keys in the payload are ignored.
+
+    :param name: The name of the generated payload class.
+    :param template: The template the schema was compiled from.
+    :param cls: The generated payload class.
+    """
+
+    name: str = attr.ib()
+    template: Mapping[str, Any] = attr.ib(repr=False)
+    cls: type = attr.ib(repr=False)
+    _validate: Callable = attr.ib(repr=False)
+
+    @classmethod
+    def compile(cls, template: Mapping[str, Any], *, name: str = "Payload") -> "Schema":
+        """
+        Compiles the given template.
+
+        :param template: The mapping of field names to field parameters.
+        :param name: The name of the generated payload class.
+        :raises lambda_router.exceptions.ConfigError: Raised if the template is invalid.
+        """
+        _check_template(template)
+        payload_cls = attr.make_class(name, {field: attr.ib() for field in template}, slots=True, kw_only=True)
+        namespace: Dict[str, Any] = {
+            "Mapping": Mapping,
+            "ValidationError": exceptions.ValidationError,
+            "MISSING": _MISSING,
+            "cls": payload_cls,
+            "new": object.__new__,
+        }
+        # Bind everything the generated code uses to its own globals, to avoid any
+        # attribute or item lookups at call time.
+        for i, (field, params) in enumerate(template.items()):
+            namespace[f"d{i}"] = params.get("default", None)
+            namespace[f"t{i}"] = params.get("type", None)
+            namespace[f"c{i}"] = params.get("converter", None)
+            if "schema" in params:
+                namespace[f"s{i}"] = compile_schema(params["schema"], name=f"{name}_{field}")._validate
+        source = "\n".join(_generate_source(template))
+        exec(compile(source, f"<lambda_router.validation {name}>", "exec"), namespace)
+        return cls(name=name, template=template, cls=payload_cls, validate=namespace["validate"])
+
+    def __call__(self, payload: Any, path: str = "") -> Any:
+        """
+        Validates and coerces the given payload.
+
+        :param payload: The mapping to validate.
+        :param path: The prefix of any field names in the error messages.
+        :raises lambda_router.exceptions.ValidationError: Raised with all the errors
+            found if the payload is invalid.
+        """
+        return self._validate(payload, path)
+
+
+def _type_name(types: Any) -> str:
+    if isinstance(types, tuple):
+        return " or ".join(t.__name__ for t in types)
+    return types.__name__
+
+
+def compile_schema(schema: Any, *, name: str = "Payload") -> Schema:
+    """
+    Returns the given ``Schema``, or compiles it if it's a template.
+    """
+    if isinstance(schema, Schema):
+        return schema
+    return Schema.compile(schema, name=name)
+
+
+def get_payload_source(kwargs: Mapping[str, Any]) -> Any:
+    """
+    Returns the part of a route's arguments that is validated: the ``body`` of an
+    ``SQSMessage``, the ``arguments`` of an ``AppSyncEvent`` and the ``raw`` dict of
+    any other event.
+    """
+    message = kwargs.get("message", None)
+    if message is not None:
+        return message.body
+    event = kwargs["event"]
+    arguments = getattr(event, "arguments", None)
+    if arguments is not None:
+        return arguments
+    return event.raw
+
+
+def validate_route(fn: Callable, schema: Any, *, name: Optional[str] = None) -> Callable:
+    """
+    Wraps the given route so that it's called with the validated payload as an
+    extra ``payload`` argument. Invalid payloads are rejected before the route is
+    called.
+
+    Batch routes, called with ``messages``, receive a list of payloads in the same
+    order. Each message is validated on its own: the route is only called with the
+    valid messages, and the invalid ones are returned as failed, along with any
+    messages the route returns, so they're reported as batch item failures.
+
+    :param fn: The route to wrap.
+    :param schema: The ``Schema`` or template to validate with.
+    :param name: The name of the generated payload class, defaults to the route's name.
+    """
+    if name is None:
+        name = f"{getattr(fn, '__name__', 'route')}_payload"
+        if not name.isidentifier():
+            name = "Payload"
+    schema = compile_schema(schema, name=name)
+
+    @functools.wraps(fn)
+    def route(**kwargs):
+        messages = kwargs.get("messages", None)
+        if messages is None:
+            return fn(payload=schema(get_payload_source(kwargs)), **kwargs)
+        valid = []
+        payload = []
+        invalid = []
+        for message in messages:
+            try:
+                payload.append(schema(message.body))
+            except ValueError as e:
+                # Invalid, or can't be decoded at all.
+                logger.error("Message (%s) has an invalid payload: %s", message.meta.get("messageId"), e)
+                invalid.append(message)
+            else:
+                valid.append(message)
+        if not valid:
+            return invalid
+        kwargs["messages"] = valid
+        failed = fn(payload=payload, **kwargs)
+        return [*(failed or ()), *invalid]
+
+    route.schema = schema
+    return route
@@ -0,0 +1,296 @@
+import multiprocessing
+import os
+import pickle
+import signal
+import threading
+import time
+import traceback
+
+from multiprocessing.connection import Connection, wait
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Union
+
+import attr
+
+from . import exceptions, shutdown
+from .utils import import_string
+
+
+@attr.s(kw_only=True, frozen=True, slots=True)
+class TaskResult:
+    """
+    The outcome of a single task run by a ``WorkerPool``.
+
+    :param value: The value returned by the task.
+    :param error: The exception raised by the task, if it failed.
+    :param traceback: The formatted traceback of the ``error``.
+    """
+
+    value: Any = attr.ib(default=None)
+    error: Optional[BaseException] = attr.ib(default=None)
+    traceback: Optional[str] = attr.ib(default=None, repr=False)
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _portable_error(error: BaseException) -> BaseException:
+    """
+    Returns the given exception if it survives pickling, otherwise a ``WorkerError``
+    describing it.
+    """
+    try:
+        pickle.loads(pickle.dumps(error))
+    except Exception:
+        return exceptions.WorkerError(f"{type(error).__name__}: {error}")
+    return error
+
+
+def _worker_main(connection: Connection, max_tasks: Optional[int]) -> None:
+    """
+    The loop of a worker process: receives ``(fn, kwargs)`` tasks over its pipe and
+    sends back a ``TaskResult`` for each, until it's told to stop, its pipe is
+    closed or it ran ``max_tasks`` tasks.
+    """
+    # The pool stops the workers itself, so they don't run the shutdown callbacks
+    # inherited from the lambda process when forked.
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    routes: Dict[str, Callable] = {}
+    tasks = 0
+    while max_tasks is None or tasks < max_tasks:
+        try:
+            task = connection.recv()
+        except (EOFError, OSError):
+            break
+        if task is None:
+            break
+        fn, kwargs = task
+        try:
+            if isinstance(fn, str):
+                try:
+                    fn = routes[fn]
+                except KeyError:
+                    fn = routes[fn] = import_string(fn)
+            result = TaskResult(value=fn(**kwargs))
+        except Exception as e:
+            result = TaskResult(error=_portable_error(e), traceback=traceback.format_exc())
+        try:
+            connection.send(result)
+        except Exception as e:
+            connection.send(TaskResult(error=exceptions.WorkerError(f"Can't send the task result: {e}")))
+        tasks += 1
+    connection.close()
+
+
+@attr.s(kw_only=True)
+class _Worker:
+    process: Any = attr.ib()
+    connection: Connection = attr.ib()
+    tasks: int = attr.ib(default=0)
+
+
+@attr.s(kw_only=True)
+class WorkerPool:
+    """
+    A pool of worker processes, for running CPU bound routes on all the cores of the
+    lambda. The workers are started on first use and reused across invocations, and
+    stopped when the execution environment shuts down, see
+    ``lambda_router.shutdown.register``. The runtime only signals the shutdown to
+    lambdas with an extension, so call ``close`` explicitly to stop them otherwise.
+
+    Tasks are sent to the workers over pipes, rather than with ``multiprocessing.Queue``
+    or ``multiprocessing.Pool``, which need the ``/dev/shm`` shared memory that the
+    lambda environment lacks. Tasks and their results must be picklable: functions
+    must be defined at the top level of a module, or given as import strings.
+
+    The workers are started with ``forkserver`` by default, so they're forked from a
+    clean server process. Forking the lambda process itself (``start_method="fork"``)
+    starts them faster, with the modules already imported, but copies it mid-flight:
+    a lock held by one of its threads, like those of the exception reporters, the
+    claim-check fetches or the profiler, stays locked forever in the workers. Only
+    fork when no threads are running yet.
+
+    :param processes: The number of worker processes, defaults to the number of CPUs.
+    :param max_tasks_per_worker: Replaces each worker with a new process after it
+        ran this many tasks, to bound any leaked memory.
+    :param start_method: The ``multiprocessing`` start method, defaults to
+        ``forkserver`` where available and ``spawn`` otherwise.
+    """
+
+    processes: int = attr.ib()
+    max_tasks_per_worker: Optional[int] = attr.ib(default=None)
+    start_method: str = attr.ib()
+    started: int = attr.ib(init=False, default=0)
+    timed_out: int = attr.ib(init=False, default=0)
+    _workers: List[_Worker] = attr.ib(init=False, factory=list, repr=False)
+    _lock: threading.Lock = attr.ib(init=False, factory=threading.Lock, repr=False)
+    _registered_shutdown: bool = attr.ib(init=False, default=False, repr=False)
+
+    @processes.default
+    def _default_processes(self):
+        return os.cpu_count() or 1
+
+    @start_method.default
+    def _default_start_method(self):
+        return "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+    @processes.validator
+    def _check_processes(self, attribute, value):
+        if value < 1:
+            raise ValueError("A worker pool needs at least 1 process.")
+
+    def _start_worker(self) -> _Worker:
+        context = multiprocessing.get_context(self.start_method)
+        parent, child = context.Pipe()
+        process = context.Process(
+            target=_worker_main, args=(child, self.max_tasks_per_worker), name="lambda_router.worker", daemon=True
+        )
+        process.start()
+        child.close()
+        self.started += 1
+        return _Worker(process=process, connection=parent)
+
+    def _kill_worker(self, worker: _Worker) -> None:
+        self._workers.remove(worker)
+        worker.connection.close()
+        worker.process.kill()
+        worker.process.join()
+
+    def _stop_worker(self, worker: _Worker, *, timeout: float = 1.0) -> None:
+        try:
+            worker.connection.send(None)
+        except (OSError, ValueError):
+            pass
+        worker.connection.close()
+        worker.process.join(timeout)
+        if worker.process.is_alive():
+            worker.process.terminate()
+            worker.process.join()
+
+    def start(self) -> None:
+        """
+        Starts any missing worker processes.
+        """
+        while len(self._workers) < self.processes:
+            self._workers.append(self._start_worker())
+        if not self._registered_shutdown:
+            shutdown.register(self.close)
+            self._registered_shutdown = True
+
+    def close(self) -> None:
+        """
+        Stops all the worker processes. They're started again on next use.
+        """
+        with self._lock:
+            workers, self._workers = self._workers, []
+            for worker in workers:
+                self._stop_worker(worker)
+
+    def _replace(self, worker: _Worker, *, kill: bool = False) -> _Worker:
+        index = self._workers.index(worker)
+        worker.connection.close()
+        if kill:
+            worker.process.kill()
+        worker.process.join()
+        worker = self._workers[index] = self._start_worker()
+        return worker
+
+    def _send(self, worker: _Worker, task: Any) -> _Worker:
+        """
+        Sends the task to the worker, returning the worker it was sent to. A worker
+        whose pipe is broken, e.g. because it died while idle, is replaced and the task
+        is sent to the new worker instead.
+
+        :raises OSError: Raised if the task can't be sent to the new worker either.
+        """
+        try:
+            worker.connection.send(task)
+            return worker
+        except (OSError, EOFError):
+            worker = self._replace(worker, kill=True)
+        worker.connection.send(task)
+        return worker
+
+    def map(
+        self, fn: Union[Callable, str], kwargs_list: Sequence[Mapping[str, Any]], *, timeout: Optional[float] = None,
+    ) -> List[TaskResult]:
+        """
+        Calls the function as ``fn(**kwargs)`` for each of the given kwargs in the
+        worker processes, returning the results in the same order. A task that fails,
+        or whose worker crashes, only fails its own result.
+
+        :param fn: The function, or its ``"package.module:function"`` import string.
+        :param kwargs_list: The keyword arguments of each task.
+        :param timeout: The time in seconds all the tasks must complete in. The workers
+            still running tasks after it are killed, and those tasks and the ones not
+            started yet fail with a ``WorkerError``. The killed workers are started
+            again on next use.
+        """
+        results: List[Optional[TaskResult]] = [None] * len(kwargs_list)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            self.start()
+            pending = list(range(len(kwargs_list)))
+            pending.reverse()
+            busy: Dict[Connection, Any] = {}
+            while pending or busy:
+                for worker in self._workers:
+                    if not pending:
+                        break
+                    if worker.connection in busy:
+                        continue
+                    index = pending.pop()
+                    try:
+                        worker = self._send(worker, (fn, dict(kwargs_list[index])))
+                    except (pickle.PicklingError, TypeError, AttributeError) as e:
+                        # The task itself couldn't be pickled.
+                        results[index] = TaskResult(error=_portable_error(e), traceback=traceback.format_exc())
+                        continue
+                    except (OSError, EOFError) as e:
+                        error = exceptions.WorkerError(f"Can't send the task to a worker process: {e}")
+                        results[index] = TaskResult(error=error)
+                        continue
+                    busy[worker.connection] = (worker, index)
+                if not busy:
+                    continue
+                remaining = None if deadline is None else max(deadline - time.monotonic(), 0.0)
+                ready = wait(list(busy), timeout=remaining)
+                if not ready and deadline is not None:
+                    self._time_out(busy, pending, results, timeout=timeout)
+                    break
+                for connection in ready:
+                    worker, index = busy.pop(connection)
+                    try:
+                        results[index] = connection.recv()
+                    except (EOFError, OSError):
+                        exitcode = worker.process.exitcode
+                        error = exceptions.WorkerError(f"The worker process exited ({exitcode}) running the task.")
+                        results[index] = TaskResult(error=error)
+                        self._replace(worker)
+                        continue
+                    worker.tasks += 1
+                    if self.max_tasks_per_worker is not None and worker.tasks >= self.max_tasks_per_worker:
+                        # The worker exits by itself after its last task.
+                        self._replace(worker)
+        return results
+
+    def _time_out(
+        self,
+        busy: Dict[Connection, Any],
+        pending: List[int],
+        results: List[Optional[TaskResult]],
+        *,
+        timeout: Optional[float],
+    ) -> None:
+        """
+        Kills the workers of the tasks still running at the deadline, and fails those
+        tasks and the ones not started yet.
+        """
+        for worker, index in busy.values():
+            self._kill_worker(worker)
+            results[index] = TaskResult(error=exceptions.WorkerError(f"The task timed out after {timeout:.3f}s."))
+        for index in pending:
+            results[index] = TaskResult(error=exceptions.WorkerError("The task wasn't started before the timeout."))
+        self.timed_out += len(busy) + len(pending)
+        busy.clear()
+        pending.clear()
@@ -1,6 +1,12 @@
+import asyncio
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest  # noqa: F401
 
-from lambda_router.app import App, Config, exceptions, routers
+from lambda_router.app import SERVERLESS_WARMUP_EVENTS, App, Config, exceptions, routers
 
 
 class TestApp:
@@ -120,3 +126,231 @@ class TestApp:
         event = {"field": "alt"}
         result = app(event, context)
         assert {"result": "failure"} == result
+
+    def test_execution_context(self):
+        app = App(name="test_execution_context")
+
+        @app.route()
+        def main_route(event):
+            assert event is app.current_event
+            app.globals.seen = True
+            return app.execution_context
+
+        context = {"aws_request_id": "1"}
+        assert context is app({}, context)
+        # The context, event and globals are reset after the invocation.
+        assert app.execution_context is None
+        assert app.current_event is None
+        assert "seen" not in app.globals
+
+    def test_execution_context_reset_on_error(self):
+        app = App(name="test_execution_context_reset_on_error")
+
+        @app.route()
+        def main_route(event):
+            raise ValueError("Things went wrong")
+
+        with pytest.raises(ValueError):
+            app({}, {"aws_request_id": "1"})
+        assert app.execution_context is None
+        assert app.current_event is None
+
+    def test_concurrent_threads(self):
+        app = App(name="test_concurrent_threads")
+        barrier = threading.Barrier(8)
+
+        @app.route()
+        def main_route(event):
+            app.globals.request_id = event.raw["id"]
+            # Ensure all invocations are in flight at the same time.
+            barrier.wait(timeout=5)
+            time.sleep(0.01)
+            return (app.execution_context["id"], app.globals.request_id, app.current_event.raw["id"])
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            futures = [executor.submit(app, {"id": i}, {"id": i}) for i in range(8)]
+            results = [future.result() for future in futures]
+        assert [(i, i, i) for i in range(8)] == results
+
+    def test_concurrent_cold_start(self):
+        app = App(name="test_concurrent_cold_start")
+        barrier = threading.Barrier(8)
+
+        @app.route()
+        def main_route(event):
+            return app.is_cold_start
+
+        def invoke():
+            barrier.wait(timeout=5)
+            return app({}, {})
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            futures = [executor.submit(invoke) for _ in range(8)]
+            results = [future.result() for future in futures]
+        assert 1 == results.count(True)
+        assert app.init_duration is not None
+
+    def test_concurrent_tasks(self):
+        app = App(name="test_concurrent_tasks")
+
+        @app.route()
+        def main_route(event):
+            return app.execution_context["id"]
+
+        async def invoke(i):
+            await asyncio.sleep(0)
+            return app({}, {"id": i})
+
+        async def main():
+            return await asyncio.gather(*(invoke(i) for i in range(5)))
+
+        assert list(range(5)) == asyncio.run(main())
+
+
+class TestWarmup:
+    def test_warmup_event_short_circuits(self):
+        middleware_calls = []
+
+        def middleware(dispatch):
+            def inner(event):
+                middleware_calls.append(event)
+                return dispatch(event=event)
+
+            return inner
+
+        config = Config()
+        config["MIDDLEWARE"] = [middleware]
+        config["WARMUP_EVENTS"] = SERVERLESS_WARMUP_EVENTS
+        app = App(name="test_warmup_event_short_circuits", config=config, router=routers.EventField(key="type"))
+        warmed = []
+        after = []
+
+        @app.on_warmup
+        def warm(app):
+            warmed.append(app)
+
+        @app.after_invocation
+        def after_invocation(app):
+            after.append(app.execution_context)
+
+        response = app({"source": "serverless-plugin-warmup"}, {"id": 1})
+        assert response["warmup"]
+        assert [app] == warmed
+        assert [] == middleware_calls
+        assert not app.cold_start
+        # The after-invocation hooks, e.g. the log flush, run for warm-ups too.
+        assert [{"id": 1}] == after
+
+    def test_configured_warmup_events(self):
+        config = Config()
+        config["WARMUP_EVENTS"] = [{"detail": {"warmup": True}}]
+        app = App(name="test_configured_warmup_events", config=config)
+
+        @app.route()
+        def main_route(event):
+            return "routed"
+
+        assert app({"detail": {"warmup": True, "concurrency": 2}}, {})["warmup"]
+        assert "routed" == app({"detail": {"warmup": False}}, {})
+        assert "routed" == app({"source": "serverless-plugin-warmup"}, {})
+
+    def test_warmup_disabled_by_default(self):
+        app = App(name="test_warmup_disabled_by_default")
+
+        @app.route()
+        def main_route(event):
+            return "routed"
+
+        assert "routed" == app({"source": "serverless-plugin-warmup"}, {})
+
+    def test_init_hooks_run_once(self):
+        app = App(name="test_init_hooks_run_once")
+        calls = []
+
+        @app.on_init
+        def connect(app):
+            calls.append("connect")
+            time.sleep(0.01)
+
+        @app.route()
+        def main_route(event):
+            calls.append("route")
+
+        assert app.init_timings is None
+        app({}, {})
+        app({}, {})
+        assert ["connect", "route", "route"] == calls
+        name = f"{__name__}.TestWarmup.test_init_hooks_run_once.<locals>.connect"
+        assert app.init_timings[name] >= 0.01
+
+    def test_init_hooks_run_ahead(self):
+        app = App(name="test_init_hooks_run_ahead")
+        calls = []
+        app.on_init(lambda app: calls.append("init"))
+        timings = app.run_init_hooks()
+        assert 1 == len(timings)
+        app.warmup_events = SERVERLESS_WARMUP_EVENTS
+        response = app({"source": "serverless-plugin-warmup"}, {})
+        assert ["init"] == calls
+        assert timings == response["init_timings"]
+        assert {} == response["warmup_timings"]
+
+
+def lazy_route(event, payload=None):
+    return {"payload": payload}
+
+
+class TestLazyRoutes:
+    def test_add_route(self):
+        app = App(name="test_add_route", router=routers.EventField(key="type"))
+        app.add_route("test_app:lazy_route", key="lazy")
+        app.add_route("test_app:lazy_route", key="validated", schema={"id": {"required": True, "converter": int}})
+        assert {"lazy": None, "validated": None} == app.route_import_timings()
+        assert {"payload": None} == app({"type": "lazy"}, {})
+        assert 1 == app({"type": "validated", "id": "1"}, {})["payload"].id
+        timings = app.route_import_timings()
+        assert timings["lazy"] >= 0
+        assert timings["validated"] >= 0
+
+    def test_preimport_routes(self):
+        app = App(name="test_preimport_routes", router=routers.EventField(key="type"))
+        app.add_route("test_app:lazy_route", key="lazy")
+        app.add_route("test_app:missing_route", key="missing")
+        app.preimport_routes()
+        timings = app.route_import_timings()
+        assert timings["lazy"] >= 0
+        # Failed imports are raised again when the route is dispatched to.
+        assert timings["missing"] is None
+        with pytest.raises(ImportError):
+            app({"type": "missing"}, {})
+
+    def test_preimport_after_first_invocation(self):
+        config = Config()
+        config["PREIMPORT_ROUTES"] = True
+        app = App(name="test_preimport_after_first_invocation", config=config, router=routers.EventField(key="type"))
+
+        @app.route(key="eager")
+        def eager_route(event):
+            return "eager"
+
+        app.add_route("test_app:lazy_route", key="lazy")
+        threads = []
+        app.preimport_routes = lambda background: threads.append(App.preimport_routes(app, background=background))
+        assert "eager" == app({"type": "eager"}, {})
+        assert "eager" == app({"type": "eager"}, {})
+        assert 1 == len(threads)
+        threads[0].join(timeout=5)
+        assert app.route_import_timings()["lazy"] >= 0
+
+    def test_preimport_keeps_other_after_hooks(self):
+        config = Config()
+        config["PREIMPORT_ROUTES"] = True
+        app = App(name="test_preimport_keeps_other_after_hooks", config=config)
+        app.add_route("test_app:lazy_route")
+        calls = []
+        app.after_invocation(lambda app: calls.append("after"))
+        app({}, {})
+        # The pre-import hook removing itself doesn't skip the next hook.
+        assert ["after"] == calls
+        app({}, {})
+        assert ["after", "after"] == calls
@@ -67,6 +67,10 @@ def example_request():
     }
 
 
+def lazy_route(event):
+    return {"message": "lazy"}
+
+
 class TestAppSyncEvent:
     def test_create(self, example_request):
         template = {"context": "details"}
@@ -137,3 +141,66 @@ class TestAppSyncField:
             event = appsync.AppSyncEvent.create(raw=example_request, app={}, template={"context": "details"})
             router.dispatch(event=event)
             assert "No route configured" in str(e.value)
+
+    def test_lazy_route(self, example_request):
+        router = appsync.AppSyncField()
+        router.add_route(fn="test_appsync:lazy_route", field="getAssets")
+        assert not router.routes["getAssets"].loaded
+        event = appsync.AppSyncEvent.create(raw=example_request, app={}, template={"context": "details"})
+        assert {"message": "lazy"} == router.dispatch(event=event)
+        assert router.routes["getAssets"].loaded
+
+
+class TestSelectionSet:
+    @pytest.fixture
+    def selection_set(self):
+        return appsync.SelectionSet.from_list(
+            ["id", "name", "__typename", "posts", "posts/id", "posts/author", "posts/author/name", "email"]
+        )
+
+    def test_fields(self, selection_set):
+        assert ("id", "name", "__typename", "posts", "email") == selection_set.fields
+        assert "posts/author/name" in selection_set
+        assert "posts/title" not in selection_set
+        assert selection_set.has_children("posts")
+        assert not selection_set.has_children("id")
+
+    def test_get_nested(self, selection_set):
+        posts = selection_set.get("posts")
+        assert ("id", "author") == posts.fields
+        assert ("name",) == selection_set.get("posts/author").fields
+        assert selection_set.get("name") is None
+        assert selection_set.get("missing/author") is None
+        # Nested selection sets are cached.
+        assert posts is selection_set.get("posts")
+
+    def test_projection(self, selection_set):
+        assert ["id", "name", "email"] == selection_set.projection()
+        assert ["id", "name", "posts", "email"] == selection_set.projection(include_nested=True)
+        assert ["name", "email"] == selection_set.projection(exclude=["id"])
+
+    def test_dynamodb_projection(self, selection_set):
+        expression, names = selection_set.dynamodb_projection()
+        assert "#f0, #f1, #f2" == expression
+        assert {"#f0": "id", "#f1": "name", "#f2": "email"} == names
+
+    def test_empty_dynamodb_projection(self, selection_set):
+        assert selection_set.dynamodb_projection(exclude=["id", "name", "email"]) is None
+
+
+class TestInfo:
+    def test_from_raw_with_selection_set(self, example_request):
+        raw = copy.deepcopy(example_request["details"]["info"])
+        raw["selectionSetList"] = ["id", "name"]
+        raw["selectionSetGraphQL"] = "{\n  id\n  name\n}"
+        info = appsync.Info.from_raw(raw)
+        assert ("id", "name") == info.selection_set_list
+        assert "{\n  id\n  name\n}" == info.selection_set_graphql
+        assert ["id", "name"] == info.selection_set.projection()
+        # The selection set is parsed once.
+        assert info.selection_set is info.selection_set
+
+    def test_from_raw_without_selection_set(self, example_request):
+        info = appsync.Info.from_raw(example_request["details"]["info"])
+        assert () == info.selection_set.fields
+        assert [] == info.selection_set.projection()
@@ -0,0 +1,172 @@
+import pytest  # noqa: F401
+
+from lambda_router import breakers, exceptions, routers
+from lambda_router.app import App, Config
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def fail():
+    raise ConnectionError("Service unavailable")
+
+
+def _breaker(clock, **options):
+    options.setdefault("failure_threshold", 2)
+    options.setdefault("reset_timeout", 10.0)
+    return breakers.CircuitBreaker(name="payments", clock=clock, **options)
+
+
+class TestCircuitBreaker:
+    def test_opens_after_consecutive_failures(self):
+        breaker = _breaker(FakeClock())
+        with pytest.raises(ConnectionError):
+            breaker.call(fail)
+        assert "ok" == breaker.call(lambda: "ok")
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                breaker.call(fail)
+        assert breakers.OPEN == breaker.state
+        calls = []
+        with pytest.raises(exceptions.CircuitOpenError) as e:
+            breaker.call(calls.append, 1)
+        assert [] == calls
+        assert 10.0 == e.value.retry_after
+        assert isinstance(e.value, exceptions.HandledError)
+
+    def test_half_open_probe_closes(self):
+        clock = FakeClock()
+        breaker = _breaker(clock, success_threshold=2)
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                breaker.call(fail)
+        clock.now = 10.0
+        assert "ok" == breaker.call(lambda: "ok")
+        assert breakers.HALF_OPEN == breaker.state
+        assert "ok" == breaker.call(lambda: "ok")
+        assert breakers.CLOSED == breaker.state
+        assert 0 == breaker.failures
+
+    def test_half_open_probe_reopens(self):
+        clock = FakeClock()
+        breaker = _breaker(clock)
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                breaker.call(fail)
+        clock.now = 10.0
+        with pytest.raises(ConnectionError):
+            breaker.call(fail)
+        assert breakers.OPEN == breaker.state
+        clock.now = 15.0
+        with pytest.raises(exceptions.CircuitOpenError):
+            breaker.call(lambda: "ok")
+        assert 2 == breaker.opened
+
+    def test_half_open_max_calls(self):
+        clock = FakeClock()
+        breaker = _breaker(clock)
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                breaker.call(fail)
+        clock.now = 10.0
+        assert breaker.before_call()
+        with pytest.raises(exceptions.CircuitOpenError):
+            breaker.before_call()
+        breaker.after_call(duration=0.1, probe=True)
+        assert breakers.CLOSED == breaker.state
+
+    def test_slow_calls_are_failures(self):
+        clock = FakeClock()
+        breaker = _breaker(clock, slow_call_duration=1.0)
+
+        def slow():
+            clock.now += 2.0
+            return "slow"
+
+        assert "slow" == breaker.call(slow)
+        assert "slow" == breaker.call(slow)
+        assert breakers.OPEN == breaker.state
+        assert 2 == breaker.slow_calls
+        assert 2.0 == breaker.mean_duration
+
+    def test_ignored_exceptions(self):
+        breaker = _breaker(FakeClock(), failure_threshold=1, failure_exceptions=(ConnectionError,))
+
+        def handled():
+            raise exceptions.HandledError()
+
+        def invalid():
+            raise ValueError()
+
+        for fn, error in ((handled, exceptions.HandledError), (invalid, ValueError)):
+            with pytest.raises(error):
+                breaker.call(fn)
+        assert breakers.CLOSED == breaker.state
+
+    def test_metrics_and_reset(self):
+        breaker = _breaker(FakeClock())
+        for _ in range(3):
+            with pytest.raises((ConnectionError, exceptions.CircuitOpenError)):
+                breaker.call(fail)
+        assert {
+            "state": "open",
+            "failures": 2,
+            "calls": 2,
+            "failed": 2,
+            "slow_calls": 0,
+            "rejected": 1,
+            "opened": 1,
+            "mean_duration": 0.0,
+        } == breaker.metrics()
+        breaker.reset()
+        assert breakers.CLOSED == breaker.state
+
+    def test_invalid_threshold(self):
+        with pytest.raises(ValueError):
+            breakers.CircuitBreaker(name="payments", failure_threshold=0)
+
+
+class TestApp:
+    def test_route_breaker(self):
+        app = App(name="test_route_breaker", router=routers.EventField(key="type"))
+        app.breakers.register("payments", failure_threshold=1, clock=FakeClock())
+
+        @app.route(key="charge", breaker="payments", schema={"amount": {"required": True, "type": int}})
+        def charge(event, payload):
+            raise ConnectionError()
+
+        with pytest.raises(exceptions.ValidationError):
+            app({"type": "charge"}, None)
+        assert breakers.CLOSED == app.breakers["payments"].state
+        with pytest.raises(ConnectionError):
+            app({"type": "charge", "amount": 1}, None)
+        with pytest.raises(exceptions.CircuitOpenError):
+            app({"type": "charge", "amount": 1}, None)
+        assert "open" == app.breakers.metrics()["payments"]["state"]
+
+    def test_middleware(self):
+        reports = []
+        breaker = breakers.CircuitBreaker(name="downstream", failure_threshold=1, clock=FakeClock())
+        config = Config()
+        config["MIDDLEWARE"] = [breaker.middleware]
+        app = App(name="test_middleware", config=config)
+        app.route()(lambda event: fail())
+        app.register_exception_handler(lambda app, event, exception: reports.append(exception))
+        with pytest.raises(ConnectionError):
+            app({}, None)
+        with pytest.raises(exceptions.CircuitOpenError):
+            app({}, None)
+        assert 1 == len(reports)
+
+    def test_duplicate_breaker(self):
+        registry = breakers.BreakerRegistry()
+        registry.register("payments")
+        with pytest.raises(ValueError):
+            registry.register("payments")
+        with pytest.raises(KeyError):
+            registry["missing"]
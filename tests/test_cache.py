@@ -0,0 +1,152 @@
+import multiprocessing
+import os
+
+import pytest  # noqa: F401
+
+from lambda_router import cache
+from lambda_router.app import App, Config
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _set_many(directory, start):
+    disk_cache = cache.DiskCache(directory=directory)
+    for i in range(start, start + 20):
+        disk_cache.set(f"key-{i}", {"value": i})
+
+
+class TestDiskCache:
+    def test_get_set(self, tmp_path):
+        disk_cache = cache.DiskCache(directory=str(tmp_path))
+        assert disk_cache.get("missing") is None
+        assert "default" == disk_cache.get("missing", "default")
+        disk_cache.set("key", {"value": [1, 2, 3]})
+        assert {"value": [1, 2, 3]} == disk_cache.get("key")
+        assert "key" in disk_cache
+        disk_cache.set("none", None)
+        assert disk_cache.get("none", "default") is None
+        disk_cache.delete("key")
+        disk_cache.delete("key")
+        assert "key" not in disk_cache
+        assert {"hits": 2, "misses": 2, "writes": 2} == {
+            name: value for name, value in disk_cache.metrics().items() if name in ("hits", "misses", "writes")
+        }
+
+    def test_shared_by_instances(self, tmp_path):
+        cache.DiskCache(directory=str(tmp_path)).set("key", "value")
+        assert "value" == cache.DiskCache(directory=str(tmp_path)).get("key")
+
+    def test_memory_mapped(self, tmp_path):
+        disk_cache = cache.DiskCache(directory=str(tmp_path), mmap_threshold=1024)
+        value = bytes(range(256)) * 64
+        disk_cache.set("large", value)
+        assert os.path.getsize(disk_cache.path("large")) > 1024
+        assert value == disk_cache.get("large")
+
+    def test_ttl(self, tmp_path):
+        clock = FakeClock()
+        disk_cache = cache.DiskCache(directory=str(tmp_path), mmap_threshold=1, clock=clock)
+        disk_cache.set("key", "value", ttl=10)
+        assert "value" == disk_cache.get("key")
+        clock.now += 10
+        assert disk_cache.get("key") is None
+
+    @pytest.mark.parametrize("mmap_threshold", [1024 * 1024, 1])
+    def test_corrupt_entry(self, tmp_path, mmap_threshold):
+        disk_cache = cache.DiskCache(directory=str(tmp_path), mmap_threshold=mmap_threshold)
+        disk_cache.set("truncated", list(range(100)))
+        path = disk_cache.path("truncated")
+        with open(path, "r+b") as f:
+            f.truncate(os.path.getsize(path) // 2)
+        disk_cache.set("stale", FakeClock())
+        with open(disk_cache.path("stale"), "r+b") as f:
+            data = f.read().replace(b"FakeClock", b"GoneClock")
+            f.seek(0)
+            f.write(data)
+        assert disk_cache.get("truncated") is None
+        assert disk_cache.get("stale", "default") == "default"
+        assert not os.path.exists(path)
+        assert not os.path.exists(disk_cache.path("stale"))
+        assert 2 == disk_cache.misses
+        disk_cache.set("truncated", "value")
+        assert "value" == disk_cache.get("truncated")
+
+    def test_eviction(self, tmp_path):
+        disk_cache = cache.DiskCache(directory=str(tmp_path), max_size=4096)
+        for i in range(10):
+            disk_cache.set(f"key-{i}", bytes(1000))
+            os.utime(disk_cache.path(f"key-{i}"), (i, i))
+        assert disk_cache.evictions == 7
+        assert disk_cache.metrics()["size"] <= 4096
+        assert [f"key-{i}" in disk_cache for i in range(10)] == [False] * 7 + [True] * 3
+        disk_cache.set("too-large", bytes(8192))
+        assert "too-large" not in disk_cache
+
+    def test_clear(self, tmp_path):
+        disk_cache = cache.DiskCache(directory=str(tmp_path))
+        disk_cache.set("key", "value")
+        disk_cache.clear()
+        assert "key" not in disk_cache
+        assert 0 == disk_cache.metrics()["size"]
+
+    def test_memoize(self, tmp_path):
+        disk_cache = cache.DiskCache(directory=str(tmp_path))
+        calls = []
+
+        @disk_cache.memoize
+        def square(n, *, offset=0):
+            calls.append(n)
+            return n * n + offset
+
+        @disk_cache.memoize(key=lambda n: str(n))
+        def cube(n):
+            calls.append(n)
+            return n ** 3
+
+        assert 4 == square(2)
+        assert 4 == square(2)
+        assert 5 == square(2, offset=1)
+        assert 8 == cube(2)
+        assert 8 == cube(2)
+        assert [2, 2, 2] == calls
+        assert "square" == square.__name__
+
+    def test_concurrent_processes(self, tmp_path):
+        context = multiprocessing.get_context("fork")
+        processes = [context.Process(target=_set_many, args=(str(tmp_path), i * 10)) for i in range(4)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+            assert 0 == process.exitcode
+        disk_cache = cache.DiskCache(directory=str(tmp_path))
+        assert all(disk_cache.get(f"key-{i}") == {"value": i} for i in range(50))
+        assert not [name for name in os.listdir(str(tmp_path)) if name.startswith(".tmp-")]
+
+    def test_invalid_max_size(self, tmp_path):
+        with pytest.raises(ValueError):
+            cache.DiskCache(directory=str(tmp_path), max_size=0)
+
+
+class TestApp:
+    def test_cache_from_config(self, tmp_path):
+        config = Config()
+        config.load_from_dict({"CACHE_DIR": str(tmp_path / "cache"), "CACHE_MAX_SIZE": "1048576"})
+        app = App(name="test_cache_from_config", config=config)
+        assert app._cache is None
+        assert app.cache is app.cache
+        assert 1048576 == app.cache.max_size
+        assert os.path.isdir(str(tmp_path / "cache"))
+
+        @app.route()
+        @app.cache.memoize
+        def handler(event):
+            return "ok"
+
+        assert "ok" == app({}, None)
@@ -0,0 +1,164 @@
+import io
+import json
+import os
+import time
+
+import pytest  # noqa: F401
+
+from lambda_router import capture, shutdown
+from lambda_router.app import App, Config
+
+
+class TestRedact:
+    def test_redact_nested(self):
+        raw = {"token": "secret", "detail": {"password": "pw", "items": [{"token": "a", "id": 1}]}}
+        redacted = capture.redact(raw, fields=frozenset(["token", "password"]))
+        assert capture.REDACTED == redacted["token"]
+        assert capture.REDACTED == redacted["detail"]["password"]
+        assert {"token": capture.REDACTED, "id": 1} == redacted["detail"]["items"][0]
+        # Ensure the original is left untouched.
+        assert "secret" == raw["token"]
+
+    def test_redact_copies(self):
+        raw = {"Records": [{"body": "{}"}]}
+        redacted = capture.redact(raw, fields=frozenset())
+        raw["Records"][0].pop("body")
+        assert {"Records": [{"body": "{}"}]} == redacted
+
+
+class TestRingBuffer:
+    def test_append_and_read(self, tmp_path):
+        path = str(tmp_path / "capture")
+        buffer = capture.RingBuffer(path=path, buffer_size=1)
+        buffer.append({"event": {"id": 1}})
+        buffer.append({"event": {"id": 2}})
+        assert [{"event": {"id": 1}}, {"event": {"id": 2}}] == list(capture.read_records(path))
+
+    def test_buffered_until_flush(self, tmp_path):
+        path = str(tmp_path / "capture")
+        buffer = capture.RingBuffer(path=path)
+        buffer.append({"event": {"id": 1}})
+        assert [] == list(capture.read_records(path))
+        buffer.flush()
+        assert [{"event": {"id": 1}}] == list(capture.read_records(path))
+
+    def test_size_bounded(self, tmp_path):
+        path = str(tmp_path / "capture")
+        max_bytes = 2048
+        buffer = capture.RingBuffer(path=path, max_bytes=max_bytes, buffer_size=1)
+        for i in range(500):
+            buffer.append({"event": {"id": i, "padding": str(i) * 20}})
+        assert 2 == len(buffer.segments)
+        total = sum(os.path.getsize(segment) for segment in buffer.segments)
+        assert total <= max_bytes
+        records = list(capture.read_records(path))
+        # Only the newest records are kept, in order.
+        ids = [record["event"]["id"] for record in records]
+        assert 499 == ids[-1]
+        assert sorted(ids) == ids
+        assert 0 not in ids
+
+    def test_segments_ordered_by_sequence(self, tmp_path):
+        path = str(tmp_path / "capture")
+        buffer = capture.RingBuffer(path=path, max_bytes=256, buffer_size=1)
+        for i in range(50):
+            buffer.append({"event": {"id": i}})
+        sequences = [int(segment.rsplit(".", 1)[1]) for segment in buffer.segments]
+        assert sequences[0] > 1
+        assert [sequences[0], sequences[0] + 1] == sequences
+        # The same modification time on every segment doesn't change the order.
+        for segment in buffer.segments:
+            os.utime(segment, ns=(0, 0))
+        ids = [record["event"]["id"] for record in capture.read_records(path)]
+        assert 49 == ids[-1]
+        assert sorted(ids) == ids
+
+    def test_export_jsonl(self, tmp_path):
+        path = str(tmp_path / "capture")
+        buffer = capture.RingBuffer(path=path)
+        buffer.append({"reason": "sampled", "event": {"id": 1}})
+        buffer.append({"reason": "slow", "event": {"id": 2}})
+        buffer.flush()
+        output = io.StringIO()
+        assert 2 == capture.export_jsonl(path, output)
+        lines = output.getvalue().splitlines()
+        assert [{"id": 1}, {"id": 2}] == [json.loads(line) for line in lines]
+
+
+class TestEventCapture:
+    def _create_app(self, tmp_path, **options):
+        options.setdefault("path", str(tmp_path / "capture"))
+        config = Config()
+        config["MIDDLEWARE"] = [capture.capture_events(**options)]
+        app = App(name="test_capture", config=config)
+        return app, app.middleware_chain.buffer
+
+    def test_sampled(self, tmp_path):
+        app, buffer = self._create_app(tmp_path, sample_rate=1.0, redact_fields=["token"])
+
+        @app.route()
+        def main_route(event):
+            event.raw.pop("id")
+            return {"result": "success"}
+
+        assert {"result": "success"} == app({"id": 1, "token": "abc"}, {})
+        buffer.flush()
+        records = list(capture.read_records(buffer.path))
+        assert 1 == len(records)
+        assert "sampled" == records[0]["reason"]
+        # The event is captured before dispatch.
+        assert {"id": 1, "token": capture.REDACTED} == records[0]["event"]
+
+    def test_not_sampled(self, tmp_path):
+        app, buffer = self._create_app(tmp_path, sample_rate=0.0)
+
+        @app.route()
+        def main_route(event):
+            return {"result": "success"}
+
+        app({"id": 1}, {})
+        buffer.flush()
+        assert [] == list(capture.read_records(buffer.path))
+
+    def test_slow(self, tmp_path):
+        app, buffer = self._create_app(tmp_path, sample_rate=0.0, slow_threshold=0.01)
+
+        @app.route()
+        def main_route(event):
+            if event.raw["slow"]:
+                time.sleep(0.02)
+            return {"result": "success"}
+
+        app({"slow": False}, {})
+        app({"slow": True}, {})
+        buffer.flush()
+        records = list(capture.read_records(buffer.path))
+        assert [{"slow": True}] == [record["event"] for record in records]
+        assert "slow" == records[0]["reason"]
+        assert records[0]["duration"] >= 0.01
+
+    def test_flushed_on_shutdown(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(shutdown, "_callbacks", [])
+        app, buffer = self._create_app(tmp_path, sample_rate=1.0)
+
+        @app.route()
+        def main_route(event):
+            return {"result": "success"}
+
+        app({"id": 1}, {})
+        # Buffered across invocations until the buffer fills or the lambda shuts down.
+        assert [] == list(capture.read_records(buffer.path))
+        shutdown.run_callbacks()
+        assert [{"id": 1}] == [record["event"] for record in capture.read_records(buffer.path)]
+
+    def test_captured_on_error(self, tmp_path):
+        app, buffer = self._create_app(tmp_path, sample_rate=1.0)
+
+        @app.route()
+        def main_route(event):
+            raise ValueError("Things went wrong")
+
+        with pytest.raises(ValueError):
+            app({"id": 1}, {})
+        buffer.flush()
+        assert [{"id": 1}] == [record["event"] for record in capture.read_records(buffer.path)]
@@ -0,0 +1,218 @@
+import json
+
+import pytest  # noqa: F401
+
+from lambda_router import claimcheck, codecs, events, routers, tracing
+from lambda_router.interfaces import ObjectStore
+
+
+def _pointer_body(bucket, key):
+    return json.dumps([claimcheck.POINTER_CLASS, {"s3BucketName": bucket, "s3Key": key}])
+
+
+def _raw_message(message_id, body, key="route"):
+    return {
+        "messageId": message_id,
+        "body": body,
+        "messageAttributes": {
+            "key": {"stringValue": key, "dataType": "String"},
+            "ExtendedPayloadSize": {"stringValue": str(len(body)), "dataType": "Number"},
+        },
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = claimcheck.FileSystemStore(root=str(tmp_path / "store"))
+    for i in range(4):
+        store.put(bucket="payloads", key=f"{i}.json", data=json.dumps({"id": i}).encode("utf-8"))
+    return store
+
+
+class CountingStore(ObjectStore):
+    def __init__(self, store):
+        self.store = store
+        self.calls = []
+
+    def get(self, *, bucket, key):
+        self.calls.append((bucket, key))
+        return self.store.get(bucket=bucket, key=key)
+
+
+class TestParsePointer:
+    def test_pointer(self):
+        pointer = claimcheck.parse_pointer(_pointer_body("payloads", "a/b.json"))
+        assert claimcheck.PayloadPointer(bucket="payloads", key="a/b.json") == pointer
+
+    @pytest.mark.parametrize(
+        "body",
+        [
+            None,
+            "",
+            '{"id": 1}',
+            json.dumps(["other.Pointer", {"s3BucketName": "a", "s3Key": "b"}]),
+            json.dumps([claimcheck.POINTER_CLASS, {"s3BucketName": "a"}]),
+            json.dumps([claimcheck.POINTER_CLASS]),
+            f'["{claimcheck.POINTER_CLASS}", ',
+        ],
+    )
+    def test_not_pointer(self, body):
+        assert claimcheck.parse_pointer(body) is None
+
+
+class TestFileSystemStore:
+    def test_outside_root(self, store):
+        with pytest.raises(ValueError):
+            store.get(bucket="payloads", key="../../secret")
+
+
+class TestPayloadCache:
+    @pytest.mark.parametrize("in_directory", [False, True])
+    def test_lru_eviction(self, tmp_path, in_directory):
+        cache = claimcheck.PayloadCache(max_size=10, directory=str(tmp_path / "cache") if in_directory else None)
+        a, b, c = (claimcheck.PayloadPointer(bucket="b", key=key) for key in "abc")
+        cache.set(a, b"1234")
+        cache.set(b, b"5678")
+        assert b"1234" == cache.get(a)
+        cache.set(c, b"90ab")
+        assert cache.get(b) is None
+        assert b"1234" == cache.get(a)
+        assert b"90ab" == cache.get(c)
+        assert 8 == cache.size
+        assert (3, 1) == (cache.hits, cache.misses)
+        cache.set(a, b"too large to cache")
+        assert b"1234" == cache.get(a)
+        cache.clear()
+        assert 0 == len(cache)
+        assert 0 == cache.size
+        if in_directory:
+            assert [] == list((tmp_path / "cache").iterdir())
+
+
+class TestClaimCheck:
+    def test_resolve(self, store):
+        store = CountingStore(store)
+        check = claimcheck.ClaimCheck(store=store, max_workers=4)
+        messages = [
+            routers.SQSMessage(raw_body=_pointer_body("payloads", f"{i % 3}.json"), key="route", event=None)
+            for i in range(4)
+        ]
+        messages.append(routers.SQSMessage(raw_body='{"id": "inline"}', key="route", event=None))
+        check.resolve(messages)
+        assert [{"id": 0}, {"id": 1}, {"id": 2}, {"id": 0}, {"id": "inline"}] == [m.body for m in messages]
+        assert claimcheck.PayloadPointer(bucket="payloads", key="1.json") == messages[1].pointer
+        assert messages[4].pointer is None
+        # The duplicate pointer is only fetched once.
+        assert 3 == len(store.calls) == check.metrics()["fetched"]
+        check.close()
+
+    def test_resolve_cached(self, store):
+        store = CountingStore(store)
+        check = claimcheck.ClaimCheck(store=store, cache=claimcheck.PayloadCache())
+        for _ in range(2):
+            message = routers.SQSMessage(raw_body=_pointer_body("payloads", "0.json"), key="route", event=None)
+            check.resolve([message])
+            assert {"id": 0} == message.body
+        assert 1 == len(store.calls)
+        assert {"cache_hits": 1, "cache_misses": 1} == {
+            name: value for name, value in check.metrics().items() if name in ("cache_hits", "cache_misses")
+        }
+
+    def test_resolve_missing_payload(self, store):
+        check = claimcheck.ClaimCheck(store=store)
+        messages = [
+            routers.SQSMessage(raw_body=_pointer_body("payloads", "missing.json"), key="route", event=None),
+            routers.SQSMessage(raw_body=_pointer_body("payloads", "1.json"), key="route", event=None),
+        ]
+        assert [messages[0]] == check.resolve(messages)
+        assert {"id": 1} == messages[1].body
+        assert 1 == check.metrics()["failed"]
+        check.close()
+
+    def test_fetch_spans_in_trace(self, store):
+        check = claimcheck.ClaimCheck(store=store, max_workers=4)
+        messages = [
+            routers.SQSMessage(raw_body=_pointer_body("payloads", f"{i}.json"), key="route", event=None)
+            for i in range(3)
+        ]
+        exporter = tracing.InMemoryExporter()
+        with tracing.Tracer(exporter=exporter).trace("invocation"):
+            check.resolve(messages)
+        trace = exporter.spans
+        spans = {span.span_id: span for span in trace}
+        fetches = [span for span in trace if span.name == "fetch_payload"]
+        assert 3 == len(fetches)
+        assert len(trace) == len(spans)
+        assert all(spans[span.parent_id].name == "claim_check" for span in fetches)
+        check.close()
+
+
+class TestSQSMessageField:
+    def test_dispatch(self, store):
+        bodies = []
+        router = routers.SQSMessageField(key="key", claim_check=claimcheck.ClaimCheck(store=store))
+        router.add_route(fn=lambda message: bodies.append(message.body), key="route")
+        raw = {
+            "Records": [
+                _raw_message("1", _pointer_body("payloads", "2.json")),
+                _raw_message("2", '{"id": "inline"}'),
+                _raw_message("3", _pointer_body("payloads", "3.json")),
+            ]
+        }
+        router.dispatch(event=events.LambdaEvent(raw=raw, app=None))
+        assert [{"id": 2}, {"id": "inline"}, {"id": 3}] == bodies
+        router.claim_check.close()
+
+    def test_dispatch_missing_payload(self, store):
+        bodies = []
+        router = routers.SQSMessageField(key="key", claim_check=claimcheck.ClaimCheck(store=store))
+        router.add_route(fn=lambda message: bodies.append(message.body), key="route")
+        raw = {
+            "Records": [
+                _raw_message("1", _pointer_body("payloads", "missing.json")),
+                _raw_message("2", _pointer_body("payloads", "1.json")),
+                _raw_message("3", '{"id": "inline"}'),
+            ]
+        }
+        response = router.dispatch(event=events.LambdaEvent(raw=raw, app=None))
+        assert {"batchItemFailures": [{"itemIdentifier": "1"}]} == response
+        assert [{"id": 1}, {"id": "inline"}] == bodies
+        router.claim_check.close()
+
+    def test_dispatch_undecodable_payload(self, store):
+        store.put(bucket="payloads", key="binary", data=b"\xff\xfe")
+        store.put(bucket="payloads", key="text", data=b"not json")
+        bodies = []
+        claim_check = claimcheck.ClaimCheck(store=store, cache=claimcheck.PayloadCache())
+        router = routers.SQSMessageField(key="key", claim_check=claim_check)
+        router.add_route(fn=lambda message: bodies.append(message.body), key="route")
+
+        def raw():
+            return {
+                "Records": [
+                    _raw_message("1", _pointer_body("payloads", "binary")),
+                    _raw_message("2", _pointer_body("payloads", "1.json")),
+                    _raw_message("3", _pointer_body("payloads", "text")),
+                ]
+            }
+
+        response = router.dispatch(event=events.LambdaEvent(raw=raw(), app=None))
+        assert {"batchItemFailures": [{"itemIdentifier": "1"}, {"itemIdentifier": "3"}]} == response
+        assert [{"id": 1}] == bodies
+        # The cached payloads fail the same way.
+        response = router.dispatch(event=events.LambdaEvent(raw=raw(), app=None))
+        assert {"batchItemFailures": [{"itemIdentifier": "1"}, {"itemIdentifier": "3"}]} == response
+        assert [{"id": 1}, {"id": 1}] == bodies
+        assert 4 == claim_check.failed
+        claim_check.close()
+
+    def test_dispatch_compressed_payload(self, store):
+        encoded = codecs.encode_message({"id": "compressed"})
+        store.put(bucket="payloads", key="compressed", data=encoded["MessageBody"].encode("ascii"))
+        raw_message = _raw_message("1", _pointer_body("payloads", "compressed"))
+        raw_message["messageAttributes"]["content-encoding"] = {"stringValue": "gzip", "dataType": "String"}
+        bodies = []
+        router = routers.SQSMessageField(key="key", claim_check=claimcheck.ClaimCheck(store=store))
+        router.add_route(fn=lambda message: bodies.append(message.body), key="route")
+        router.dispatch(event=events.LambdaEvent(raw={"Records": [raw_message]}, app=None))
+        assert [{"id": "compressed"}] == bodies
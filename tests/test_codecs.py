@@ -0,0 +1,122 @@
+import binascii
+import gzip
+import json
+
+import pytest  # noqa: F401
+
+from lambda_router import codecs, events, routers
+
+
+BODY = {"id": 1, "items": [{"sku": "a" * 20, "quantity": i} for i in range(50)]}
+
+
+class TestCodecs:
+    @pytest.mark.parametrize("name", ["gzip", "zlib", "lzma"])
+    def test_round_trip(self, name):
+        codec = codecs.get_codec(name)
+        data = json.dumps(BODY).encode("utf-8")
+        encoded = codec.encode(data)
+        assert isinstance(encoded, str)
+        assert len(encoded) < len(data)
+        assert data == codec.decode(encoded)
+
+    def test_gzip_format(self):
+        encoded = codecs.get_codec("gzip").encode(b"payload")
+        assert b"payload" == gzip.decompress(binascii.a2b_base64(encoded))
+
+    def test_unknown_codec(self):
+        with pytest.raises(ValueError):
+            codecs.get_codec("brotli")
+
+    def test_register_codec(self, monkeypatch):
+        monkeypatch.setattr(codecs, "CODECS", dict(codecs.CODECS))
+        codecs.register_codec(codecs.Codec(name="reversed", compress=lambda b: b[::-1], decompress=lambda b: b[::-1]))
+        assert b"abc" == codecs.get_codec("reversed").decode(codecs.get_codec("reversed").encode(b"abc"))
+
+    def test_encode_message(self):
+        message = codecs.encode_message(BODY, encoding="zlib")
+        assert {"content-encoding": {"DataType": "String", "StringValue": "zlib"}} == message["MessageAttributes"]
+        assert BODY == json.loads(codecs.get_codec("zlib").decode(message["MessageBody"]))
+
+
+def _string(value):
+    return {"DataType": "String", "StringValue": value}
+
+
+def _raw_message(message, key="route"):
+    attributes = {
+        name: {"stringValue": value["StringValue"], "dataType": value["DataType"]}
+        for name, value in message["MessageAttributes"].items()
+    }
+    attributes["key"] = {"stringValue": key, "dataType": "String"}
+    return {"messageId": "1", "body": message["MessageBody"], "messageAttributes": attributes}
+
+
+class TestSQSMessageField:
+    @pytest.mark.parametrize("name", ["gzip", "zlib", "lzma"])
+    def test_dispatch(self, name):
+        bodies = []
+        router = routers.SQSMessageField(key="key")
+        router.add_route(fn=lambda message: bodies.append(message.body), key="route")
+        raw = {"Records": [_raw_message(codecs.encode_message(BODY, encoding=name))]}
+        router.dispatch(event=events.LambdaEvent(raw=raw, app=None))
+        assert [BODY] == bodies
+
+    def test_encoding_disabled(self):
+        router = routers.SQSMessageField(key="key", encoding_key=None)
+        raw_message = _raw_message(codecs.encode_message(BODY))
+        message = router._get_message(raw_message, event=None)
+        assert message.content_encoding is None
+
+    def test_unknown_encoding(self):
+        router = routers.SQSMessageField(key="key")
+        raw_message = _raw_message(codecs.encode_message(BODY))
+        raw_message["messageAttributes"]["content-encoding"]["stringValue"] = "brotli"
+        message = router._get_message(raw_message, event=None)
+        assert "brotli" == message.content_encoding
+        with pytest.raises(ValueError):
+            message.body
+
+    def test_identity_encoding(self):
+        router = routers.SQSMessageField(key="key")
+        raw_message = _raw_message(
+            {"MessageBody": json.dumps(BODY), "MessageAttributes": {"content-encoding": _string("identity")}}
+        )
+        message = router._get_message(raw_message, event=None)
+        assert message.content_encoding is None
+        assert BODY == message.body
+
+    def test_unknown_encoding_in_batch(self):
+        bodies = []
+        router = routers.SQSMessageField(key="key")
+        router.add_route(fn=lambda message: bodies.append(message.body), key="route")
+        unknown = _raw_message(
+            {"MessageBody": json.dumps(BODY), "MessageAttributes": {"content-encoding": _string("utf-8")}}
+        )
+        identity = _raw_message(
+            {"MessageBody": json.dumps(BODY), "MessageAttributes": {"content-encoding": _string("identity")}}
+        )
+        records = [_raw_message(codecs.encode_message(BODY)), unknown, identity]
+        for i, record in enumerate(records):
+            record["messageId"] = str(i)
+        response = router.dispatch(event=events.LambdaEvent(raw={"Records": records}, app=None))
+        # Only the message with the unregistered encoding fails.
+        assert [BODY, BODY] == bodies
+        assert {"batchItemFailures": [{"itemIdentifier": "1"}]} == response
+
+    def test_sns_encoding_attribute(self):
+        message = codecs.encode_message(BODY)
+        envelope = {
+            "Type": "Notification",
+            "TopicArn": "arn:aws:sns:eu-west-1:111122223333:orders",
+            "Message": message["MessageBody"],
+            "MessageAttributes": {
+                "content-encoding": {"Type": "String", "Value": "gzip"},
+                "key": {"Type": "String", "Value": "route"},
+            },
+        }
+        router = routers.SQSMessageField(key="key")
+        message = router._get_message({"messageId": "1", "body": json.dumps(envelope)}, event=None)
+        assert "route" == message.key
+        assert "gzip" == message.content_encoding
+        assert BODY == message.body
@@ -0,0 +1,124 @@
+import json
+
+import pytest  # noqa: F401
+
+from lambda_router import columnar, events, routers
+from lambda_router.app import App
+
+
+RECORDS = [
+    {"id": 1, "price": 2.5, "sku": "a"},
+    {"id": 2, "sku": "b"},
+    {"id": 3, "price": 4.0, "sku": "c", "gift": True},
+]
+
+
+class TestColumnarBatch:
+    def test_from_records(self):
+        numpy = pytest.importorskip("numpy")
+        batch = columnar.ColumnarBatch.from_records(RECORDS)
+        assert 3 == len(batch)
+        assert ["id", "price", "sku", "gift"] == list(batch)
+        assert isinstance(batch["id"], numpy.ndarray)
+        assert [1, 2, 3] == batch["id"].tolist()
+        assert 6 == batch["id"].sum()
+        # Columns with missing or non numeric values stay lists.
+        assert [2.5, None, 4.0] == batch["price"]
+        assert [None, None, True] == batch["gift"]
+        assert ["a", "b", "c"] == batch["sku"]
+        assert "sku" in batch
+        with pytest.raises(KeyError):
+            batch["missing"]
+
+    def test_from_records_with_fields(self):
+        pytest.importorskip("numpy")
+        batch = columnar.ColumnarBatch.from_records(iter(RECORDS), fields=["sku", "gift"])
+        assert {"sku": ["a", "b", "c"], "gift": [None, None, True]} == batch.columns
+        assert 3 == batch.size
+
+    def test_empty(self):
+        pytest.importorskip("numpy")
+        batch = columnar.ColumnarBatch.from_records([])
+        assert 0 == len(batch)
+        assert {} == batch.columns
+
+    def test_rows(self):
+        pytest.importorskip("numpy")
+        batch = columnar.ColumnarBatch.from_records(RECORDS, fields=["id", "sku"])
+        assert [{"id": 1, "sku": "a"}, {"id": 2, "sku": "b"}, {"id": 3, "sku": "c"}] == list(batch.rows())
+
+    def test_numpy_required(self, monkeypatch):
+        monkeypatch.setattr(columnar, "_import_numpy", lambda: None)
+        with pytest.raises(ImportError):
+            columnar.ColumnarBatch.from_records(RECORDS)
+        router = routers.SQSMessageField(key="key")
+        with pytest.raises(ImportError):
+            router.add_route(fn=lambda batch: None, key="orders", columnar=True)
+        assert {} == router.routes
+
+    def test_numpy_ragged_column(self):
+        numpy = pytest.importorskip("numpy")
+        batch = columnar.ColumnarBatch.from_records([{"id": 1}, {"id": [2, 3]}, {"id": [4, 5]}])
+        assert numpy.dtype(object) == batch["id"].dtype
+        assert (3,) == batch["id"].shape
+        assert [2, 3] == batch["id"][1]
+
+
+class TestSQSMessageField:
+    def test_dispatch_columnar(self):
+        pytest.importorskip("numpy")
+        batches = []
+
+        def route(batch):
+            batches.append(batch)
+            return [batch.messages[i] for i, sku in enumerate(batch["sku"]) if sku == "b"]
+
+        router = routers.SQSMessageField(key="key")
+        router.add_route(fn=route, key="orders", columnar=True, fields=["id", "sku"], max_batch_size=2)
+        raw = {
+            "Records": [
+                {
+                    "messageId": str(record["id"]),
+                    "body": json.dumps(record),
+                    "messageAttributes": {"key": {"stringValue": "orders", "dataType": "String"}},
+                }
+                for record in RECORDS
+            ]
+        }
+        response = router.dispatch(event=events.LambdaEvent(raw=raw, app=None))
+        assert {"batchItemFailures": [{"itemIdentifier": "2"}]} == response
+        assert [2, 1] == [len(batch) for batch in batches]
+        assert [3] == list(batches[1]["id"])
+
+    def test_dispatch_non_object_bodies(self):
+        pytest.importorskip("numpy")
+        batches = []
+        router = routers.SQSMessageField(key="key")
+        router.add_route(fn=lambda batch: batches.append(batch), key="orders", columnar=True)
+        raw = {
+            "Records": [
+                {
+                    "messageId": str(i),
+                    "body": body,
+                    "messageAttributes": {"key": {"stringValue": "orders", "dataType": "String"}},
+                }
+                for i, body in enumerate(['{"id": 1}', "[1, 2]", "not json", '{"id": 2}'])
+            ]
+        }
+        response = router.dispatch(event=events.LambdaEvent(raw=raw, app=None))
+        assert {"batchItemFailures": [{"itemIdentifier": "1"}, {"itemIdentifier": "2"}]} == response
+        assert [1, 2] == list(batches[0]["id"])
+        assert ["0", "3"] == [message.meta["messageId"] for message in batches[0].messages]
+
+    def test_columnar_route_with_schema(self):
+        app = App(name="test_columnar_route_with_schema", router=routers.SQSMessageField(key="key"))
+        with pytest.raises(ValueError):
+            app.add_route(lambda batch: None, key="orders", columnar=True, schema={"id": {"type": int}})
+        assert {} == app.router.routes
+
+    def test_invalid_columnar_route(self):
+        router = routers.SQSMessageField(key="key")
+        with pytest.raises(ValueError):
+            router.add_route(fn=lambda batch: None, key="orders", columnar=True, offload=True)
+        with pytest.raises(ValueError):
+            router.add_route(fn=lambda messages: None, key="orders", batch=True, fields=["id"])
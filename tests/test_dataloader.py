@@ -0,0 +1,177 @@
+import asyncio
+
+import pytest  # noqa: F401
+
+from lambda_router import dataloader, events, routers
+
+
+class UserStore:
+    def __init__(self):
+        self.calls = []
+
+    def fetch(self, keys):
+        self.calls.append(list(keys))
+        return [{"id": key} if key != "missing" else None for key in keys]
+
+    async def afetch(self, keys):
+        await asyncio.sleep(0)
+        return self.fetch(keys)
+
+
+class TestDataLoader:
+    def test_coalesces_loads(self):
+        store = UserStore()
+        loader = dataloader.DataLoader(batch_fn=store.fetch)
+        first = loader.load(1)
+        second = loader.load(2)
+        duplicate = loader.load(1)
+        assert first is duplicate
+        assert [] == store.calls
+        assert {"id": 2} == second.result()
+        assert {"id": 1} == first.result()
+        assert [[1, 2]] == store.calls
+
+    def test_caches_results(self):
+        store = UserStore()
+        loader = dataloader.DataLoader(batch_fn=store.fetch)
+        assert [{"id": 1}, {"id": 2}, {"id": 1}] == loader.load_many([1, 2, 1])
+        assert [{"id": 2}, {"id": 3}] == loader.load_many([2, 3])
+        assert [[1, 2], [3]] == store.calls
+
+    def test_without_cache(self):
+        store = UserStore()
+        loader = dataloader.DataLoader(batch_fn=store.fetch, cache=False)
+        loader.load_many([1])
+        loader.load_many([1])
+        assert [[1], [1]] == store.calls
+
+    def test_without_cache_deduplicates_batch(self):
+        store = UserStore()
+        loader = dataloader.DataLoader(batch_fn=store.fetch, cache=False)
+        assert [{"id": 1}, {"id": 2}, {"id": 1}] == loader.load_many([1, 2, 1])
+        assert [[1, 2]] == store.calls
+
+    def test_without_cache_deduplicates_async_batch(self):
+        store = UserStore()
+        loader = dataloader.DataLoader(batch_fn=store.afetch, cache=False)
+        assert [{"id": 1}, {"id": 1}, {"id": 2}] == asyncio.run(loader.aload_many([1, 1, 2]))
+        assert [[1, 2]] == store.calls
+
+    def test_max_batch_size(self):
+        store = UserStore()
+        loader = dataloader.DataLoader(batch_fn=store.fetch, max_batch_size=2)
+        loader.load_many([1, 2, 3, 4, 5])
+        assert [[1, 2], [3, 4], [5]] == store.calls
+        assert 3 == loader.batches
+
+    def test_mapping_results(self):
+        loader = dataloader.DataLoader(batch_fn=lambda keys: {key: key * 2 for key in keys if key != 3})
+        assert [2, 4, None] == loader.load_many([1, 2, 3])
+
+    def test_prime_and_clear(self):
+        store = UserStore()
+        loader = dataloader.DataLoader(batch_fn=store.fetch)
+        loader.prime(1, {"id": 1, "primed": True})
+        assert {"id": 1, "primed": True} == loader.load(1).result()
+        loader.clear(1)
+        assert {"id": 1} == loader.load(1).result()
+        assert [[1]] == store.calls
+
+    def test_errors(self):
+        def fetch(keys):
+            return [ValueError(key) if key == 2 else key for key in keys]
+
+        loader = dataloader.DataLoader(batch_fn=fetch)
+        first, second = loader.load(1), loader.load(2)
+        assert 1 == first.result()
+        with pytest.raises(ValueError):
+            second.result()
+        # Failed keys aren't cached.
+        assert loader.load(2) is not second
+
+    def test_batch_fn_failure(self):
+        def fetch(keys):
+            raise ConnectionError("Database unavailable")
+
+        loader = dataloader.DataLoader(batch_fn=fetch)
+        first, second = loader.load(1), loader.load(2)
+        with pytest.raises(ConnectionError):
+            first.result()
+        with pytest.raises(ConnectionError):
+            second.result()
+
+    def test_wrong_number_of_values(self):
+        loader = dataloader.DataLoader(batch_fn=lambda keys: [1])
+        with pytest.raises(ValueError):
+            loader.load_many([1, 2])
+
+
+class TestDataLoaderAsync:
+    def test_aload_coalesces(self):
+        store = UserStore()
+        loader = dataloader.DataLoader(batch_fn=store.afetch)
+
+        async def main():
+            return await asyncio.gather(loader.aload(1), loader.aload(2), loader.aload(1))
+
+        assert [{"id": 1}, {"id": 2}, {"id": 1}] == asyncio.run(main())
+        assert [[1, 2]] == store.calls
+
+    def test_aload_with_sync_batch_fn(self):
+        store = UserStore()
+        loader = dataloader.DataLoader(batch_fn=store.fetch)
+
+        async def main():
+            first = await loader.aload_many([1, 2])
+            second = await loader.aload(2)
+            return first, second
+
+        assert ([{"id": 1}, {"id": 2}], {"id": 2}) == asyncio.run(main())
+        assert [[1, 2]] == store.calls
+
+    def test_aload_failure(self):
+        async def fetch(keys):
+            raise ConnectionError("Database unavailable")
+
+        loader = dataloader.DataLoader(batch_fn=fetch)
+
+        async def main():
+            return await asyncio.gather(loader.aload(1), loader.aload(2), return_exceptions=True)
+
+        results = asyncio.run(main())
+        assert all(isinstance(result, ConnectionError) for result in results)
+
+    def test_sync_load_with_async_batch_fn(self):
+        loader = dataloader.DataLoader(batch_fn=UserStore().afetch)
+        with pytest.raises(TypeError):
+            loader.load(1).result()
+
+
+class TestGetLoader:
+    def test_scoped_to_session(self):
+        store = UserStore()
+        event = events.LambdaEvent(raw={}, app=None)
+        loader = dataloader.get_loader(event, store.fetch)
+        assert loader is dataloader.get_loader(event, store.fetch)
+        assert loader is not dataloader.get_loader(event, store.fetch, name="other")
+        assert loader is not dataloader.get_loader(events.LambdaEvent(raw={}, app=None), store.fetch)
+
+    def test_shared_across_sqs_messages(self):
+        store = UserStore()
+        router = routers.SQSMessageField(key="key")
+        records = [
+            {"body": '{"user_id": %d}' % user_id, "messageAttributes": {"key": {"stringValue": "updated"}}}
+            for user_id in (1, 2, 1)
+        ]
+        event = events.LambdaEvent(raw={"Records": records}, app=None)
+        users = []
+
+        def updated(messages):
+            loader = dataloader.get_loader(messages[0].event, store.fetch)
+            pending = [loader.load(message.body["user_id"]) for message in messages]
+            users.extend(p.result() for p in pending)
+
+        router.add_route(fn=updated, key="updated", batch=True)
+        router.dispatch(event=event)
+        assert [{"id": 1}, {"id": 2}, {"id": 1}] == users
+        assert [[1, 2]] == store.calls
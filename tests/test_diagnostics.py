@@ -0,0 +1,95 @@
+import logging
+import tracemalloc
+
+import pytest  # noqa: F401
+
+from lambda_router import diagnostics, routers
+from lambda_router.app import App, Config
+
+
+class FakeRSS:
+    def __init__(self, *values):
+        self.values = list(values)
+
+    def __call__(self):
+        return self.values.pop(0)
+
+
+@pytest.fixture
+def monitor_cleanup():
+    monitors = []
+    yield monitors
+    for monitor in monitors:
+        monitor.stop()
+
+
+class TestMemoryMonitorFromConfig:
+    def test_disabled_by_default(self):
+        assert diagnostics.MemoryMonitor.from_config(Config(), logger=logging.getLogger()) is None
+        app = App(name="test_disabled_by_default")
+        assert app.memory_monitor is None
+        assert [] == app.after_invocation_hooks
+
+    def test_from_environment_strings(self):
+        config = Config()
+        config.load_from_dict({"MEMORY_GROWTH_THRESHOLD": "1048576", "MEMORY_TOP": "5"})
+        monitor = diagnostics.MemoryMonitor.from_config(config, logger=logging.getLogger())
+        assert 1048576 == monitor.growth_threshold
+        assert 5 == monitor.top
+        assert 0 == monitor.snapshot_interval
+
+    def test_app(self):
+        config = Config()
+        config["MEMORY_GROWTH_THRESHOLD"] = 1024 * 1024 * 1024
+        app = App(name="test_app", config=config, router=routers.SingleRoute())
+        app.route()(lambda event: "ok")
+        assert "ok" == app({}, None)
+        assert 1 == app.memory_monitor.invocations
+        rss = app.memory_monitor.metrics()["rss"]
+        assert rss is None or rss > 0
+        assert not app.memory_monitor.tracing
+
+
+class TestMemoryMonitor:
+    def test_current_rss(self):
+        rss = diagnostics.current_rss()
+        assert rss is None or rss > 0
+
+    def test_growth_warning(self, caplog):
+        monitor = diagnostics.MemoryMonitor(growth_threshold=100, rss=FakeRSS(1000, 1050, 1101, 1150, 1250))
+        with caplog.at_level(logging.WARNING):
+            for _ in range(5):
+                monitor.after_invocation()
+        assert 2 == monitor.warnings
+        assert 2 == len(caplog.records)
+        assert "Memory grew by 101 bytes" in caplog.records[0].getMessage()
+        assert 1250 == caplog.records[1].memory["rss"]
+        assert {"invocations": 5, "rss": 1250, "baseline_rss": 1250, "peak_rss": 1250, "warnings": 2} == (
+            monitor.metrics()
+        )
+        assert [1000, 1050, 1101, 1150, 1250] == list(monitor.rss_history)
+
+    def test_unknown_rss(self):
+        monitor = diagnostics.MemoryMonitor(growth_threshold=100, rss=lambda: None)
+        monitor.after_invocation()
+        assert monitor.metrics()["rss"] is None
+        assert 0 == monitor.warnings
+
+    def test_snapshots(self, caplog, monitor_cleanup):
+        leak = []
+        monitor = diagnostics.MemoryMonitor(snapshot_interval=2, top=3)
+        monitor_cleanup.append(monitor)
+        monitor.start()
+        assert monitor.tracing
+        with caplog.at_level(logging.INFO):
+            for _ in range(4):
+                leak.extend(bytearray(1024) for _ in range(100))
+                monitor.after_invocation()
+        assert 1 <= len(monitor.growth) <= 3
+        location, size, count = monitor.growth[0]
+        assert __file__ in location
+        assert size >= 200 * 1024
+        assert "Top allocation growth over the last 2 invocations" in caplog.records[-1].getMessage()
+        assert "traced_memory" in monitor.metrics()
+        monitor.stop()
+        assert not tracemalloc.is_tracing()
@@ -0,0 +1,127 @@
+import pytest  # noqa: F401
+
+from lambda_router import eventbridge, events
+
+
+def _event(**detail):
+    return {
+        "version": "0",
+        "id": "6a7e8feb-b491-4cf7-a9f1-bf3703467718",
+        "detail-type": "Order Placed",
+        "source": "com.example.orders",
+        "account": "111122223333",
+        "region": "eu-west-1",
+        "resources": [],
+        "detail": detail,
+    }
+
+
+class TestEventPattern:
+    @pytest.mark.parametrize(
+        "pattern,matches",
+        [
+            ({"source": ["com.example.orders"]}, True),
+            ({"source": ["com.example.users", "com.example.orders"]}, True),
+            ({"source": ["com.example.users"]}, False),
+            ({"source": [{"prefix": "com.example."}]}, True),
+            ({"source": [{"suffix": ".users"}]}, False),
+            ({"detail-type": [{"equals-ignore-case": "order placed"}]}, True),
+            ({"detail": {"status": ["placed"]}}, True),
+            ({"detail": {"status": [{"anything-but": "placed"}]}}, False),
+            ({"detail": {"status": [{"anything-but": ["cancelled", "refunded"]}]}}, True),
+            ({"detail": {"status": [{"anything-but": {"prefix": "pla"}}]}}, False),
+            ({"detail": {"total": [{"numeric": [">", 10, "<=", 20]}]}}, True),
+            ({"detail": {"total": [{"numeric": [">", 20]}]}}, False),
+            ({"detail": {"total": [{"numeric": ["=", 15]}]}}, True),
+            ({"detail": {"items": ["book"]}}, True),
+            ({"detail": {"items": ["pen"]}}, False),
+            ({"detail": {"gift": [{"exists": True}]}}, False),
+            ({"detail": {"gift": [{"exists": False}]}}, True),
+            ({"detail": {"customer": {"tier": ["gold"]}}}, True),
+            ({"detail": {"customer": {"tier": ["gold"], "id": [{"exists": True}]}}}, False),
+            ({"detail": {"express": [True]}}, True),
+            ({"detail": {"express": [1]}}, False),
+            ({"detail": {"coupon": [None]}}, True),
+            ({"source": ["com.example.orders"], "detail": {"status": ["shipped"]}}, False),
+        ],
+    )
+    def test_matches(self, pattern, matches):
+        event = _event(
+            status="placed", total=15, items=["book", "lamp"], customer={"tier": "gold"}, express=True, coupon=None,
+        )
+        assert matches == eventbridge.EventPattern.compile(pattern).matches(event)
+
+    @pytest.mark.parametrize(
+        "pattern",
+        [
+            {},
+            {"source": "com.example.orders"},
+            {"source": []},
+            {"source": [{"wildcard": "*"}]},
+            {"detail": {"total": [{"numeric": [">"]}]}},
+            {"detail": {"total": [{"numeric": ["!=", 1]}]}},
+        ],
+    )
+    def test_invalid_pattern(self, pattern):
+        with pytest.raises(ValueError):
+            eventbridge.EventPattern.compile(pattern)
+
+
+def order_placed(event):
+    return "order_placed"
+
+
+class TestEventBridgeRouter:
+    def _router(self):
+        router = eventbridge.EventBridgeRouter()
+        router.add_route(
+            fn=lambda event: "large_order",
+            pattern={"detail-type": ["Order Placed"], "detail": {"total": [{"numeric": [">=", 100]}]}},
+            name="large_order",
+        )
+        router.add_route(fn=order_placed, pattern={"detail-type": ["Order Placed"]})
+        router.add_route(fn=lambda event: "example", pattern={"source": [{"prefix": "com.example."}]}, name="example")
+        router.add_route(
+            fn="test_eventbridge:order_placed",
+            pattern={"source": ["com.example.orders", "com.example.shop"], "detail": {"region": ["eu"]}},
+            name="regional",
+        )
+        return router
+
+    def test_first_added_match_wins(self):
+        router = self._router()
+        assert "large_order" == router.match(_event(total=150))
+        assert "test_eventbridge:order_placed" == router.match(_event(total=50))
+        event = _event(total=50)
+        event["detail-type"] = "Order Shipped"
+        assert "example" == router.match(event)
+        event["source"] = "org.example"
+        assert router.match(event) is None
+
+    def test_unindexed_before_indexed(self):
+        router = eventbridge.EventBridgeRouter()
+        router.add_route(fn=lambda event: 1, pattern={"detail": {"total": [{"numeric": [">", 0]}]}}, name="first")
+        router.add_route(fn=lambda event: 2, pattern={"detail-type": ["Order Placed"]}, name="second")
+        assert "first" == router.match(_event(total=1))
+        assert "second" == router.match(_event(total=0))
+
+    def test_index_on_most_selective_field(self):
+        router = self._router()
+        router.match({})
+        assert {("detail-type",), ("detail", "region")} == set(router._index)
+        assert 1 == len(router._unindexed)
+
+    def test_dispatch(self):
+        router = self._router()
+        assert "order_placed" == router.dispatch(event=events.LambdaEvent(raw=_event(total=1), app=None))
+        assert "test_eventbridge:order_placed" == router.get_route_key(
+            event=events.LambdaEvent(raw=_event(total=1), app=None)
+        )
+        with pytest.raises(ValueError):
+            router.dispatch(event=events.LambdaEvent(raw={"source": "aws.s3"}, app=None))
+
+    def test_duplicate_name(self):
+        router = eventbridge.EventBridgeRouter()
+        router.add_route(fn=order_placed, pattern={"source": ["a"]})
+        with pytest.raises(ValueError):
+            router.add_route(fn=order_placed, pattern={"source": ["b"]})
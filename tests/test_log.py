@@ -0,0 +1,171 @@
+import io
+import json
+import logging
+import sys
+
+import pytest  # noqa: F401
+
+from lambda_router import log, routers
+from lambda_router.app import App
+
+
+class CountingStream(io.StringIO):
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def write(self, s):
+        self.writes += 1
+        return super().write(s)
+
+
+def _lines(stream):
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+@pytest.fixture
+def app():
+    return App(name="test_log", router=routers.EventField(key="field"))
+
+
+class TestBufferedStreamHandler:
+    def test_buffered_until_flush(self):
+        stream = CountingStream()
+        handler = log.BufferedStreamHandler(stream)
+        logger = logging.getLogger("test_buffered_until_flush")
+        logger.addHandler(handler)
+        logger.propagate = False
+        logger.warning("one %s", 1)
+        logger.warning("two %s", 2)
+        assert 0 == stream.writes
+        handler.flush()
+        assert 1 == stream.writes
+        assert ["one 1", "two 2"] == stream.getvalue().splitlines()
+
+    def test_flush_level(self):
+        stream = CountingStream()
+        handler = log.BufferedStreamHandler(stream, flush_level=logging.ERROR)
+        logger = logging.getLogger("test_flush_level")
+        logger.addHandler(handler)
+        logger.propagate = False
+        logger.warning("before")
+        logger.error("failure")
+        assert ["before", "failure"] == stream.getvalue().splitlines()
+        assert 1 == stream.writes
+
+    def test_capacity(self):
+        stream = CountingStream()
+        handler = log.BufferedStreamHandler(stream, capacity=2)
+        logger = logging.getLogger("test_capacity")
+        logger.addHandler(handler)
+        logger.propagate = False
+        for i in range(5):
+            logger.warning("%d", i)
+        assert 2 == stream.writes
+        assert 1 == len(handler.buffer)
+
+    def test_deferred_formatting(self):
+        calls = []
+
+        class Lazy:
+            def __str__(self):
+                calls.append(1)
+                return "lazy"
+
+        stream = io.StringIO()
+        handler = log.BufferedStreamHandler(stream)
+        logger = logging.getLogger("test_deferred_formatting")
+        logger.addHandler(handler)
+        logger.propagate = False
+        logger.warning("%s", Lazy())
+        assert [] == calls
+        handler.flush()
+        assert [1] == calls
+        assert "lazy\n" == stream.getvalue()
+
+
+class TestJSONFormatter:
+    def test_format(self):
+        formatter = log.JSONFormatter()
+        record = logging.LogRecord("test", logging.INFO, __file__, 1, "hello %s", ("world",), None)
+        record.order_id = 42
+        document = json.loads(formatter.format(record))
+        assert "hello world" == document["message"]
+        assert "INFO" == document["level"]
+        assert "test" == document["logger"]
+        assert 42 == document["order_id"]
+        assert "args" not in document
+
+    def test_format_exception(self):
+        formatter = log.JSONFormatter()
+        try:
+            raise ValueError("Things went wrong")
+        except ValueError:
+            record = logging.makeLogRecord({"msg": "failed", "exc_info": sys.exc_info()})
+        document = json.loads(formatter.format(record))
+        assert "ValueError: Things went wrong" in document["exception"]
+
+
+class TestConfigureLogging:
+    def test_invocation_context(self, app):
+        stream = CountingStream()
+        log.configure_logging(app, stream=stream)
+
+        @app.route(key="main")
+        def main_route(event):
+            writes = stream.writes
+            app.logger.info("first")
+            app.logger.info("second", extra={"order_id": 1})
+            assert writes == stream.writes
+            return {}
+
+        app({"field": "main"}, {"aws_request_id": "request-1"})
+        assert 1 == stream.writes
+        app({"field": "main"}, {"aws_request_id": "request-2"})
+        first, second, third, fourth = _lines(stream)
+        assert "first" == first["message"]
+        assert "test_log" == first["app"]
+        assert "request-1" == first["request_id"]
+        assert "main" == first["route_key"]
+        assert first["cold_start"]
+        assert 1 == second["order_id"]
+        assert "request-2" == third["request_id"]
+        assert not third["cold_start"]
+
+    def test_route_key_looked_up_once(self, app, monkeypatch):
+        log.configure_logging(app, stream=io.StringIO())
+        lookups = []
+        get_route_key = app.router.get_route_key
+
+        def counting_get_route_key(*, event):
+            lookups.append(event)
+            return get_route_key(event=event)
+
+        monkeypatch.setattr(app.router, "get_route_key", counting_get_route_key)
+
+        @app.route(key="main")
+        def main_route(event):
+            for i in range(event.raw["lines"]):
+                app.logger.info("line %d", i)
+            return {}
+
+        app({"field": "main", "lines": 0}, {})
+        without_logging = len(lookups)
+        app({"field": "main", "lines": 5}, {})
+        assert without_logging + 1 == len(lookups) - without_logging
+        assert app.current_route_key is None
+
+    def test_flushed_on_error(self, app):
+        stream = CountingStream()
+        log.configure_logging(app, stream=stream)
+
+        @app.route(key="main")
+        def main_route(event):
+            app.logger.info("before")
+            app.logger.error("failure")
+            assert 1 == stream.writes
+            raise ValueError("Things went wrong")
+
+        with pytest.raises(ValueError):
+            app({"field": "main"}, {})
+        assert ["before", "failure"] == [line["message"] for line in _lines(stream)]
@@ -0,0 +1,122 @@
+import logging
+import time
+
+import pytest  # noqa: F401
+
+from lambda_router import profiling, routers
+from lambda_router.app import App, Config
+
+
+def _busy(duration):
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        pass
+
+
+class TestProfilerFromConfig:
+    def test_disabled_by_default(self):
+        assert profiling.Profiler.from_config(Config(), logger=logging.getLogger()) is None
+        app = App(name="test_disabled_by_default")
+        assert app.profiler is None
+
+    def test_from_environment_strings(self):
+        config = Config()
+        config.load_from_dict(
+            {
+                "PROFILE_SAMPLE_RATE": "0.5",
+                "PROFILE_ROUTE_KEYS": "one, two",
+                "PROFILE_MODE": "sampling",
+                "PROFILE_DUMP_INTERVAL": "10",
+            }
+        )
+        profiler = profiling.Profiler.from_config(config, logger=logging.getLogger())
+        assert 0.5 == profiler.sample_rate
+        assert frozenset(["one", "two"]) == profiler.route_keys
+        assert profiling.SAMPLING == profiler.mode
+        assert 10.0 == profiler.dump_interval
+
+    def test_invalid_mode(self):
+        with pytest.raises(ValueError):
+            profiling.Profiler(mode="other", sample_rate=1.0)
+
+
+class TestProfiler:
+    def test_should_profile_route_key(self):
+        profiler = profiling.Profiler(route_keys=["slow"])
+        assert profiler.should_profile(route_key="slow")
+        assert not profiler.should_profile(route_key="fast")
+        assert not profiler.should_profile(route_key=None)
+
+    def test_deterministic_aggregates(self, tmp_path):
+        output = str(tmp_path / "profile")
+        profiler = profiling.Profiler(sample_rate=1.0, output=output, dump_interval=3600)
+
+        def dispatch(event):
+            return sum(range(100))
+
+        for _ in range(3):
+            assert 4950 == profiler.run(dispatch, event={}, route_key=None)
+        assert 3 == profiler.profiled
+        assert not (tmp_path / "profile.pstats").exists()
+        profiler.dump()
+        assert (tmp_path / "profile.pstats").exists()
+        calls = [stat[1] for func, stat in profiler.stats.stats.items() if func[2] == "dispatch"]
+        assert [3] == calls
+
+    def test_sampling_collapsed_stacks(self, tmp_path):
+        output = str(tmp_path / "profile")
+        profiler = profiling.Profiler(
+            mode=profiling.SAMPLING, sample_rate=1.0, output=output, dump_interval=0, sampling_interval=0.001
+        )
+
+        def dispatch(event):
+            _busy(0.05)
+            return "ok"
+
+        assert "ok" == profiler.run(dispatch, event={}, route_key=None)
+        lines = (tmp_path / "profile.collapsed").read_text().splitlines()
+        assert lines
+        assert any("_busy" in line for line in lines)
+        stack, count = lines[0].rsplit(" ", 1)
+        assert int(count) > 0
+
+    def test_dump_to_log(self, caplog):
+        profiler = profiling.Profiler(sample_rate=1.0, output=profiling.LOG_OUTPUT, dump_interval=0)
+        with caplog.at_level(logging.INFO):
+            profiler.run(lambda event: None, event={}, route_key=None)
+        assert "Profile of 1 invocations" in caplog.text
+
+
+class TestAppProfiling:
+    def test_profiles_configured_route(self, tmp_path):
+        config = Config()
+        config["PROFILE_ROUTE_KEYS"] = ["slow"]
+        config["PROFILE_OUTPUT"] = str(tmp_path / "profile")
+        app = App(name="test_profiles_configured_route", config=config, router=routers.EventField(key="field"))
+
+        @app.route(key="slow")
+        def slow_route(event):
+            return {"result": "slow"}
+
+        @app.route(key="fast")
+        def fast_route(event):
+            return {"result": "fast"}
+
+        assert {"result": "fast"} == app({"field": "fast"}, {})
+        assert 0 == app.profiler.profiled
+        assert {"result": "slow"} == app({"field": "slow"}, {})
+        assert 1 == app.profiler.profiled
+
+    def test_profiled_exceptions_propagate(self):
+        config = Config()
+        config["PROFILE_SAMPLE_RATE"] = 1.0
+        config["PROFILE_DUMP_INTERVAL"] = 3600
+        app = App(name="test_profiled_exceptions_propagate", config=config)
+
+        @app.route()
+        def main_route(event):
+            raise ValueError("Things went wrong")
+
+        with pytest.raises(ValueError):
+            app({}, {})
+        assert 1 == app.profiler.profiled
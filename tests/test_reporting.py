@@ -0,0 +1,164 @@
+import threading
+import time
+
+import pytest  # noqa: F401
+
+from lambda_router import exceptions, reporting
+from lambda_router.app import App
+
+
+def _report(i=0):
+    return reporting.Report(app=None, event=None, exception=ValueError(i))
+
+
+class TestBackgroundReporter:
+    def test_submit_and_flush(self):
+        sink = reporting.MemorySink()
+        reporter = reporting.BackgroundReporter(sink=sink)
+        assert reporter.submit(_report())
+        assert reporter.flush(timeout=5)
+        assert 1 == len(sink.reports)
+        assert {"submitted": 1, "sent": 1, "dropped": 0, "failed": 0, "pending": 0} == reporter.metrics()
+
+    def test_batches(self):
+        release = threading.Event()
+        batches = []
+
+        def sink(reports):
+            release.wait(timeout=5)
+            batches.append(reports)
+
+        reporter = reporting.BackgroundReporter(sink=sink, batch_size=3)
+        for i in range(7):
+            reporter.submit(_report(i))
+        release.set()
+        assert reporter.flush(timeout=5)
+        assert 7 == sum(len(batch) for batch in batches)
+        assert all(len(batch) <= 3 for batch in batches)
+        # Reports are delivered in order.
+        assert list(range(7)) == [report.exception.args[0] for batch in batches for report in batch]
+
+    def test_dropped_when_full(self):
+        release = threading.Event()
+        reporter = reporting.BackgroundReporter(sink=lambda reports: release.wait(timeout=5), max_queue_size=2)
+        reporter.submit(_report())
+        # Wait for the worker to pick up the first report.
+        while reporter.metrics()["pending"] and reporter._queue:
+            time.sleep(0.001)
+        assert reporter.submit(_report())
+        assert reporter.submit(_report())
+        assert not reporter.submit(_report())
+        release.set()
+        assert reporter.flush(timeout=5)
+        metrics = reporter.metrics()
+        assert 1 == metrics["dropped"]
+        assert 3 == metrics["sent"]
+
+    def test_failed_sink(self):
+        def sink(reports):
+            raise ConnectionError("Reporting service unavailable")
+
+        reporter = reporting.BackgroundReporter(sink=sink)
+        reporter.submit(_report())
+        assert reporter.flush(timeout=5)
+        assert 1 == reporter.metrics()["failed"]
+        # The worker survives a failing sink.
+        reporter.submit(_report())
+        assert reporter.flush(timeout=5)
+        assert 2 == reporter.metrics()["failed"]
+
+    def test_flush_timeout(self):
+        reporter = reporting.BackgroundReporter(sink=reporting.MemorySink(delay=0.5), flush_timeout=0.01)
+        reporter.submit(_report())
+        start = time.perf_counter()
+        assert not reporter.flush()
+        assert time.perf_counter() - start < 0.4
+        assert reporter.flush(timeout=5)
+
+
+class TestAppReporting:
+    def test_background_handler(self):
+        app = App(name="test_background_handler")
+        handled = []
+
+        @app.register_exception_handler(background=True, flush_timeout=5)
+        def handle_exceptions(app, event, e):
+            handled.append((app, event.raw, e))
+
+        assert callable(handle_exceptions)
+        assert not app.exception_handlers
+        assert 1 == len(app.exception_reporters)
+
+        @app.route()
+        def main_route(event):
+            raise ValueError("Things went wrong")
+
+        with pytest.raises(ValueError):
+            app({"id": 1}, {})
+        assert 1 == len(handled)
+        assert app is handled[0][0]
+        assert {"id": 1} == handled[0][1]
+        assert isinstance(handled[0][2], ValueError)
+
+    def test_slow_reporter_bounded(self):
+        app = App(name="test_slow_reporter_bounded")
+        sink = reporting.MemorySink(delay=0.5)
+        app.add_exception_reporter(reporting.BackgroundReporter(sink=sink, flush_timeout=0.01))
+
+        @app.route()
+        def main_route(event):
+            raise ValueError("Things went wrong")
+
+        start = time.perf_counter()
+        with pytest.raises(ValueError):
+            app({}, {})
+        assert time.perf_counter() - start < 0.4
+        assert app.exception_reporters[0].flush(timeout=5)
+        assert 1 == len(sink.reports)
+
+    def test_handler_sees_invocation_context(self):
+        app = App(name="test_handler_sees_invocation_context")
+        contexts = []
+
+        @app.register_exception_handler(background=True, flush_timeout=5)
+        def handle_exceptions(app, event, e):
+            contexts.append((app.execution_context, app.current_event.raw))
+
+        @app.route()
+        def main_route(event):
+            raise ValueError("Things went wrong")
+
+        with pytest.raises(ValueError):
+            app({"id": 1}, {"request_id": "abc"})
+        assert [({"request_id": "abc"}, {"id": 1})] == contexts
+
+    def test_reporters_share_deadline(self):
+        app = App(name="test_reporters_share_deadline")
+        sinks = [reporting.MemorySink(delay=0.5) for _ in range(3)]
+        for sink in sinks:
+            app.add_exception_reporter(reporting.BackgroundReporter(sink=sink, flush_timeout=0.1))
+
+        @app.route()
+        def main_route(event):
+            raise ValueError("Things went wrong")
+
+        start = time.perf_counter()
+        with pytest.raises(ValueError):
+            app({}, {})
+        assert time.perf_counter() - start < 0.25
+        for reporter in app.exception_reporters:
+            assert reporter.flush(timeout=5)
+
+    def test_handled_error_not_reported(self):
+        app = App(name="test_handled_error_not_reported")
+        sink = reporting.MemorySink()
+        app.add_exception_reporter(reporting.BackgroundReporter(sink=sink))
+
+        @app.route()
+        def main_route(event):
+            raise exceptions.HandledError("Things went wrong")
+
+        with pytest.raises(exceptions.HandledError):
+            app({}, {})
+        assert [] == sink.reports
+        assert 0 == app.exception_reporters[0].metrics()["submitted"]
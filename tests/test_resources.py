@@ -0,0 +1,173 @@
+import threading
+
+import pytest  # noqa: F401
+
+from lambda_router import exceptions, resources, routers, shutdown, snapstart
+from lambda_router.app import App
+
+
+class Connection:
+    instances = 0
+
+    def __init__(self):
+        Connection.instances += 1
+        self.id = Connection.instances
+        self.closed = False
+        self.healthy = True
+
+    def close(self):
+        self.closed = True
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestResourcePool:
+    def test_created_lazily_and_reused(self):
+        pool = resources.ResourcePool(name="db", factory=Connection)
+        assert 0 == pool.created
+        with pool.lease() as first:
+            assert not first.closed
+        with pool.lease() as second:
+            assert first is second
+        metrics = pool.metrics()
+        assert 1 == metrics["created"]
+        assert 2 == metrics["acquired"]
+        assert 1 == metrics["idle"]
+        assert 0 == metrics["in_use"]
+
+    def test_size(self):
+        pool = resources.ResourcePool(name="db", factory=Connection, size=2)
+        first, second = pool.acquire(), pool.acquire()
+        assert first is not second
+        with pytest.raises(exceptions.PoolExhaustedError):
+            pool.acquire(timeout=0.01)
+        metrics = pool.metrics()
+        assert 1 == metrics["exhausted"]
+        assert 1 == metrics["timeouts"]
+        assert metrics["max_wait_time"] >= 0.01
+        pool.release(first)
+        assert first is pool.acquire(timeout=0.01)
+
+    def test_waits_for_release(self):
+        pool = resources.ResourcePool(name="db", factory=Connection)
+        resource = pool.acquire()
+        timer = threading.Timer(0.05, pool.release, args=(resource,))
+        timer.start()
+        assert resource is pool.acquire(timeout=5)
+        timer.join()
+        assert pool.metrics()["wait_time"] > 0
+
+    def test_discarded_on_error(self):
+        pool = resources.ResourcePool(name="db", factory=Connection)
+        with pytest.raises(ValueError):
+            with pool.lease() as first:
+                raise ValueError("Connection reset")
+        assert first.closed
+        with pool.lease() as second:
+            assert first is not second
+        assert 1 == pool.metrics()["closed"]
+
+    def test_recycled_after_idle_time(self):
+        clock = Clock()
+        pool = resources.ResourcePool(name="db", factory=Connection, max_idle_time=60, clock=clock)
+        with pool.lease() as first:
+            pass
+        clock.now = 30
+        with pool.lease() as second:
+            assert first is second
+        clock.now = 91
+        with pool.lease() as third:
+            assert first is not third
+        assert first.closed
+
+    def test_validated_before_reuse(self):
+        pool = resources.ResourcePool(name="db", factory=Connection, validate=lambda c: c.healthy)
+        with pool.lease() as first:
+            pass
+        first.healthy = False
+        with pool.lease() as second:
+            assert first is not second
+        assert first.closed
+
+    def test_failed_factory_frees_slot(self):
+        attempts = []
+
+        def factory():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise ConnectionError("Database unavailable")
+            return Connection()
+
+        pool = resources.ResourcePool(name="db", factory=factory)
+        with pytest.raises(ConnectionError):
+            pool.acquire(timeout=0.01)
+        assert pool.acquire(timeout=0.01) is not None
+
+    def test_clear(self):
+        pool = resources.ResourcePool(name="db", factory=Connection, size=2)
+        idle, in_use = pool.acquire(), pool.acquire()
+        pool.release(idle)
+        pool.clear()
+        assert idle.closed
+        assert not in_use.closed
+        assert 0 == pool.idle
+
+    def test_invalid_size(self):
+        with pytest.raises(ValueError):
+            resources.ResourcePool(name="db", factory=Connection, size=0)
+
+
+class TestAppResources:
+    def test_resource(self):
+        app = App(name="test_resource", router=routers.SQSMessageField(key="key"))
+
+        @app.resource("db", size=2)
+        def connect():
+            return Connection()
+
+        ids = []
+
+        @app.route(key="store")
+        def store(message):
+            with app.resources.lease("db") as connection:
+                ids.append(connection.id)
+
+        def record():
+            return {"body": "{}", "messageAttributes": {"key": {"stringValue": "store"}}}
+
+        app({"Records": [record(), record()]}, {})
+        app({"Records": [record()]}, {})
+        assert 1 == len(set(ids))
+        assert 1 == app.resources.metrics()["db"]["created"]
+        with pytest.raises(ValueError):
+            app.resource("db")(connect)
+        with pytest.raises(KeyError):
+            app.resources["cache"]
+
+    def test_closed_around_snapshot(self):
+        app = App(name="test_closed_around_snapshot")
+        app.resource("db")(Connection)
+        with app.resources.lease("db") as first:
+            pass
+        snapstart.simulate_snapshot_restore(app)
+        assert first.closed
+        with app.resources.lease("db") as second:
+            assert first is not second
+
+    def test_closed_on_shutdown(self, monkeypatch):
+        monkeypatch.setattr(shutdown, "_callbacks", [])
+        app = App(name="test_closed_on_shutdown")
+        app.resource("db")(Connection)
+        app.resource("cache")(Connection)
+        with app.resources.lease("db") as connection:
+            pass
+        # Registered once for all the pools.
+        assert [app.resources.close] == shutdown._callbacks
+        shutdown.run_callbacks()
+        assert connection.closed
@@ -1,4 +1,7 @@
 import copy
+import json
+import pickle
+import sys
 
 from unittest import mock
 
@@ -75,6 +78,11 @@ class TestEventField:
         assert route is not None
         assert callable(route)
 
+    def test_get_route_key(self):
+        router = routers.EventField(key="field")
+        assert "test" == router.get_route_key(event=events.LambdaEvent(raw={"field": "test"}, app=None))
+        assert router.get_route_key(event=events.LambdaEvent(raw={}, app=None)) is None
+
     def test_get_route_with_invalid_key(self):
         router = routers.EventField(key="field")
         router.add_route(fn=lambda event: "ok", key="test")
@@ -152,6 +160,17 @@ def sqs_event():
     )
 
 
+def _sns_message(message, **attributes):
+    envelope = {
+        "Type": "Notification",
+        "MessageId": "95df01b4-ee98-5cb9-9903-4c221d41eb5e",
+        "TopicArn": "arn:aws:sns:eu-west-1:111122223333:people",
+        "Message": message,
+        "MessageAttributes": {name: {"Type": "String", "Value": value} for name, value in attributes.items()},
+    }
+    return {"messageId": "1", "body": json.dumps(envelope), "attributes": {}}
+
+
 class TestSQSMessage:
     def test_from_raw_sqs_message(self, sqs_event):
         raw_message = sqs_event.raw["Records"][0]
@@ -159,6 +178,44 @@ class TestSQSMessage:
         assert "global.person_updated" == message.key
         assert "a11e7a78-fb68-4c06-ae19-d391158f31ed" == message.meta["messageId"]
 
+    def test_body_decoded_lazily(self):
+        raw_message = {"messageId": "1", "body": "not json"}
+        message = routers.SQSMessage.from_raw_sqs_message(raw_message=raw_message, key_name="key", event=None)
+        assert "not json" == message.raw_body
+        with pytest.raises(ValueError):
+            message.body
+        message.body = {"id": 1}
+        assert {"id": 1} == message.body
+
+    def test_unwrap_sns(self):
+        raw_message = _sns_message(json.dumps({"id": 1}), key="person_updated")
+        message = routers.SQSMessage.from_raw_sqs_message(raw_message=raw_message, key_name="key", event=None)
+        assert "person_updated" == message.key
+        assert '{"id": 1}' == message.raw_body
+        assert {"id": 1} == message.body
+        assert "arn:aws:sns:eu-west-1:111122223333:people" == message.sns["TopicArn"]
+        assert "Message" not in message.sns
+
+    def test_unwrap_sns_disabled(self):
+        raw_message = _sns_message(json.dumps({"id": 1}), key="person_updated")
+        message = routers.SQSMessage.from_raw_sqs_message(
+            raw_message=raw_message, key_name="key", event=None, unwrap_sns=False
+        )
+        assert message.key is None
+        assert message.sns is None
+        assert "Notification" == message.body["Type"]
+
+    def test_sns_marker_in_plain_body(self):
+        raw_message = {"messageId": "1", "body": json.dumps({"TopicArn": "arn"})}
+        message = routers.SQSMessage.from_raw_sqs_message(raw_message=raw_message, key_name="key", event=None)
+        assert message.sns is None
+        assert {"TopicArn": "arn"} == message.body
+
+    def test_pickle_undecoded(self):
+        message = routers.SQSMessage(raw_body='{"id": 1}', key="key", event=None)
+        assert {"id": 1} == pickle.loads(pickle.dumps(message)).body
+        assert {} == routers.SQSMessage(key="key", event=None).body
+
 
 class TestSQSMessageField:
     def test_add_route(self):
@@ -204,6 +261,22 @@ class TestSQSMessageField:
             router.get_route(message=message)
             assert "Routing key (route_on) is not present in the event." in str(e.value)
 
+    def test_get_route_with_missing_key_default(self, sqs_event):
+        router = routers.SQSMessageField(key="route_on")
+        router.add_route(fn=lambda msg: "ok", key="test")
+        router.add_route(fn=lambda msg: "default", key=None)
+        raw_message = sqs_event.raw["Records"][0]
+        message = router._get_message(raw_message, event=sqs_event)
+        assert "default" == router.get_route(message=message)(msg=message)
+
+    def test_dispatch_sns(self):
+        router = routers.SQSMessageField(key="key")
+        raw_message = _sns_message(json.dumps({"id": 1}), key="person_updated")
+        route = mock.Mock()
+        router.add_route(fn=route, key="person_updated")
+        router.dispatch(event=events.LambdaEvent(raw={"Records": [raw_message]}, app=None))
+        assert {"id": 1} == route.call_args[1]["message"].body
+
     def test_dispatch(self, sqs_event):
         router = routers.SQSMessageField(key="key")
         test_message_handler = mock.MagicMock()
@@ -234,3 +307,120 @@ class TestSQSMessageField:
         router.dispatch(event=sqs_event)
         first_message_handler.assert_called_once()
         second_message_handler.assert_called_once()
+
+    def _add_records(self, sqs_event, keys):
+        template = sqs_event.raw["Records"][0]
+        sqs_event.raw["Records"] = []
+        for i, key in enumerate(keys):
+            raw_message = copy.deepcopy(template)
+            raw_message["messageId"] = f"message-{i}"
+            raw_message["body"] = json.dumps({"index": i})
+            raw_message["messageAttributes"]["key"]["stringValue"] = key
+            sqs_event.raw["Records"].append(raw_message)
+
+    def test_dispatch_batch(self, sqs_event):
+        router = routers.SQSMessageField(key="key")
+        self._add_records(sqs_event, ["created", "updated", "created", "deleted", "created"])
+        batches = []
+        single_message_handler = mock.MagicMock()
+        router.add_route(fn=lambda messages: batches.append(messages), key="created", batch=True)
+        router.add_route(fn=lambda messages: batches.append(messages), key="updated", batch=True)
+        router.add_route(fn=single_message_handler, key="deleted")
+        assert router.dispatch(event=sqs_event) is None
+        single_message_handler.assert_called_once()
+        # Grouped per key, in arrival order within each group.
+        assert [[0, 2, 4], [1]] == [[message.body["index"] for message in batch] for batch in batches]
+
+    def test_dispatch_batch_max_size(self, sqs_event):
+        router = routers.SQSMessageField(key="key")
+        self._add_records(sqs_event, ["created"] * 5)
+        batches = []
+        router.add_route(fn=lambda messages: batches.append(messages), key="created", batch=True, max_batch_size=2)
+        router.dispatch(event=sqs_event)
+        assert [[0, 1], [2, 3], [4]] == [[message.body["index"] for message in batch] for batch in batches]
+
+    def test_dispatch_batch_invalid_max_size(self):
+        router = routers.SQSMessageField(key="key")
+        with pytest.raises(ValueError):
+            router.add_route(fn=lambda messages: None, key="created", batch=True, max_batch_size=0)
+
+    def test_dispatch_batch_failures(self, sqs_event):
+        router = routers.SQSMessageField(key="key")
+        self._add_records(sqs_event, ["created", "updated", "created", "updated"])
+
+        def created(messages):
+            # Report failures as messages.
+            return [message for message in messages if message.body["index"] == 2]
+
+        def updated(messages):
+            # Report failures as message ids.
+            return [messages[0].meta["messageId"]]
+
+        router.add_route(fn=created, key="created", batch=True)
+        router.add_route(fn=updated, key="updated", batch=True)
+        response = router.dispatch(event=sqs_event)
+        assert {"batchItemFailures": [{"itemIdentifier": "message-2"}, {"itemIdentifier": "message-1"}]} == response
+
+
+@pytest.fixture
+def route_module(tmp_path, monkeypatch):
+    """
+    Creates a fresh, not yet imported, module with a couple of routes.
+    """
+    name = f"lazy_routes_{tmp_path.name}"
+    (tmp_path / f"{name}.py").write_text(
+        "def route(event=None, message=None):\n"
+        "    return 'lazy'\n"
+        "\n"
+        "def batch_route(messages):\n"
+        "    return [message.meta['messageId'] for message in messages if message.body.get('fail')]\n"
+    )
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield name
+    sys.modules.pop(name, None)
+
+
+class TestLazyRoute:
+    def test_imported_on_first_call(self, route_module):
+        route = routers.LazyRoute(path=f"{route_module}:route")
+        assert route_module not in sys.modules
+        assert not route.loaded
+        assert route.import_time is None
+        assert "lazy" == route(event=None)
+        assert route_module in sys.modules
+        assert route.loaded
+        assert route.import_time >= 0
+        assert route.resolve() is sys.modules[route_module].route
+
+    def test_import_error(self):
+        route = routers.LazyRoute(path="lambda_router.routers:missing_route")
+        with pytest.raises(ImportError):
+            route(event=None)
+        assert not route.loaded
+
+    def test_single_route(self, route_module):
+        router = routers.SingleRoute()
+        router.add_route(fn=f"{route_module}:route")
+        assert isinstance(router.route, routers.LazyRoute)
+        assert route_module not in sys.modules
+        assert "lazy" == router.dispatch(event=events.LambdaEvent(raw={}, app=None))
+        assert {None: router.route} == router.get_routes()
+
+    def test_event_field(self, route_module):
+        router = routers.EventField(key="field")
+        router.add_route(fn=f"{route_module}:route", key="lazy")
+        router.add_route(fn=lambda event: "eager", key="eager")
+        assert "eager" == router.dispatch(event=events.LambdaEvent(raw={"field": "eager"}, app=None))
+        assert route_module not in sys.modules
+        assert "lazy" == router.dispatch(event=events.LambdaEvent(raw={"field": "lazy"}, app=None))
+
+    def test_sqs_message_field(self, route_module):
+        router = routers.SQSMessageField(key="key")
+        router.add_route(fn=f"{route_module}:route", key="single")
+        router.add_route(fn=f"{route_module}:batch_route", key="batch", batch=True)
+        records = [
+            {"messageId": "1", "body": "{}", "messageAttributes": {"key": {"stringValue": "single"}}},
+            {"messageId": "2", "body": '{"fail": true}', "messageAttributes": {"key": {"stringValue": "batch"}}},
+        ]
+        response = router.dispatch(event=events.LambdaEvent(raw={"Records": records}, app=None))
+        assert {"batchItemFailures": [{"itemIdentifier": "2"}]} == response
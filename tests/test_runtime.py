@@ -0,0 +1,175 @@
+import os
+
+import pytest  # noqa: F401
+
+from lambda_router import exceptions, routers, runtime
+from lambda_router.app import App
+
+
+@pytest.fixture
+def emulator():
+    with runtime.RuntimeAPIEmulator() as emulator:
+        yield emulator
+
+
+@pytest.fixture
+def client(emulator):
+    client = runtime.RuntimeClient(address=emulator.address, codec=runtime.get_codec("json"))
+    yield client
+    client.close()
+
+
+@pytest.fixture
+def app():
+    app = App(name="test_runtime", router=routers.EventField(key="field"))
+
+    @app.route(key="echo")
+    def echo(event):
+        return {"value": event.raw["value"], "request_id": app.execution_context.aws_request_id}
+
+    @app.route(key="fail")
+    def fail(event):
+        raise ValueError("Things went wrong")
+
+    return app
+
+
+class FakeClient:
+    def __init__(self, *events):
+        self.events = list(events)
+        self.responses = {}
+        self.errors = {}
+
+    def next_invocation(self):
+        request_id, event, trace_id = self.events.pop(0)
+        context = runtime.LambdaContext(
+            aws_request_id=request_id, deadline_ms=0, invoked_function_arn="", trace_id=trace_id
+        )
+        return event, context
+
+    def post_response(self, request_id, response):
+        self.responses[request_id] = runtime.get_codec("json").dumps(response)
+
+    def post_error(self, request_id, error):
+        self.errors[request_id] = error
+
+
+# Referenced by import string in the tests below.
+imported_app = App(name="test_runtime_import")
+
+
+@imported_app.route()
+def imported_route(event):
+    return {"imported": True}
+
+
+class TestGetCodec:
+    def test_stdlib(self):
+        codec = runtime.get_codec("json")
+        assert {"a": 1} == codec.loads(codec.dumps({"a": 1}))
+        assert isinstance(codec.dumps({}), bytes)
+
+    def test_auto(self):
+        codec = runtime.get_codec()
+        assert codec.name in ("json", "orjson", "ujson")
+        assert {"a": [1, 2]} == codec.loads(codec.dumps({"a": [1, 2]}))
+
+    def test_unknown(self):
+        with pytest.raises(exceptions.ConfigError):
+            runtime.get_codec("yaml")
+
+
+class TestLambdaContext:
+    def test_from_headers(self):
+        context = runtime.LambdaContext.from_headers(
+            {
+                "Lambda-Runtime-Aws-Request-Id": "abc",
+                "Lambda-Runtime-Deadline-Ms": "0",
+                "Lambda-Runtime-Invoked-Function-Arn": "arn",
+                "Lambda-Runtime-Client-Context": '{"custom": {}}',
+            },
+            codec=runtime.get_codec("json"),
+        )
+        assert "abc" == context.aws_request_id
+        assert {"custom": {}} == context.client_context
+        assert context.identity is None
+        assert 0 == context.get_remaining_time_in_millis()
+
+
+class TestRun:
+    def test_responses(self, emulator, client, app):
+        first = emulator.add_event({"field": "echo", "value": 1})
+        second = emulator.add_event({"field": "echo", "value": 2})
+        runtime.run(app, client=client, max_invocations=2)
+        assert {"value": 1, "request_id": first} == emulator.responses[first]
+        assert {"value": 2, "request_id": second} == emulator.responses[second]
+        # All requests share a single keep-alive connection.
+        assert 1 == emulator.connections
+
+    def test_errors(self, emulator, client, app):
+        failed = emulator.add_event({"field": "fail"})
+        succeeded = emulator.add_event({"field": "echo", "value": 3})
+        runtime.run(app, client=client, max_invocations=2)
+        assert "ValueError" == emulator.errors[failed]["errorType"]
+        assert "Things went wrong" == emulator.errors[failed]["errorMessage"]
+        assert emulator.errors[failed]["stackTrace"]
+        assert 3 == emulator.responses[succeeded]["value"]
+
+    def test_import_string(self, emulator, client):
+        request_id = emulator.add_event({})
+        runtime.run("test_runtime:imported_app", client=client, max_invocations=1)
+        assert {"imported": True} == emulator.responses[request_id]
+
+    def test_dotted_handler(self, emulator, client):
+        request_id = emulator.add_event({})
+        # The module.function format of the _HANDLER set by Lambda.
+        runtime.run("test_runtime.imported_app", client=client, max_invocations=1)
+        assert {"imported": True} == emulator.responses[request_id]
+
+    def test_init_error(self, emulator, client):
+        with pytest.raises(ImportError):
+            runtime.run("test_runtime:missing_app", client=client, max_invocations=1)
+        assert 1 == len(emulator.init_errors)
+        assert "ImportError" == emulator.init_errors[0]["errorType"]
+
+    def test_reconnects(self, emulator, client, app):
+        first = emulator.add_event({"field": "echo", "value": 1})
+        runtime.run(app, client=client, max_invocations=1)
+        client.close()
+        second = emulator.add_event({"field": "echo", "value": 2})
+        runtime.run(app, client=client, max_invocations=1)
+        assert {first, second} == set(emulator.responses)
+        assert 2 == emulator.connections
+
+    def test_unserialisable_response(self, emulator, client):
+        request_id = emulator.add_event({})
+        runtime.run(lambda event, context: {"value": object()}, client=client, max_invocations=1)
+        assert "TypeError" == emulator.errors[request_id]["errorType"]
+        assert request_id not in emulator.responses
+
+    def test_trace_id_cleared(self, monkeypatch):
+        monkeypatch.delenv("_X_AMZN_TRACE_ID", raising=False)
+        trace_ids = []
+        client = FakeClient(("first", {}, "Root=1-first"), ("second", {}, None))
+        runtime.run(
+            lambda event, context: trace_ids.append(os.environ.get("_X_AMZN_TRACE_ID")),
+            client=client,
+            max_invocations=2,
+        )
+        assert ["Root=1-first", None] == trace_ids
+
+    def test_posts_not_retried(self, emulator, client):
+        requests = []
+
+        class FailingConnection:
+            def request(self, method, path, **kwargs):
+                requests.append(path)
+                raise ConnectionResetError()
+
+            def close(self):
+                pass
+
+        client._connection = FailingConnection()
+        with pytest.raises(ConnectionResetError):
+            client.post_response("request-1", {})
+        assert 1 == len(requests)
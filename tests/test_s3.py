@@ -0,0 +1,110 @@
+import json
+
+import pytest  # noqa: F401
+
+from lambda_router import events, routers, s3
+
+
+def _record(key, *, bucket="uploads", event_name="ObjectCreated:Put"):
+    return {
+        "eventVersion": "2.1",
+        "eventSource": "aws:s3",
+        "eventName": event_name,
+        "s3": {"bucket": {"name": bucket}, "object": {"key": key, "size": 1024, "eTag": "abc"}},
+    }
+
+
+def _router(calls):
+    def route(name):
+        return lambda record: calls.append((name, record.key))
+
+    router = s3.S3Router()
+    router.add_route(fn=route("images"), prefix="images/", name="images")
+    router.add_route(fn=route("thumbnails"), prefix="images/thumbnails/", suffix=".png", name="thumbnails")
+    router.add_route(fn=route("deleted"), events="s3:ObjectRemoved:*", name="deleted")
+    router.add_route(fn=route("reports"), bucket="reports", events=["ObjectCreated:*"], suffix=".csv", name="reports")
+    return router
+
+
+class TestS3Record:
+    def test_from_raw(self):
+        record = s3.S3Record.from_raw(_record("images/my+photo%281%29.jpg"))
+        assert "uploads" == record.bucket
+        assert "images/my photo(1).jpg" == record.key
+        assert "ObjectCreated:Put" == record.event_name
+        assert 1024 == record.size
+
+
+class TestS3Router:
+    @pytest.mark.parametrize(
+        "record,name",
+        [
+            (_record("images/cat.jpg"), "images"),
+            (_record("images/thumbnails/cat.png"), "thumbnails"),
+            # Falls back to the shorter prefix when the suffix doesn't match.
+            (_record("images/thumbnails/cat.jpg"), "images"),
+            (_record("images/cat.jpg", event_name="ObjectRemoved:Delete"), "images"),
+            (_record("docs/cat.jpg", event_name="ObjectRemoved:Delete"), "deleted"),
+            (_record("2020/sales.csv", bucket="reports"), "reports"),
+            (_record("2020/sales.csv", bucket="other"), None),
+            (_record("2020/sales.csv", bucket="reports", event_name="ObjectRestore:Completed"), None),
+            (_record("image"), None),
+        ],
+    )
+    def test_match(self, record, name):
+        router = _router([])
+        assert name == router.match(s3.S3Record.from_raw(record))
+
+    def test_same_prefix_in_order(self):
+        router = s3.S3Router()
+        router.add_route(fn=lambda record: None, prefix="a/", events="ObjectCreated:Copy", name="copy")
+        router.add_route(fn=lambda record: None, prefix="a/", name="any")
+        assert "copy" == router.match(s3.S3Record.from_raw(_record("a/b", event_name="ObjectCreated:Copy")))
+        assert "any" == router.match(s3.S3Record.from_raw(_record("a/b")))
+
+    def test_duplicate_name(self):
+        router = s3.S3Router()
+        router.add_route(fn=lambda record: None, name="route")
+        with pytest.raises(ValueError):
+            router.add_route(fn=lambda record: None, name="route")
+
+    def test_dispatch(self):
+        calls = []
+        router = _router(calls)
+        raw = {"Records": [_record("images/a+b.jpg"), _record("images/thumbnails/c.png")]}
+        assert router.dispatch(event=events.LambdaEvent(raw=raw, app=None)) is None
+        assert [("images", "images/a b.jpg"), ("thumbnails", "images/thumbnails/c.png")] == calls
+
+    def test_dispatch_without_route(self):
+        router = _router([])
+        with pytest.raises(ValueError):
+            router.dispatch(event=events.LambdaEvent(raw={"Records": [_record("docs/a.txt")]}, app=None))
+        with pytest.raises(ValueError):
+            router.dispatch(event=events.LambdaEvent(raw={}, app=None))
+
+    def test_dispatch_test_event(self):
+        router = _router([])
+        assert router.dispatch(event=events.LambdaEvent(raw={"Event": "s3:TestEvent"}, app=None)) is None
+
+    def test_dispatch_via_sqs(self):
+        calls = []
+        router = _router(calls)
+        sqs_router = routers.SQSMessageField(key="key")
+        sqs_router.add_route(fn=router.dispatch_message, key=None)
+        sqs_router.add_route(fn=lambda message: calls.append(("keyed", message.body)), key="other")
+        raw = {
+            "Records": [
+                {
+                    "messageId": "1",
+                    "body": json.dumps({"Records": [_record("images/a.jpg"), _record("images/b.jpg")]}),
+                },
+                {"messageId": "2", "body": json.dumps({"Event": "s3:TestEvent"})},
+                {
+                    "messageId": "3",
+                    "body": json.dumps({"value": 1}),
+                    "messageAttributes": {"key": {"stringValue": "other", "dataType": "String"}},
+                },
+            ]
+        }
+        sqs_router.dispatch(event=events.LambdaEvent(raw=raw, app=None))
+        assert [("images", "images/a.jpg"), ("images", "images/b.jpg"), ("keyed", {"value": 1})] == calls
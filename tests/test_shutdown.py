@@ -0,0 +1,64 @@
+import os
+import signal
+import time
+
+import pytest  # noqa: F401
+
+from lambda_router import shutdown
+
+
+@pytest.fixture
+def callbacks(monkeypatch):
+    callbacks = []
+    monkeypatch.setattr(shutdown, "_callbacks", callbacks)
+    monkeypatch.setattr(shutdown, "_installed", False)
+    monkeypatch.setattr(shutdown, "_previous_handler", None)
+    handler = signal.getsignal(signal.SIGTERM)
+    yield callbacks
+    signal.signal(signal.SIGTERM, handler)
+
+
+def _wait_for(condition, timeout=1.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+class TestShutdown:
+    def test_run_callbacks(self, callbacks):
+        calls = []
+        shutdown.register(lambda: calls.append("first"))
+        shutdown.register(lambda: calls.append("second"))
+        shutdown.run_callbacks()
+        assert ["second", "first"] == calls
+        # Each callback only runs once.
+        shutdown.run_callbacks()
+        assert ["second", "first"] == calls
+
+    def test_failing_callback(self, callbacks):
+        calls = []
+
+        def fail():
+            raise ValueError("Things went wrong")
+
+        shutdown.register(lambda: calls.append("first"))
+        shutdown.register(fail)
+        shutdown.run_callbacks()
+        assert ["first"] == calls
+
+    def test_unregister(self, callbacks):
+        calls = []
+        callback = shutdown.register(lambda: calls.append("callback"))
+        shutdown.unregister(callback)
+        shutdown.unregister(callback)
+        shutdown.run_callbacks()
+        assert [] == calls
+
+    def test_sigterm(self, callbacks):
+        calls = []
+        signal.signal(signal.SIGTERM, lambda signum, frame: calls.append("previous"))
+        shutdown.register(lambda: calls.append("callback"))
+        os.kill(os.getpid(), signal.SIGTERM)
+        _wait_for(lambda: len(calls) == 2)
+        # The previously installed handler is still called, after the callbacks.
+        assert ["callback", "previous"] == calls
@@ -0,0 +1,113 @@
+import random
+import sys
+import time
+import types
+
+import pytest  # noqa: F401
+
+from lambda_router import reporting, snapstart
+from lambda_router.app import App
+
+
+class TestLifecycleHooks:
+    def test_order(self):
+        app = App(name="test_order")
+        calls = []
+
+        @app.before_snapshot(order=10)
+        def close_pool(app):
+            calls.append("close_pool")
+
+        @app.before_snapshot
+        def close_connection(app):
+            calls.append("close_connection")
+
+        @app.after_restore
+        def reconnect(app):
+            calls.append("reconnect")
+
+        @app.after_restore(order=-1)
+        def refresh_credentials(app):
+            calls.append("refresh_credentials")
+
+        result = snapstart.simulate_snapshot_restore(app, between=lambda: calls.append("snapshot"))
+        assert ["close_connection", "close_pool", "snapshot", "refresh_credentials", "reconnect"] == calls
+        assert 3 == len(result.before_snapshot)
+        assert 3 == len(result.after_restore)
+        assert "lambda_router.snapstart:prepare_snapshot" == list(result.before_snapshot)[-1]
+        assert "lambda_router.snapstart:reset_after_restore" == list(result.after_restore)[0]
+
+    def test_failed_hook_raised_after_others(self):
+        app = App(name="test_failed_hook_raised_after_others")
+        calls = []
+
+        @app.after_restore
+        def broken(app):
+            raise ConnectionError("Can't reconnect")
+
+        @app.after_restore
+        def working(app):
+            calls.append("working")
+
+        with pytest.raises(ConnectionError):
+            snapstart.simulate_snapshot_restore(app)
+        assert ["working"] == calls
+
+    def test_same_name_timings_added(self):
+        hooks = snapstart.LifecycleHooks(name="before_snapshot")
+        hooks.add(lambda app: time.sleep(0.02))
+        hooks.add(lambda app: time.sleep(0.02))
+        timings = hooks.run(None)
+        assert 1 == len(timings)
+        assert list(timings.values())[0] >= 0.04
+
+
+class TestBuiltinHooks:
+    def test_reset_after_restore(self):
+        app = App(name="test_reset_after_restore")
+
+        @app.route()
+        def main_route(event):
+            return app.is_cold_start
+
+        assert app({}, {})
+        assert not app({}, {})
+        random.seed(1)
+        snapshot_state = random.random()
+        random.seed(1)
+        snapstart.simulate_snapshot_restore(app)
+        assert snapshot_state != random.random()
+        assert app({}, {})
+        assert app.init_duration < 1
+
+    def test_prepare_snapshot(self):
+        app = App(name="test_prepare_snapshot")
+        sink = reporting.MemorySink(delay=0.05)
+        app.add_exception_reporter(reporting.BackgroundReporter(sink=sink, flush_timeout=0.01))
+
+        @app.route()
+        def main_route(event):
+            raise ValueError("Things went wrong")
+
+        with pytest.raises(ValueError):
+            app({}, {})
+        assert [] == sink.reports
+        app.exception_reporters[0].flush_timeout = 5
+        snapstart.simulate_snapshot_restore(app)
+        assert 1 == len(sink.reports)
+
+
+class TestRegisterRuntimeHooks:
+    def test_without_runtime(self):
+        assert not snapstart.register_runtime_hooks(App(name="test_without_runtime"))
+
+    def test_with_runtime(self, monkeypatch):
+        registered = []
+        module = types.ModuleType("snapshot_restore_py")
+        module.register_before_snapshot = lambda fn: registered.append(("before_snapshot", fn))
+        module.register_after_restore = lambda fn: registered.append(("after_restore", fn))
+        monkeypatch.setitem(sys.modules, "snapshot_restore_py", module)
+        app = App(name="test_with_runtime")
+        assert [("before_snapshot", app.run_before_snapshot_hooks), ("after_restore", app.run_after_restore_hooks)] == (
+            registered
+        )
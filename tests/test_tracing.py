@@ -0,0 +1,182 @@
+import json
+import logging
+
+import pytest  # noqa: F401
+
+from lambda_router import appsync, routers, tracing
+from lambda_router.app import App, Config
+
+
+def _names(spans):
+    return [span.name for span in spans]
+
+
+class TestSpan:
+    def test_span_without_trace(self):
+        with tracing.span("noop") as span:
+            assert span is None
+        assert tracing.current_span() is None
+
+    def test_nested_spans(self):
+        exporter = tracing.InMemoryExporter()
+        tracer = tracing.Tracer(exporter=exporter)
+        with tracer.trace("root", cold_start=True):
+            with tracing.span("outer"):
+                with tracing.span("inner", key="value") as inner:
+                    assert inner is tracing.current_span()
+            with tracing.span("sibling"):
+                pass
+        assert ["root", "outer", "inner", "sibling"] == _names(exporter.spans)
+        root, outer, inner, sibling = exporter.spans
+        assert root.parent_id is None
+        assert root.span_id == outer.parent_id
+        assert outer.span_id == inner.parent_id
+        assert root.span_id == sibling.parent_id
+        assert {"key": "value"} == inner.attributes
+        assert all(span.trace_id == root.trace_id for span in exporter.spans)
+        assert root.duration >= outer.duration >= inner.duration >= 0
+        assert root.end_time_ns >= root.start_time_ns
+
+    def test_span_records_error(self):
+        exporter = tracing.InMemoryExporter()
+        tracer = tracing.Tracer(exporter=exporter)
+        with pytest.raises(ValueError):
+            with tracer.trace("root"):
+                with tracing.span("failing"):
+                    raise ValueError("Things went wrong")
+        assert "ValueError" == exporter.spans[1].attributes["error"]
+        assert exporter.spans[1].end is not None
+        assert tracing.current_span() is None
+
+
+class TestLogExporter:
+    def test_export(self, caplog):
+        logger = logging.getLogger("test_log_exporter")
+        tracer = tracing.Tracer(exporter=tracing.LogExporter(logger=logger))
+        with caplog.at_level(logging.INFO, logger="test_log_exporter"):
+            with tracer.trace("root"):
+                with tracing.span("child"):
+                    pass
+        document = json.loads(caplog.records[0].getMessage())
+        assert ["root", "child"] == [span["name"] for span in document["spans"]]
+
+
+class TestOpenTelemetryExporter:
+    def test_export(self):
+        sdk_trace = pytest.importorskip("opentelemetry.sdk.trace")
+        in_memory = pytest.importorskip("opentelemetry.sdk.trace.export.in_memory_span_exporter")
+        from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+
+        otel_exporter = in_memory.InMemorySpanExporter()
+        provider = sdk_trace.TracerProvider()
+        provider.add_span_processor(SimpleSpanProcessor(otel_exporter))
+        exporter = tracing.OpenTelemetryExporter(tracer=provider.get_tracer(__name__))
+        tracer = tracing.Tracer(exporter=exporter)
+        with tracer.trace("root"):
+            with tracing.span("child"):
+                pass
+        spans = {span.name: span for span in otel_exporter.get_finished_spans()}
+        assert spans["root"].context.span_id == spans["child"].parent.span_id
+
+
+class TestAppTracing:
+    def test_phases(self):
+        def test_middleware(dispatch):
+            def middleware(event):
+                return dispatch(event=event)
+
+            return middleware
+
+        exporter = tracing.InMemoryExporter()
+        config = Config()
+        config["MIDDLEWARE"] = [test_middleware]
+        app = App(
+            name="test_phases",
+            config=config,
+            router=routers.EventField(key="field"),
+            tracer=tracing.Tracer(exporter=exporter),
+        )
+
+        @app.route(key="main")
+        def main_route(event):
+            return {"result": "success"}
+
+        assert {"result": "success"} == app({"field": "main"}, {})
+        assert [
+            "invocation",
+            "create_event",
+            "dispatch",
+            "middleware:TestAppTracing.test_phases.<locals>.test_middleware",
+            "get_route",
+            "route",
+        ] == _names(exporter.spans)
+        root = exporter.spans[0]
+        assert root.attributes["cold_start"]
+        assert root.attributes["init_duration"] >= 0
+
+        exporter.clear()
+        app({"field": "main"}, {})
+        root = exporter.spans[0]
+        assert not root.attributes["cold_start"]
+        assert "init_duration" not in root.attributes
+
+    def test_exception_handlers(self):
+        exporter = tracing.InMemoryExporter()
+        app = App(name="test_exception_handlers", tracer=tracing.Tracer(exporter=exporter))
+        app.register_exception_handler(lambda app, event, e: None)
+
+        @app.route()
+        def main_route(event):
+            raise ValueError("Things went wrong")
+
+        with pytest.raises(ValueError):
+            app({}, {})
+        spans = {span.name: span for span in exporter.spans}
+        assert "ValueError" == spans["route"].attributes["error"]
+        assert "exception_handlers" in spans
+
+    def test_sqs_messages(self):
+        exporter = tracing.InMemoryExporter()
+        app = App(
+            name="test_sqs_messages",
+            router=routers.SQSMessageField(key="key"),
+            tracer=tracing.Tracer(exporter=exporter),
+        )
+
+        @app.route(key="one")
+        def one(message):
+            pass
+
+        records = [{"body": "{}", "messageAttributes": {"key": {"stringValue": key}}} for key in ("one", "one", "one")]
+        app({"Records": records}, {})
+        messages = [span for span in exporter.spans if span.name == "message"]
+        assert 3 == len(messages)
+        assert {"key": "one"} == messages[0].attributes
+        routes = [span for span in exporter.spans if span.name == "route"]
+        assert [message.span_id for message in messages] == [span.parent_id for span in routes]
+
+    def test_appsync_field(self):
+        exporter = tracing.InMemoryExporter()
+        app = App(
+            name="test_appsync_field",
+            router=appsync.AppSyncField(),
+            event_class=appsync.AppSyncEvent,
+            event_params={"template": {"context": "details"}},
+            tracer=tracing.Tracer(exporter=exporter),
+        )
+
+        @app.route(field="getAssets")
+        def get_assets(event):
+            return []
+
+        raw = {
+            "details": {
+                "arguments": {},
+                "identity": None,
+                "info": {"fieldName": "getAssets", "parentTypeName": "Query", "variables": {}},
+                "request": {"headers": {}},
+            }
+        }
+        assert [] == app(raw, {})
+        spans = {span.name: span for span in exporter.spans}
+        assert {"field_name": "getAssets"} == spans["field"].attributes
@@ -0,0 +1,38 @@
+import pytest  # noqa: F401
+
+from lambda_router import utils
+from lambda_router.app import App
+
+
+class TestImportString:
+    def test_import_string(self):
+        assert utils.import_string is utils.import_string("lambda_router.utils:import_string")
+
+    def test_import_string_dotted_attribute(self):
+        assert App.route is utils.import_string("lambda_router.app:App.route")
+
+    @pytest.mark.parametrize("path", ["lambda_router.utils", ":import_string", "lambda_router.utils:"])
+    def test_import_string_invalid(self, path):
+        with pytest.raises(ValueError):
+            utils.import_string(path)
+
+    def test_import_string_missing_attribute(self):
+        with pytest.raises(ImportError):
+            utils.import_string("lambda_router.utils:missing")
+
+    def test_import_string_missing_module(self):
+        with pytest.raises(ImportError):
+            utils.import_string("lambda_router.missing:app")
+
+
+class TestCallableName:
+    def test_function(self):
+        assert "lambda_router.utils:import_string" == utils.callable_name(utils.import_string)
+
+    def test_callable_instance(self):
+        class Hook:
+            def __call__(self, app):
+                pass
+
+        name = f"{__name__}:TestCallableName.test_callable_instance.<locals>.Hook"
+        assert name == utils.callable_name(Hook())
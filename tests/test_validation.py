@@ -0,0 +1,143 @@
+import pytest
+
+from lambda_router import appsync, config, exceptions, routers, validation
+from lambda_router.app import App
+
+
+USER_TEMPLATE = {
+    "id": {"required": True, "type": (int, str), "converter": int},
+    "name": {"required": True, "type": str},
+    "admin": {"default": False, "converter": config.str_to_bool},
+    "address": {"schema": {"city": {"required": True, "type": str}, "postcode": {}}},
+}
+
+
+class TestSchema:
+    def test_valid_payload(self):
+        schema = validation.Schema.compile(USER_TEMPLATE, name="User")
+        user = schema({"id": "12", "name": "Jane", "admin": "yes", "address": {"city": "Leeds"}, "other": 1})
+        assert "User" == user.__class__.__name__
+        assert 12 == user.id
+        assert "Jane" == user.name
+        assert user.admin is True
+        assert "Leeds" == user.address.city
+        assert user.address.postcode is None
+        assert not hasattr(user, "__dict__")
+        assert user == type(user)(id=12, name="Jane", admin=True, address=user.address)
+
+    def test_defaults(self):
+        schema = validation.Schema.compile(USER_TEMPLATE)
+        user = schema({"id": 1, "name": "Jane"})
+        assert user.admin is False
+        assert user.address is None
+
+    def test_collects_all_errors(self):
+        schema = validation.Schema.compile(USER_TEMPLATE)
+        with pytest.raises(exceptions.ValidationError) as excinfo:
+            schema({"id": "twelve", "address": {"city": 1}})
+        assert [
+            "id: invalid literal for int() with base 10: 'twelve'",
+            "name: required field is missing",
+            "address.city: expected str, got int",
+        ] == excinfo.value.errors
+
+    def test_type_checked_before_converter(self):
+        schema = validation.Schema.compile({"id": {"type": (int, str), "converter": int}})
+        with pytest.raises(exceptions.ValidationError) as excinfo:
+            schema({"id": [1]})
+        assert ["id: expected int or str, got list"] == excinfo.value.errors
+
+    def test_not_a_mapping(self):
+        schema = validation.Schema.compile(USER_TEMPLATE)
+        with pytest.raises(exceptions.ValidationError) as excinfo:
+            schema([])
+        assert ["payload: expected an object, got list"] == excinfo.value.errors
+        with pytest.raises(exceptions.ValidationError) as excinfo:
+            schema({"id": 1, "name": "Jane", "address": "Leeds"})
+        assert ["address: expected an object, got str"] == excinfo.value.errors
+
+    @pytest.mark.parametrize(
+        "template", [{}, [], {"not valid": {}}, {"class": {}}, {"_private": {}}, {"id": {"requried": True}}],
+    )
+    def test_invalid_template(self, template):
+        with pytest.raises(exceptions.ConfigError):
+            validation.Schema.compile(template)
+
+    def test_compile_schema(self):
+        schema = validation.Schema.compile(USER_TEMPLATE)
+        assert schema is validation.compile_schema(schema)
+
+
+class TestValidatedRoutes:
+    def test_event_route(self):
+        app = App(name="test_event_route")
+        payloads = []
+
+        @app.route(schema={"count": {"required": True, "converter": int}})
+        def main_route(event, payload):
+            payloads.append(payload)
+            return payload.count
+
+        assert 3 == app({"count": "3"}, {})
+        assert "main_route_payload" == payloads[0].__class__.__name__
+        with pytest.raises(exceptions.ValidationError):
+            app({}, {})
+        assert 1 == len(payloads)
+
+    def test_sqs_routes(self):
+        app = App(name="test_sqs_routes", router=routers.SQSMessageField(key="key"))
+        schema = validation.Schema.compile({"id": {"required": True, "type": int}})
+        received = []
+
+        @app.route(key="single", schema=schema)
+        def single_route(message, payload):
+            received.append(payload.id)
+
+        @app.route(key="batch", batch=True, schema=schema)
+        def batch_route(messages, payload):
+            received.append([p.id for p in payload])
+
+        records = [
+            {"body": '{"id": %d}' % i, "messageAttributes": {"key": {"stringValue": key}}}
+            for i, key in enumerate(["single", "batch", "batch"])
+        ]
+        app({"Records": records}, {})
+        assert [0, [1, 2]] == received
+
+    def test_sqs_batch_invalid_messages(self):
+        app = App(name="test_sqs_batch_invalid_messages", router=routers.SQSMessageField(key="key"))
+        received = []
+
+        @app.route(key="batch", batch=True, schema={"id": {"required": True, "type": int}})
+        def batch_route(messages, payload):
+            received.append([(message.meta["messageId"], p.id) for message, p in zip(messages, payload)])
+            return [message for message in messages if message.body["id"] == 3]
+
+        bodies = ['{"id": 1}', '{"id": "two"}', '{"id": 3}', "not json", '{"id": 5}']
+        records = [
+            {"messageId": f"m{i}", "body": body, "messageAttributes": {"key": {"stringValue": "batch"}}}
+            for i, body in enumerate(bodies)
+        ]
+        response = app({"Records": records}, {})
+        # Only the valid messages reach the route, the invalid ones fail on their own.
+        assert [[("m0", 1), ("m2", 3), ("m4", 5)]] == received
+        failed = [item["itemIdentifier"] for item in response["batchItemFailures"]]
+        assert ["m2", "m1", "m3"] == failed
+
+    def test_sqs_batch_all_invalid(self):
+        app = App(name="test_sqs_batch_all_invalid", router=routers.SQSMessageField(key="key"))
+        received = []
+
+        @app.route(key="batch", batch=True, schema={"id": {"required": True, "type": int}})
+        def batch_route(messages, payload):
+            received.append(messages)
+
+        records = [{"messageId": "m0", "body": "{}", "messageAttributes": {"key": {"stringValue": "batch"}}}]
+        assert {"batchItemFailures": [{"itemIdentifier": "m0"}]} == app({"Records": records}, {})
+        assert [] == received
+
+    def test_appsync_route(self):
+        event = appsync.AppSyncEvent(raw={}, app=None, arguments={"id": "1"})
+        schema = {"id": {"required": True, "converter": int}}
+        route = validation.validate_route(lambda event, payload: payload.id, schema)
+        assert 1 == route(event=event)
@@ -0,0 +1,194 @@
+import os
+import time
+
+import pytest  # noqa: F401
+
+from lambda_router import events, exceptions, routers, shutdown, workers
+from lambda_router.app import App
+
+
+def square(x):
+    return x * x
+
+
+def pid():
+    return os.getpid()
+
+
+def fail(x):
+    raise ValueError(f"Bad value ({x})")
+
+
+def crash():
+    os._exit(3)
+
+
+def sleep(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+class Unpicklable(Exception):
+    def __init__(self, a, b):
+        super().__init__(a)
+
+
+def fail_unpicklable():
+    raise Unpicklable(1, 2)
+
+
+def thumbnail(message):
+    if message.body.get("fail"):
+        raise ValueError("Corrupt image")
+    assert message.event is None
+    time.sleep(message.body.get("sleep", 0))
+    return message.body["size"]
+
+
+class FakeContext:
+    def __init__(self, remaining_time_in_millis):
+        self.remaining_time_in_millis = remaining_time_in_millis
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining_time_in_millis
+
+
+def _records(*messages):
+    return [
+        {"messageId": str(i), "body": body, "messageAttributes": {"key": {"stringValue": key}}}
+        for i, (key, body) in enumerate(messages)
+    ]
+
+
+@pytest.fixture
+def pool():
+    pool = workers.WorkerPool(processes=2)
+    yield pool
+    pool.close()
+
+
+class TestWorkerPool:
+    def test_map(self, pool):
+        results = pool.map(square, [{"x": x} for x in range(10)])
+        assert [x * x for x in range(10)] == [result.value for result in results]
+        assert all(result.ok for result in results)
+
+    def test_import_string(self, pool):
+        results = pool.map("test_workers:square", [{"x": 3}])
+        assert 9 == results[0].value
+
+    def test_reused_across_calls(self, pool):
+        first = {result.value for result in pool.map(pid, [{}] * 4)}
+        second = {result.value for result in pool.map(pid, [{}] * 4)}
+        assert os.getpid() not in first
+        assert first == second
+        assert 2 == pool.started
+
+    def test_errors(self, pool):
+        results = pool.map(fail, [{"x": 1}])
+        assert not results[0].ok
+        assert isinstance(results[0].error, ValueError)
+        assert "Bad value (1)" in results[0].traceback
+        results = pool.map(fail_unpicklable, [{}])
+        assert isinstance(results[0].error, exceptions.WorkerError)
+
+    def test_unpicklable_task(self, pool):
+        results = pool.map(lambda: None, [{}])
+        assert not results[0].ok
+        # The worker is kept.
+        assert 9 == pool.map(square, [{"x": 3}])[0].value
+        assert 2 == pool.started
+
+    def test_crashed_worker_replaced(self, pool):
+        results = pool.map(crash, [{}])
+        assert isinstance(results[0].error, exceptions.WorkerError)
+        assert 3 == pool.started
+        assert 4 == pool.map(square, [{"x": 2}])[0].value
+
+    def test_idle_dead_worker_replaced(self, pool):
+        pool.map(square, [{"x": 1}] * 2)
+        dead = pool._workers[0].process
+        dead.kill()
+        dead.join()
+        results = pool.map(square, [{"x": x} for x in range(4)])
+        assert [0, 1, 4, 9] == [result.value for result in results]
+        assert 3 == pool.started
+        assert dead not in [worker.process for worker in pool._workers]
+
+    def test_recycled_after_max_tasks(self):
+        pool = workers.WorkerPool(processes=1, max_tasks_per_worker=2)
+        try:
+            pids = [result.value for result in pool.map(pid, [{}] * 5)]
+        finally:
+            pool.close()
+        assert 3 == len(set(pids))
+        assert pids[0] == pids[1] != pids[2] == pids[3] != pids[4]
+
+    def test_timeout_kills_hung_worker(self, pool):
+        pool.map(square, [{"x": 1}] * 2)
+        start = time.perf_counter()
+        results = pool.map(sleep, [{"seconds": 0}, {"seconds": 30}, {"seconds": 30}, {"seconds": 30}], timeout=1.0)
+        assert time.perf_counter() - start < 5
+        assert 0 == results[0].value
+        assert all(isinstance(result.error, exceptions.WorkerError) for result in results[1:])
+        assert "timed out" in str(results[1].error)
+        assert "wasn't started" in str(results[3].error)
+        assert 3 == pool.timed_out
+        # The killed workers are started again on next use.
+        assert 4 == pool.map(square, [{"x": 2}])[0].value
+        assert 2 == len(pool._workers)
+
+    def test_stopped_on_shutdown(self, monkeypatch):
+        monkeypatch.setattr(shutdown, "_callbacks", [])
+        pool = workers.WorkerPool(processes=1)
+        assert 1 == pool.map(square, [{"x": 1}])[0].value
+        assert [pool.close] == shutdown._callbacks
+        worker = pool._workers[0]
+        shutdown.run_callbacks()
+        assert [] == pool._workers
+        assert not worker.process.is_alive()
+
+    def test_fork_start_method(self):
+        pool = workers.WorkerPool(processes=1, start_method="fork")
+        try:
+            assert 9 == pool.map(square, [{"x": 3}])[0].value
+        finally:
+            pool.close()
+
+    def test_invalid_processes(self):
+        with pytest.raises(ValueError):
+            workers.WorkerPool(processes=0)
+
+
+class TestOffloadedRoutes:
+    def test_offloaded_route(self, pool):
+        router = routers.SQSMessageField(key="key", workers=pool)
+        router.add_route(fn=thumbnail, key="thumbnail", offload=True)
+        router.add_route(fn="test_workers:thumbnail", key="lazy", offload=True)
+        records = _records(("thumbnail", '{"size": 1}'), ("thumbnail", '{"fail": true}'), ("lazy", '{"size": 2}'))
+        response = router.dispatch(event=events.LambdaEvent(raw={"Records": records}, app=None))
+        assert {"batchItemFailures": [{"itemIdentifier": "1"}]} == response
+
+    def test_batch_offload(self):
+        router = routers.SQSMessageField(key="key")
+        with pytest.raises(ValueError):
+            router.add_route(fn=thumbnail, key="thumbnail", batch=True, offload=True)
+
+    def test_offload_deadline(self, pool):
+        app = App(name="test_offload_deadline", router=routers.SQSMessageField(key="key", workers=pool))
+        app.route(key="thumbnail", offload=True)(thumbnail)
+        pool.map(square, [{"x": 1}] * 2)
+        records = _records(("thumbnail", '{"size": 1}'), ("thumbnail", '{"size": 2, "sleep": 30}'))
+        start = time.perf_counter()
+        response = app({"Records": records}, FakeContext(2000))
+        assert time.perf_counter() - start < 5
+        assert {"batchItemFailures": [{"itemIdentifier": "1"}]} == response
+
+    def test_offload_rejects_wrappers(self):
+        app = App(name="test_offload_rejects_wrappers", router=routers.SQSMessageField(key="key"))
+        app.breakers.register("images")
+        with pytest.raises(ValueError):
+            app.add_route(thumbnail, key="thumbnail", offload=True, schema={"size": {"type": int}})
+        with pytest.raises(ValueError):
+            app.add_route(thumbnail, key="thumbnail", offload=True, breaker="images")
+        assert {} == app.router.routes